@@ -1,39 +1,42 @@
 import os
+import argparse
+import json
 import logging
+import shutil
+import tempfile
+from collections import Counter
 from dotenv import load_dotenv
 from loguru import logger
 import schedule
 import time
-from sync.woocommerce_client import WooCommerceClient
+from datetime import datetime
 from sync.notion_client import NotionClient
 from sync.stock_sync import StockSynchronizer
 from sync.ai_agent import AIAgent
 from sync.notifier import NotionNotifier
+from sync.bulk_import import BulkImporter
+from sync.multi_store import MultiStoreSynchronizer, create_woo_clients
+from sync.logging_setup import configure_logging
+from sync.profiling import ProfileTrigger
+from sync.snapshot import Snapshot, OfflineWooClient, OfflineNotionClient
+from sync.history import StockHistory
+from sync.state import state_path
+from sync.stock_api import StockApiServer
 
 # Carica variabili di ambiente
 load_dotenv()
 
-# Configura logging
-log_level = os.getenv('LOG_LEVEL', 'INFO')
-logger.remove()
-logger.add(
-    "logs/stock_sync.log",
-    level=log_level,
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    rotation="500 MB",
-    retention="7 days"
-)
-logger.add(lambda msg: print(msg, end=""), level=log_level)
+# Configura logging (sink asincroni, campionamento dei messaggi per riga)
+configure_logging()
+
+# Profilazione su richiesta (SIGUSR1 o file logs/profile.request)
+profile_trigger = ProfileTrigger()
 
 # Inizializza client
 def initialize_clients():
-    """Inizializza i client per WooCommerce e Notion"""
+    """Inizializza i client per WooCommerce (uno per negozio) e Notion"""
     try:
-        woo_client = WooCommerceClient(
-            api_url=os.getenv('WOOCOMMERCE_API_URL'),
-            consumer_key=os.getenv('WOOCOMMERCE_CONSUMER_KEY'),
-            consumer_secret=os.getenv('WOOCOMMERCE_CONSUMER_SECRET')
-        )
+        woo_clients = create_woo_clients()
         
         notion_client = NotionClient(
             token=os.getenv('NOTION_TOKEN'),
@@ -42,18 +45,46 @@ def initialize_clients():
         
         # Inizializza AI Agent e Notifier
         ai_agent = AIAgent()
-        notifier = NotionNotifier(notion_client)
+        notifier = NotionNotifier(notion_client, dashboard_page_id=os.getenv('NOTION_DASHBOARD_PAGE_ID'))
         
         logger.info("✓ Client inizializzati con successo")
-        return woo_client, notion_client, ai_agent, notifier
+        return woo_clients, notion_client, ai_agent, notifier
     except Exception as e:
         logger.error(f"✗ Errore nell'inizializzazione dei client: {e}")
         raise
 
-def sync_job(woo_client, notion_client, synchronizer, ai_agent, notifier):
-    """Esegue il job di sincronizzazione con analisi AI"""
+def _store_key(index, woo_client):
+    """Chiave di un negozio nel report: il principale resta 'woocommerce'"""
+    return "woocommerce" if index == 0 else f"woocommerce:{woo_client.store}"
+
+def _per_store(woo_clients, snapshot):
+    """Metriche di ogni negozio, indicizzate per chiave di report"""
+    return {_store_key(index, woo_client): snapshot(woo_client) for index, woo_client in enumerate(woo_clients)}
+
+def _sum_cache_summaries(summaries):
+    """Somma le statistiche delle cache HTTP dei negozi (None se tutte disattivate)"""
+    summaries = [summary for summary in summaries if summary is not None]
+    if not summaries:
+        return None
+    counts = {key: sum(summary[key] for summary in summaries) for key in ("not_modified", "unchanged", "misses")}
+    hits = counts["not_modified"] + counts["unchanged"]
+    total = hits + counts["misses"]
+    counts["hit_rate"] = hits / total * 100 if total else 0.0
+    return counts
+
+def sync_job(woo_clients, notion_client, synchronizer, ai_agent, notifier):
+    """Esegue il job di sincronizzazione con analisi AI (profilato se richiesto)"""
+    with profile_trigger.maybe_profile("sync_job"):
+        _run_sync_job(woo_clients, notion_client, synchronizer, ai_agent, notifier)
+
+def _run_sync_job(woo_clients, notion_client, synchronizer, ai_agent, notifier):
+    """Corpo del job di sincronizzazione"""
     try:
         logger.info("🔄 Inizio sincronizzazione stock...")
+        cycle_start = time.monotonic()
+        woo_calls_start = sum(client.api_calls for client in woo_clients)
+        notion_calls_start = notion_client.api_calls
+        woo_cache_start = [client.cache_summary() for client in woo_clients]
         
         # Sincronizzazione standard
         synchronizer.sync()
@@ -61,12 +92,14 @@ def sync_job(woo_client, notion_client, synchronizer, ai_agent, notifier):
         # ===== ANALISI AI =====
         logger.info("🤖 Avvio analisi AI...")
         
-        # Recupera dati per analisi
-        woo_products = woo_client.get_products()
-        notion_items = notion_client.get_all_items()
+        # Le analisi riusano catalogo e item Notion letti dal ciclo, senza rileggerli
+        woo_products, notion_items = synchronizer.take_cycle_data()
         
         # Analisi discrepanze
-        analysis_result = ai_agent.analyze_stock_discrepancies(woo_products, notion_items)
+        notifier.kpi.begin_cycle()
+        analysis_result = ai_agent.analyze_stock_discrepancies(woo_products, notion_items, kpi=notifier.kpi)
+        if 'error' not in analysis_result:
+            notifier.kpi.end_cycle()
         notifier.notify_discrepancies(analysis_result.get('discrepancies', []))
         
         # Rilevamento anomalie
@@ -81,7 +114,33 @@ def sync_job(woo_client, notion_client, synchronizer, ai_agent, notifier):
         sync_report = notifier.create_sync_report({
             'analysis': analysis_result,
             'anomalies': anomalies,
-            'suggestions': suggestions
+            'suggestions': suggestions,
+            'kpi': notifier.kpi.snapshot(),
+            'dead_letters': synchronizer.dead_letters_summary(),
+            'rows': dict(synchronizer.row_stats),
+            'tiers': synchronizer.tiers.summary(),
+            'cycle': {
+                'duration': time.monotonic() - cycle_start,
+                'api_calls': {
+                    'woocommerce': sum(client.api_calls for client in woo_clients) - woo_calls_start,
+                    'notion': notion_client.api_calls - notion_calls_start
+                },
+                'woo_cache': _sum_cache_summaries(
+                    client.cache_summary(since) for client, since in zip(woo_clients, woo_cache_start)
+                ),
+                'circuits': {
+                    **_per_store(woo_clients, lambda client: client.breaker.snapshot()),
+                    'notion': notion_client.breaker.snapshot()
+                },
+                'coalescing': {
+                    **_per_store(woo_clients, lambda client: client.coalescer.summary()),
+                    'notion': notion_client.coalescer.summary()
+                },
+                'concurrency': {
+                    **_per_store(woo_clients, lambda client: client.concurrency.snapshot()),
+                    'notion': notion_client.concurrency.snapshot()
+                }
+            }
         })
         logger.info(f"\n{sync_report}")
         
@@ -89,9 +148,194 @@ def sync_job(woo_client, notion_client, synchronizer, ai_agent, notifier):
         
     except Exception as e:
         logger.error(f"✗ Errore durante la sincronizzazione: {e}", exc_info=True)
+        circuits = ", ".join(f"{client.breaker.name} {client.breaker.snapshot()}" for client in woo_clients)
+        logger.info(f"🔌 Circuiti: {circuits}, Notion {notion_client.breaker.snapshot()}")
+
+def retry_job(synchronizer):
+    """Ritenta, tra un ciclo e l'altro, le righe fallite il cui backoff è scaduto"""
+    try:
+        synchronizer.retry_dead_letters()
+    except Exception as e:
+        logger.error(f"✗ Errore nel nuovo tentativo delle righe in coda: {e}", exc_info=True)
+
+def hot_job(synchronizer):
+    """Riconcilia la fascia calda (SKU movimentati o quasi esauriti) tra un ciclo completo e l'altro"""
+    try:
+        synchronizer.sync_hot()
+    except Exception as e:
+        logger.error(f"✗ Errore nella sincronizzazione della fascia calda: {e}", exc_info=True)
+
+def parse_args(argv=None):
+    """Legge gli argomenti della riga di comando"""
+    parser = argparse.ArgumentParser(description='Stock Management Sync - WooCommerce ↔ Notion')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    subparsers.add_parser('run', help='Avvia la sincronizzazione periodica (default)')
+    
+    sync_parser = subparsers.add_parser('sync', help='Riconcilia subito solo gli SKU indicati')
+    sync_parser.add_argument('--sku', action='append', default=[], help='SKU da riconciliare (ripetibile)')
+    sync_parser.add_argument('--file', help='File con gli SKU da riconciliare (uno per riga, # per i commenti)')
+    
+    bulk_parser = subparsers.add_parser('bulk-import', help='Primo popolamento del database Notion dal catalogo WooCommerce')
+    bulk_parser.add_argument('--workers', type=int, default=None, help='Creazioni Notion in parallelo (default: BULK_IMPORT_WORKERS o 4)')
+    bulk_parser.add_argument('--restart', action='store_true', help='Ignora il checkpoint e riparte da zero')
+    
+    plan_parser = subparsers.add_parser('plan', help='Sincronizzazione e analisi AI offline su uno snapshot (nessuna scrittura)')
+    plan_parser.add_argument('--snapshot', required=True, help='Cartella dello snapshot (scripts/debug_product_template.py --export)')
+    plan_parser.add_argument('--output', help='File JSON in cui salvare le scritture pianificate')
+    
+    history_parser = subparsers.add_parser('history', help='Stock riconciliato a un istante o storia di uno SKU')
+    history_parser.add_argument('--sku', help='SKU di cui mostrare le variazioni')
+    history_parser.add_argument('--at', help='Istante di cui mostrare lo stato (es. "2026-01-31 14:00")')
+    history_parser.add_argument('--since', help='Inizio dell\'intervallo per --sku (es. "2026-01-30")')
+    
+    args = parser.parse_args(argv)
+    args.command = args.command or 'run'
+    if args.command == 'history' and not (args.sku or args.at):
+        parser.error("history: indicare --sku o --at")
+    if args.command == 'sync' and not (args.sku or args.file):
+        parser.error("sync: indicare almeno uno SKU con --sku o --file")
+    return args
+
+def read_sku_file(path):
+    """Legge un elenco di SKU (uno per riga o separati da virgole, # per i commenti)"""
+    skus = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            skus.extend(sku.strip() for sku in line.split(',') if sku.strip())
+    return skus
+
+def run_targeted_sync(args):
+    """Riconcilia solo gli SKU indicati, senza leggere i cataloghi completi"""
+    skus = list(args.sku)
+    if args.file:
+        skus.extend(read_sku_file(args.file))
+    
+    logger.info(f"🎯 Stock Management Sync - Sincronizzazione mirata di {len(skus)} SKU")
+    started = time.monotonic()
+    woo_clients, notion_client, ai_agent, notifier = initialize_clients()
+    synchronizer = MultiStoreSynchronizer([
+        StockSynchronizer(woo_client, notion_client) for woo_client in woo_clients
+    ])
+    stats = synchronizer.sync_skus(skus)
+    logger.info(
+        f"✓ Sincronizzazione mirata completata in {time.monotonic() - started:.1f}s: "
+        f"{stats.get('synced', 0)} riconciliati, {stats.get('not_found', 0)} non trovati, {stats.get('errors', 0)} errori"
+    )
+    return stats
+
+def run_bulk_import(args):
+    """Esegue l'importazione massiva iniziale verso Notion"""
+    logger.info("🚚 Stock Management Sync - Importazione massiva")
+    woo_clients, notion_client, ai_agent, notifier = initialize_clients()
+    # L'importazione iniziale popola Notion dal negozio principale
+    synchronizer = StockSynchronizer(woo_clients[0], notion_client)
+    
+    importer = BulkImporter(synchronizer, workers=args.workers)
+    if args.restart:
+        importer.checkpoint.reset()
+    return importer.run()
+
+def run_plan(args):
+    """
+    Esegue sincronizzazione e analisi AI su uno snapshot, senza credenziali né rete
+    
+    Le scritture non partono: vengono raccolte nel piano. Lo stato persistente
+    (basi di merge, impronte, fasce) viene copiato in una cartella temporanea,
+    così il piano parte dallo stato reale senza modificarlo.
+    """
+    logger.info(f"🗺️  Stock Management Sync - Piano offline sullo snapshot {args.snapshot}")
+    snapshot = Snapshot(args.snapshot)
+    woo_client, notion_client = OfflineWooClient(snapshot), OfflineNotionClient(snapshot)
+    
+    state_dir = os.getenv('SYNC_STATE_DIR')
+    # Il database di archivio non è nello snapshot: il piano non archivia né ripristina
+    archive_database = os.environ.pop('NOTION_ARCHIVE_DATABASE_ID', None)
+    with tempfile.TemporaryDirectory(prefix="plan_state_") as plan_state:
+        source = state_dir or os.path.join('config', 'state')
+        if os.path.isdir(source):
+            shutil.copytree(source, plan_state, dirs_exist_ok=True)
+        os.environ['SYNC_STATE_DIR'] = plan_state
+        try:
+            synchronizer = StockSynchronizer(woo_client, notion_client)
+            synchronizer.sync()
+        finally:
+            if state_dir is None:
+                os.environ.pop('SYNC_STATE_DIR', None)
+            else:
+                os.environ['SYNC_STATE_DIR'] = state_dir
+            if archive_database is not None:
+                os.environ['NOTION_ARCHIVE_DATABASE_ID'] = archive_database
+    
+    ai_agent = AIAgent()
+    woo_products, notion_items = synchronizer.take_cycle_data()
+    analysis = ai_agent.analyze_stock_discrepancies(woo_products, notion_items)
+    anomalies = ai_agent.detect_anomalies(woo_products)
+    suggestions = ai_agent.generate_reorder_suggestions(woo_products)
+    
+    planned = woo_client.planned + notion_client.planned
+    operations = Counter(f"{entry['backend']}.{entry['operation']}" for entry in planned)
+    logger.info(f"🗺️  Scritture pianificate: {len(planned)} ({', '.join(f'{op}: {n}' for op, n in operations.most_common()) or 'nessuna'})")
+    logger.info(
+        f"🤖 Analisi sullo snapshot: {len(analysis.get('discrepancies', []))} discrepanze, "
+        f"{len(anomalies)} anomalie, {len(suggestions)} suggerimenti di riordino"
+    )
+    
+    plan = {
+        "snapshot": snapshot.index.get("created_at"),
+        "planned": planned,
+        "analysis": analysis,
+        "anomalies": anomalies,
+        "suggestions": suggestions
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False, indent=2, default=str)
+        logger.info(f"💾 Piano salvato in {args.output}")
+    return plan
+
+def run_history(args):
+    """Interroga lo storico dello stock riconciliato (SYNC_STATE_DIR/history)"""
+    history = StockHistory(state_path('history'))
+    if args.at:
+        when = datetime.fromisoformat(args.at).timestamp()
+        state = history.state_at(when)
+        if args.sku:
+            key = args.sku.strip().lower()
+            logger.info(f"🕰️  {args.sku} al {args.at}: {state.get(key, 'assente')}")
+            return {key: state.get(key)}
+        logger.info(f"🕰️  Stato al {args.at}: {len(state)} SKU")
+        for key, stock in sorted(state.items()):
+            logger.info(f"   {key}: {stock}")
+        return state
+    
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    changes = history.sku_history(args.sku, since=since)
+    logger.info(f"🕰️  Storia di {args.sku}: {len(changes)} variazioni")
+    for change in changes:
+        stock = change['stock'] if change['stock'] is not None else 'rimosso'
+        logger.info(f"   {datetime.fromtimestamp(change['time']).isoformat(sep=' ', timespec='seconds')}: {stock}")
+    return changes
 
-def main():
+def main(argv=None):
     """Funzione principale"""
+    args = parse_args(argv)
+    if args.command == 'bulk-import':
+        run_bulk_import(args)
+        return
+    if args.command == 'history':
+        run_history(args)
+        return
+    if args.command == 'plan':
+        run_plan(args)
+        return
+    if args.command == 'sync':
+        stats = run_targeted_sync(args)
+        if stats.get('errors') or stats.get('not_found'):
+            raise SystemExit(1)
+        return
+    
     logger.info("=" * 50)
     logger.info("🚀 Stock Management Sync - Avvio")
     logger.info("🤖 AI Agent abilitato")
@@ -99,11 +343,21 @@ def main():
     
     try:
         # Inizializza client
-        woo_client, notion_client, ai_agent, notifier = initialize_clients()
-        synchronizer = StockSynchronizer(woo_client, notion_client)
+        woo_clients, notion_client, ai_agent, notifier = initialize_clients()
+        synchronizer = MultiStoreSynchronizer([
+            StockSynchronizer(woo_client, notion_client) for woo_client in woo_clients
+        ])
+        profile_trigger.install()
+        
+        # API locale in sola lettura sullo stock sincronizzato (attiva solo con STOCK_API_PORT)
+        if int(os.getenv('STOCK_API_PORT') or 0) > 0:
+            try:
+                StockApiServer(synchronizer.stock_view).start()
+            except ValueError as e:
+                logger.error(f"✗ API stock non avviata: {e}")
         
         # Esegui sincronizzazione iniziale
-        sync_job(woo_client, notion_client, synchronizer, ai_agent, notifier)
+        sync_job(woo_clients, notion_client, synchronizer, ai_agent, notifier)
         
         # Configura sync periodico
         sync_interval = int(os.getenv('SYNC_INTERVAL', 300))
@@ -111,13 +365,23 @@ def main():
         
         schedule.every(sync_interval).seconds.do(
             sync_job, 
-            woo_client=woo_client, 
+            woo_clients=woo_clients, 
             notion_client=notion_client,
             synchronizer=synchronizer,
             ai_agent=ai_agent,
             notifier=notifier
         )
         
+        # Le righe fallite seguono un proprio backoff, indipendente dal ciclo completo
+        retry_interval = int(os.getenv('DLQ_RETRY_INTERVAL', 60))
+        schedule.every(retry_interval).seconds.do(retry_job, synchronizer=synchronizer)
+        
+        # Fascia calda: SKU movimentati o quasi esauriti riconciliati con lookup mirati
+        hot_interval = int(os.getenv('TIER_HOT_INTERVAL', 60))
+        if hot_interval > 0:
+            logger.info(f"🔥 Fascia calda ogni {hot_interval} secondi")
+            schedule.every(hot_interval).seconds.do(hot_job, synchronizer=synchronizer)
+        
         logger.info("✓ Scheduler avviato. In attesa di eseguire i job...")
         
         # Loop infinito per eseguire i job schedulati
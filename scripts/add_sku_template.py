@@ -10,16 +10,95 @@ NOTA: Questo è uno script di test/development. Per un uso specifico:
 Uso:
     python add_sku_template.py                    # Non sovrascrive SKU esistenti
     python add_sku_template.py --overwrite       # Sovrascrive anche SKU esistenti
+    python add_sku_template.py --restart         # Ignora il checkpoint e riparte dall'inizio
+
+Lo script scorre il catalogo pagina per pagina, legge le varianti dei prodotti
+variabili in parallelo e scrive gli SKU con gli endpoint batch (products/batch e
+variations/batch). Ogni pagina completata viene registrata in un checkpoint
+(SYNC_STATE_DIR/add_sku_template.jsonl): dopo un'interruzione si riprende da lì.
 """
 
 import os
+import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from sync.woocommerce_client import WooCommerceClient
+from sync.projection import woo_fields_param
+from sync.state import state_path
 
 # Carica variabili di ambiente
 load_dotenv()
 
+# Campi letti dallo script (proiezione delle letture API)
+PRODUCT_FIELDS = ("id", "name", "type", "sku")
+VARIANT_FIELDS = ("id", "sku")
+
+class SkuCheckpoint:
+    """
+    Checkpoint append-only (JSONL) delle pagine di prodotti già elaborate
+    
+    Alla ripresa si rilegge l'ultima pagina completata (il catalogo può essersi
+    spostato nel frattempo) saltando i prodotti già registrati. I prodotti
+    rifiutati da WooCommerce non vengono registrati: la ripresa riparte dalla
+    prima pagina che ne contiene ancora uno.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.last_page = 1
+        self.done = set()
+        self.rejected = {}
+        self._load()
+    
+    def _load(self):
+        """Rilegge il checkpoint esistente, ignorando un'eventuale ultima riga troncata"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.last_page = max(self.last_page, entry.get('page', 1))
+                self._record(entry.get('page', 1), entry.get('ids', []), entry.get('rejected', []))
+        if self.rejected:
+            self.last_page = min(self.rejected.values())
+    
+    def _record(self, page, ids, rejected):
+        self.done.update(ids)
+        for product_id in ids:
+            self.rejected.pop(product_id, None)
+        for product_id in rejected:
+            self.rejected.setdefault(product_id, page)
+    
+    def mark_page(self, page, ids, rejected=()):
+        """
+        Registra una pagina i cui SKU sono stati scritti
+        
+        Args:
+            page: Numero della pagina
+            ids: Prodotti elaborati con successo
+            rejected: Prodotti con almeno uno SKU rifiutato, da riprovare alla ripresa
+        """
+        rejected = sorted(rejected)
+        entry = {"page": page, "ids": ids}
+        if rejected:
+            entry["rejected"] = rejected
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+        self._record(page, ids, rejected)
+    
+    def reset(self):
+        """Cancella il checkpoint per ripartire da zero"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.last_page = 1
+        self.done.clear()
+        self.rejected.clear()
+
 def generate_sku(product_id, variant_id=None, prefix="PROD"):
     """
     Genera uno SKU con prefisso personalizzabile
@@ -40,12 +119,111 @@ def generate_sku(product_id, variant_id=None, prefix="PROD"):
     else:
         return f"{prefix}-{product_id}"
 
+def fetch_variations(woo, product_id):
+    """Legge tutte le varianti di un prodotto variabile (tutte le pagine)"""
+    params = {"per_page": 100, "_fields": woo_fields_param(VARIANT_FIELDS)}
+    return list(woo.iter_pages(f"products/{product_id}/variations", params))
+
+def count_batch_errors(updated):
+    """Elementi rifiutati da WooCommerce in una risposta batch"""
+    return sum(1 for item in updated if item.get('error'))
+
+def rejected_ids(updated, requested):
+    """
+    ID rifiutati da WooCommerce in una risposta batch
+    
+    Un elemento con errore senza ID non si può attribuire: in quel caso si
+    considerano rifiutati tutti gli ID richiesti.
+    """
+    rejected = set()
+    for item in updated:
+        if not item.get('error'):
+            continue
+        if not item.get('id'):
+            return set(requested)
+        rejected.add(item.get('id'))
+    return rejected
+
+def process_page(woo, executor, products, args, totals):
+    """
+    Assegna gli SKU di una pagina di prodotti e delle loro varianti
+    
+    Le varianti dei prodotti variabili vengono lette in parallelo; le scritture
+    sono una richiesta products/batch per la pagina e una variations/batch per
+    ogni prodotto variabile. Un errore di una richiesta batch interrompe lo script
+    (la pagina non viene registrata nel checkpoint e verrà ripresa).
+    
+    Returns:
+        ID dei prodotti con almeno uno SKU (del prodotto o di una variante) rifiutato
+    """
+    product_updates = []
+    for product in products:
+        existing_sku = product.get('sku', '')
+        if not existing_sku or args.overwrite:
+            product_updates.append({"id": product.get('id'), "sku": generate_sku(product.get('id'), prefix=args.prefix)})
+        else:
+            totals["skipped"] += 1
+    
+    variable = [product for product in products if product.get('type') == 'variable']
+    variation_updates = {}
+    for product, variants in zip(variable, executor.map(lambda product: fetch_variations(woo, product.get('id')), variable)):
+        product_id = product.get('id')
+        for variant in variants:
+            if not variant.get('sku') or args.overwrite:
+                variation_updates.setdefault(product_id, []).append(
+                    {"id": variant.get('id'), "sku": generate_sku(product_id, variant.get('id'), prefix=args.prefix)}
+                )
+            else:
+                totals["skipped"] += 1
+    
+    writes = []
+    if product_updates:
+        writes.append((None, executor.submit(woo.batch_update_products, product_updates)))
+    for product_id, updates in variation_updates.items():
+        writes.append((product_id, executor.submit(woo.batch_update_variations, product_id, updates)))
+    rejected = set()
+    for product_id, write in writes:
+        updated = write.result()
+        errors = count_batch_errors(updated)
+        totals["updated"] += len(updated) - errors
+        totals["errors"] += errors
+        if not errors:
+            continue
+        if product_id is None:
+            rejected |= rejected_ids(updated, [update["id"] for update in product_updates])
+        else:
+            rejected.add(product_id)
+    return rejected
+
+def flush_page(woo, executor, checkpoint, page, products, args, totals, processed):
+    """
+    Elabora una pagina di prodotti e la registra nel checkpoint
+    
+    I prodotti con SKU rifiutati restano fuori dal checkpoint e vengono
+    riprovati alla ripresa successiva.
+    
+    Returns:
+        Numero di prodotti elaborati (esclusi quelli già presenti nel checkpoint)
+    """
+    pending = [product for product in products if product.get('id') not in checkpoint.done]
+    if args.limit:
+        pending = pending[:max(0, args.limit - processed)]
+    if pending:
+        rejected = process_page(woo, executor, pending, args, totals)
+        checkpoint.mark_page(
+            page, [product.get('id') for product in pending if product.get('id') not in rejected], rejected
+        )
+    print(f"[pagina {page}] {len(pending)} prodotti elaborati, {totals['updated']} SKU scritti finora")
+    return len(pending)
+
 def main():
     # Argomenti della riga di comando
     parser = argparse.ArgumentParser(description='Aggiungi SKU automatici ai prodotti WooCommerce')
     parser.add_argument('--overwrite', action='store_true', help='Sovrascrive SKU esistenti')
     parser.add_argument('--prefix', default='PROD', help='Prefisso SKU (default: PROD)')
     parser.add_argument('--limit', type=int, default=None, help='Numero massimo prodotti da elaborare')
+    parser.add_argument('--workers', type=int, default=4, help='Letture/scritture WooCommerce in parallelo (default: 4)')
+    parser.add_argument('--restart', action='store_true', help='Ignora il checkpoint e riparte dalla prima pagina')
     args = parser.parse_args()
     
     # Inizializza il client WooCommerce
@@ -62,93 +240,53 @@ def main():
         print(f"📊 Limite prodotti: {args.limit}")
     print("="*80)
     
+    checkpoint = SkuCheckpoint(state_path('add_sku_template.jsonl'))
+    if args.restart:
+        checkpoint.reset()
+    elif checkpoint.done:
+        print(f"♻️  Ripresa dalla pagina {checkpoint.last_page} ({len(checkpoint.done)} prodotti già elaborati)")
+    
+    totals = {"updated": 0, "skipped": 0, "errors": 0}
+    processed = 0
+    
     try:
         woo = WooCommerceClient(api_url, consumer_key, consumer_secret)
         
-        # Recupera tutti i prodotti
-        print("\n📥 Recupero prodotti da WooCommerce...")
-        per_page = min(args.limit, 100) if args.limit else 100
-        products_response = woo._retry_request('get', 'products', params={"per_page": per_page})
-        
-        if not products_response:
-            print("❌ Nessun prodotto trovato!")
-            return
-        
-        products = products_response if isinstance(products_response, list) else [products_response]
-        
-        # Limita se necessario
-        if args.limit:
-            products = products[:args.limit]
+        # Ordine per ID stabile tra un'esecuzione e l'altra: le pagine del checkpoint restano valide
+        print("\n📥 Lettura prodotti da WooCommerce pagina per pagina...")
+        params = {
+            "per_page": 100, "page": checkpoint.last_page, "orderby": "id", "order": "asc",
+            "_fields": woo_fields_param(PRODUCT_FIELDS)
+        }
         
-        total_updated = 0
-        total_skipped = 0
-        total_errors = 0
-        
-        for idx, product in enumerate(products, 1):
-            product_id = product.get('id')
-            product_name = product.get('name', 'N/A')
-            product_type = product.get('type', 'simple')
-            existing_sku = product.get('sku', '')
-            
-            print(f"\n[{idx}/{len(products)}] 📦 {product_name} (ID: {product_id})")
-            
-            # Se il prodotto non ha SKU, aggiungilo (o se --overwrite è attivo)
-            if not existing_sku or args.overwrite:
-                sku = generate_sku(product_id, prefix=args.prefix)
-                
-                try:
-                    # TODO: Personalizza il metodo di update secondo il tuo client
-                    woo.update_product_data(existing_sku or sku, {"sku": sku})
-                    print(f"  ✅ SKU: {sku}")
-                    total_updated += 1
-                except Exception as e:
-                    print(f"  ❌ Errore: {e}")
-                    total_errors += 1
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            page, batch = checkpoint.last_page, []
+            for product in woo.iter_pages('products', params):
+                batch.append(product)
+                if len(batch) < params["per_page"]:
+                    continue
+                processed += flush_page(woo, executor, checkpoint, page, batch, args, totals, processed)
+                page, batch = page + 1, []
+                if args.limit and processed >= args.limit:
+                    break
             else:
-                print(f"  ⊘ Ha già SKU: {existing_sku}")
-                total_skipped += 1
-            
-            # Se è un prodotto variabile, gestisci le varianti
-            if product_type == 'variable':
-                try:
-                    variants = woo._retry_request(
-                        'get',
-                        f"products/{product_id}/variations",
-                        params={"per_page": 100}
-                    )
-                    variants = variants if isinstance(variants, list) else [variants]
-                    
-                    for variant in variants:
-                        variant_id = variant.get('id')
-                        variant_sku = variant.get('sku', '')
-                        
-                        if not variant_sku or args.overwrite:
-                            sku = generate_sku(product_id, variant_id, prefix=args.prefix)
-                            
-                            try:
-                                woo.update_product_data(variant_sku or sku, {"sku": sku})
-                                total_updated += 1
-                            except Exception as e:
-                                print(f"    ⚠️  Variante {variant_id}: {e}")
-                                total_errors += 1
-                        else:
-                            total_skipped += 1
-                            
-                except Exception as e:
-                    print(f"  ⚠️  Errore varianti: {e}")
-        
-        print(f"\n{'='*80}")
-        print(f"📊 RIEPILOGO")
-        print(f"{'='*80}")
-        print(f"✅ SKU aggiunti/aggiornati: {total_updated}")
-        print(f"⊘ SKU già presenti: {total_skipped}")
-        print(f"❌ Errori: {total_errors}")
-        print(f"{'='*80}\n")
+                if batch:
+                    processed += flush_page(woo, executor, checkpoint, page, batch, args, totals, processed)
         
     except Exception as e:
         print(f"❌ Errore critico: {e}")
+        print("♻️  Rilancia lo script per riprendere dall'ultima pagina completata")
         import traceback
         traceback.print_exc()
+    
+    print(f"\n{'='*80}")
+    print(f"📊 RIEPILOGO")
+    print(f"{'='*80}")
+    print(f"📦 Prodotti elaborati: {processed}")
+    print(f"✅ SKU aggiunti/aggiornati: {totals['updated']}")
+    print(f"⊘ SKU già presenti: {totals['skipped']}")
+    print(f"❌ Errori: {totals['errors']}")
+    print(f"{'='*80}\n")
 
 if __name__ == '__main__':
     main()
@@ -10,18 +10,34 @@ Uso:
     python debug_product_template.py --sku=ABC    # Ispeziona prodotto con SKU specifico
     python debug_product_template.py --id=123     # Ispeziona prodotto con ID specifico
     python debug_product_template.py --limit=10   # Ispeziona primissimi 10 prodotti
+    python debug_product_template.py --full       # Scarica il payload completo (senza proiezione)
+    python debug_product_template.py --export=snap    # Esporta catalogo e database Notion in uno snapshot
+    python debug_product_template.py --snapshot=snap --sku=ABC   # Ispeziona offline, senza credenziali
 """
 
 import os
 import json
 import argparse
+from itertools import islice
 from dotenv import load_dotenv
 from sync.woocommerce_client import WooCommerceClient
+from sync.projection import woo_fields_param
+from sync.notion_client import NotionClient
+from sync.snapshot import Snapshot, OfflineWooClient, export_snapshot
 
 # Carica variabili di ambiente
 load_dotenv()
 
-def print_product_info(product, woo_client=None):
+# Campi mostrati dallo script (usa --full per scaricare il payload completo)
+PRODUCT_FIELDS = ("id", "name", "type", "sku", "price", "stock_quantity", "status", "attributes", "meta_data")
+VARIANT_FIELDS = ("id", "sku", "price", "stock_quantity", "attributes")
+
+def fields_params(fields, full=False):
+    """Parametri `_fields` per le letture dello script (vuoti con --full)"""
+    fields_param = None if full else woo_fields_param(fields)
+    return {"_fields": fields_param} if fields_param else {}
+
+def print_product_info(product, woo_client=None, full=False):
     """Stampa informazioni dettagliate su un prodotto"""
     
     product_id = product.get('id')
@@ -65,12 +81,16 @@ def print_product_info(product, woo_client=None):
         print("🎨 VARIANTI:")
         print(f"{'─'*80}")
         try:
-            variants = woo_client._retry_request(
-                'get', 
-                f"products/{product_id}/variations", 
-                params={"per_page": 5}
-            )
-            variants = variants if isinstance(variants, list) else [variants]
+            if '_variants' in product:
+                # Prodotto da snapshot: varianti già incluse
+                variants = product['_variants'][:5]
+            else:
+                variants = woo_client._retry_request(
+                    'get', 
+                    f"products/{product_id}/variations", 
+                    params={"per_page": 5, **fields_params(VARIANT_FIELDS, full)}
+                )
+                variants = variants if isinstance(variants, list) else [variants]
             
             for v_idx, variant in enumerate(variants, 1):
                 v_id = variant.get('id')
@@ -105,6 +125,9 @@ def main():
     parser.add_argument('--sku', help='Cerca prodotto per SKU')
     parser.add_argument('--id', type=int, help='Cerca prodotto per ID')
     parser.add_argument('--limit', type=int, default=5, help='Numero di prodotti da mostrare (default: 5)')
+    parser.add_argument('--full', action='store_true', help='Scarica il payload completo invece dei soli campi mostrati')
+    parser.add_argument('--export', metavar='DIR', help='Esporta catalogo (con varianti) e database Notion in uno snapshot JSONL compresso')
+    parser.add_argument('--snapshot', metavar='DIR', help='Legge i prodotti da uno snapshot invece che da WooCommerce (offline)')
     args = parser.parse_args()
     
     # Inizializza il client WooCommerce
@@ -117,30 +140,54 @@ def main():
     print("="*80)
     
     try:
-        woo = WooCommerceClient(api_url, consumer_key, consumer_secret)
+        if args.export:
+            # Snapshot completo: WooCommerce sempre, Notion se configurato
+            woo = WooCommerceClient(api_url, consumer_key, consumer_secret)
+            notion = None
+            if os.getenv('NOTION_TOKEN') and os.getenv('NOTION_DATABASE_ID'):
+                notion = NotionClient(token=os.getenv('NOTION_TOKEN'), database_id=os.getenv('NOTION_DATABASE_ID'))
+            index = export_snapshot(woo, notion, args.export)
+            print(f"\n💾 Snapshot salvato in {args.export}: {index['files']['woocommerce']['rows']} prodotti"
+                  f", {index['files']['notion']['rows'] if 'notion' in index['files'] else 0} item Notion")
+            return
+        
+        if args.snapshot:
+            woo = OfflineWooClient(Snapshot(args.snapshot))
+            print(f"📦 Modalità offline: snapshot {args.snapshot} del {woo.snapshot.index.get('created_at')}")
+        else:
+            woo = WooCommerceClient(api_url, consumer_key, consumer_secret)
         
         if args.sku:
             # Cerca per SKU
             print(f"\n🔍 Ricerca prodotto con SKU: {args.sku}")
-            product = woo.get_product_by_sku(args.sku)
+            product = woo.get_product_by_sku(args.sku, fields=None if args.full else PRODUCT_FIELDS)
             if product:
-                print_product_info(product, woo)
+                print_product_info(product, woo, args.full)
             else:
                 print(f"❌ Prodotto con SKU '{args.sku}' non trovato!")
         
         elif args.id:
             # Cerca per ID
             print(f"\n🔍 Ricerca prodotto con ID: {args.id}")
-            product = woo._retry_request('get', f'products/{args.id}')
+            if args.snapshot:
+                product = woo.get_product_by_id(args.id)
+            else:
+                product = woo._retry_request('get', f'products/{args.id}', params=fields_params(PRODUCT_FIELDS, args.full) or None)
             if product:
-                print_product_info(product, woo)
+                print_product_info(product, woo, args.full)
             else:
                 print(f"❌ Prodotto con ID {args.id} non trovato!")
         
         else:
             # Mostra i primi N prodotti
             print(f"\n📥 Recupero primi {args.limit} prodotti da WooCommerce...")
-            products_response = woo._retry_request('get', 'products', params={"per_page": args.limit})
+            if args.snapshot:
+                products_response = list(islice(woo.iter_products(), args.limit))
+            else:
+                products_response = woo._retry_request(
+                    'get', 'products',
+                    params={"per_page": args.limit, **fields_params(PRODUCT_FIELDS, args.full)}
+                )
             
             if not products_response:
                 print("❌ Nessun prodotto trovato!")
@@ -152,7 +199,7 @@ def main():
                 print(f"\n\n{'#'*80}")
                 print(f"PRODOTTO {idx} di {len(products)}")
                 print(f"{'#'*80}")
-                print_product_info(product, woo)
+                print_product_info(product, woo, args.full)
         
         print(f"\n\n{'='*80}")
         print("✅ Debug completato!")
@@ -2,10 +2,16 @@ import os
 from loguru import logger
 from typing import Dict, List
 from datetime import datetime
+from sync.notion_schema import NotionRecord
 
 class AIAgent:
     """Agent AI per analisi intelligente dello stock e rilevamento anomalie"""
     
+    # Campi usati dalle analisi: il ciclo di sincronizzazione li legge insieme ai propri
+    # (StockSynchronizer.WOO_FIELDS e NOTION_PROPERTIES) e li passa alle analisi
+    WOO_FIELDS = ("id", "sku", "name", "stock_quantity", "price", "status")
+    NOTION_PROPERTIES = ("SKU", "Stock")
+    
     def __init__(self):
         """Inizializza l'AI Agent"""
         # Nota: Puoi integrare OpenAI, Anthropic o altri LLM
@@ -13,13 +19,14 @@ class AIAgent:
         self.model = os.getenv('AI_MODEL', 'local')
         logger.info(f"✓ AI Agent inizializzato (Modalità: {self.model})")
     
-    def analyze_stock_discrepancies(self, woo_products: List[Dict], notion_items: List[Dict]) -> Dict:
+    def analyze_stock_discrepancies(self, woo_products: List[Dict], notion_items: List[NotionRecord], kpi=None) -> Dict:
         """
         Analizza le discrepanze di stock tra WooCommerce e Notion
         
         Args:
             woo_products: Lista prodotti WooCommerce
-            notion_items: Lista item Notion
+            notion_items: Lista item Notion (NotionRecord)
+            kpi: KPIAggregator da aggiornare con ogni SKU osservato (opzionale)
             
         Returns:
             Dict con analisi delle discrepanze
@@ -38,30 +45,35 @@ class AIAgent:
             woo_map = {p.get('sku', ''): p for p in woo_products if p.get('sku')}
             
             for item in notion_items:
-                sku = self._extract_sku(item)
-                stock_notion = self._extract_stock(item)
+                sku = item.sku
+                stock_notion = int(item.stock or 0)
                 
                 if not sku:
                     continue
                 
                 woo_product = woo_map.get(sku)
+                severity = None
                 
                 if woo_product:
                     stock_woo = woo_product.get('stock_quantity', 0)
                     
                     # Analizza discrepanze
                     if stock_notion != stock_woo:
+                        severity = self._calculate_severity(stock_woo, stock_notion)
                         discrepancy = {
                             "sku": sku,
                             "product_name": woo_product.get('name'),
                             "stock_woo": stock_woo,
                             "stock_notion": stock_notion,
                             "difference": abs(stock_notion - stock_woo),
-                            "severity": self._calculate_severity(stock_woo, stock_notion)
+                            "severity": severity
                         }
                         discrepancies.append(discrepancy)
                 else:
                     summary["warnings"].append(f"⚠️  SKU {sku} trovato in Notion ma non in WooCommerce")
+                
+                if kpi is not None:
+                    kpi.observe(sku, stock_notion, severity)
             
             summary["discrepancies"] = discrepancies
             
@@ -258,7 +270,7 @@ class AIAgent:
         else:
             return "MEDIUM"
     
-    def _generate_insights(self, woo_products: List[Dict], notion_items: List[Dict]) -> List[str]:
+    def _generate_insights(self, woo_products: List[Dict], notion_items: List[NotionRecord]) -> List[str]:
         """Genera insight intelligenti sui dati"""
         insights = []
         
@@ -283,25 +295,3 @@ class AIAgent:
             logger.warning(f"⚠️  Errore nella generazione insight: {e}")
         
         return insights
-    
-    def _extract_sku(self, notion_item: Dict) -> str:
-        """Estrae SKU da item Notion"""
-        try:
-            properties = notion_item.get('properties', {})
-            sku_prop = properties.get('SKU', {})
-            if sku_prop.get('type') == 'rich_text':
-                return sku_prop.get('rich_text', [{}])[0].get('text', {}).get('content', '')
-            return ''
-        except:
-            return ''
-    
-    def _extract_stock(self, notion_item: Dict) -> int:
-        """Estrae stock da item Notion"""
-        try:
-            properties = notion_item.get('properties', {})
-            stock_prop = properties.get('Stock', {})
-            if stock_prop.get('type') == 'number':
-                return int(stock_prop.get('number', 0) or 0)
-            return 0
-        except:
-            return 0
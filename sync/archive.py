@@ -0,0 +1,324 @@
+import json
+import os
+import threading
+import time
+from loguru import logger
+from typing import Dict, Iterable, List, Optional, Set
+from sync.circuit_breaker import CircuitOpenError
+from sync.notion_schema import NotionRecord
+
+def _text(parts: List[Dict]) -> List[Dict]:
+    """Testo (title o rich_text) riscritto come semplici segmenti di testo"""
+    return [
+        {"type": "text", "text": {"content": part.get('plain_text') or part.get('text', {}).get('content', '')}}
+        for part in parts or []
+    ]
+
+def _option(value: Optional[Dict]) -> Optional[Dict]:
+    """Opzione di una select o di uno status, per nome"""
+    return {"name": value["name"]} if value and value.get("name") else None
+
+# Tipo di proprietà Notion scrivibile -> conversione dal valore letto al valore da scrivere
+WRITABLE_PROPERTIES = {
+    "title": _text,
+    "rich_text": _text,
+    "number": lambda value: value,
+    "checkbox": lambda value: bool(value),
+    "url": lambda value: value,
+    "email": lambda value: value,
+    "phone_number": lambda value: value,
+    "date": lambda value: value,
+    "select": _option,
+    "status": _option,
+    "multi_select": lambda values: [{"name": value["name"]} for value in values or []],
+    "people": lambda values: [{"id": value["id"]} for value in values or []],
+    "relation": lambda values: [{"id": value["id"]} for value in values or []],
+}
+
+class SkuArchive:
+    """
+    Archiviazione automatica degli SKU inattivi in un database Notion separato
+    
+    Uno SKU è inattivo se ha stock zero su Notion e su ogni negozio, nessun negozio
+    lo pubblica e lo stock riconciliato non cambia da `inactive_days` giorni: la sua
+    pagina viene spostata nel database di archivio e il ciclo completo smette di
+    sincronizzarlo, così letture e analisi del database principale non lo pagano
+    più. Appena un negozio lo ripubblica o gli ridà stock, la pagina torna nel
+    database principale.
+    
+    Notion non sposta pagine tra database: lo spostamento copia le proprietà
+    scrivibili nel database di destinazione e mette la pagina di origine nel cestino.
+    Se il cestino fallisce la copia resta valida: la pagina di origine viene
+    ricordata e i cicli successivi ritentano solo il cestino, senza nuove copie.
+    """
+    
+    def __init__(self, notion, archive_notion, path: str, inactive_days: float = None, max_per_cycle: int = None):
+        """
+        Args:
+            notion: Client Notion del database principale
+            archive_notion: Client Notion del database di archivio
+            path: Percorso del file JSON dello stato dell'archivio
+            inactive_days: Giorni senza movimenti prima dell'archiviazione (default: ARCHIVE_INACTIVE_DAYS o 90)
+            max_per_cycle: Pagine archiviate al massimo per ciclo, per restare nei
+                rate limit (default: ARCHIVE_MAX_PER_CYCLE o 50)
+        """
+        self.notion = notion
+        self.archive_notion = archive_notion
+        self.path = path
+        self.inactive_days = inactive_days or float(os.getenv('ARCHIVE_INACTIVE_DAYS', 90))
+        self.max_per_cycle = max_per_cycle or int(os.getenv('ARCHIVE_MAX_PER_CYCLE', 50))
+        # SKU normalizzato -> {"sku", "page_id" (nel database di archivio), "archived_at"}
+        self._archived: Dict[str, Dict] = {}
+        # SKU normalizzato -> {"stock", "since"}: ultimo stock riconciliato e da quando non cambia
+        self._activity: Dict[str, Dict] = {}
+        # SKU archiviati tornati attivi nel ciclo corrente, da ripristinare
+        self.returning: Set[str] = set()
+        # page_id -> database ("main" o "archive") delle pagine già copiate ma non ancora nel cestino
+        self._pending_trash: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+    
+    @classmethod
+    def from_env(cls, notion, path: str) -> Optional['SkuArchive']:
+        """Archivio configurato con NOTION_ARCHIVE_DATABASE_ID (None se non impostato)"""
+        database_id = os.getenv('NOTION_ARCHIVE_DATABASE_ID')
+        if not database_id:
+            return None
+        return cls(notion, notion.for_database(database_id), path)
+    
+    def _load(self):
+        """Rilegge lo stato salvato (un file illeggibile equivale a un archivio vuoto)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._archived = data.get("archived", {})
+            self._activity = data.get("activity", {})
+            self._pending_trash = data.get("trash", {})
+            logger.debug(f"✓ Stato dell'archivio caricato ({len(self._archived)} SKU archiviati)")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Stato dell'archivio non leggibile, verrà ricreato: {e}")
+            self._archived, self._activity, self._pending_trash = {}, {}, {}
+    
+    def is_archived(self, key: str) -> bool:
+        """True se la pagina dello SKU è nel database di archivio"""
+        return key in self._archived
+    
+    def active(self, keys: Iterable[str]) -> List[str]:
+        """SKU normalizzati non archiviati"""
+        return [key for key in keys if key not in self._archived]
+    
+    @staticmethod
+    def is_inactive(rows: List[Dict]) -> bool:
+        """True se nessun negozio pubblica lo SKU né ha stock (righe dello SKU per negozio)"""
+        return all(int(row["stock"] or 0) == 0 and row.get("status", "publish") != "publish" for row in rows)
+    
+    def begin_cycle(self, rows: Dict[str, List[Dict]]):
+        """
+        Individua gli SKU archiviati tornati attivi (pubblicati o con stock su almeno un negozio)
+        
+        Args:
+            rows: SKU normalizzato -> righe del catalogo di ogni negozio che lo ha
+        """
+        for page_id, side in list(self._pending_trash.items()):
+            self._trash(page_id, side)
+        self.returning = {key for key in self._archived if key in rows and not self.is_inactive(rows[key])}
+        if self.returning:
+            logger.info(f"📤 {len(self.returning)} SKU archiviati tornati attivi: verranno ripristinati")
+    
+    def _idle_since(self, key: str, stock: int, now: float) -> float:
+        """Registra lo stock riconciliato dello SKU e ritorna da quando non cambia"""
+        entry = self._activity.get(key)
+        if entry is None or entry["stock"] != stock:
+            self._activity[key] = entry = {"stock": stock, "since": now}
+            self._dirty = True
+        return entry["since"]
+    
+    def archive_inactive(self, rows: Dict[str, List[Dict]], notion_index: Dict[str, NotionRecord]) -> int:
+        """
+        Sposta nell'archivio le pagine degli SKU inattivi da almeno `inactive_days`
+        
+        Va eseguito a fine ciclo completo, dopo le scritture su Notion.
+        
+        Args:
+            rows: SKU normalizzato -> righe del catalogo di ogni negozio che lo ha
+            notion_index: SKU normalizzato -> item del database principale
+        
+        Returns:
+            Numero di pagine archiviate
+        """
+        now = time.time()
+        cutoff = now - self.inactive_days * 86400
+        candidates = []
+        with self._lock:
+            for key, store_rows in rows.items():
+                record = notion_index.get(key)
+                if key in self._archived or record is None or record.stock is None:
+                    continue
+                since = self._idle_since(key, int(record.stock), now)
+                if record.stock == 0 and since <= cutoff and self.is_inactive(store_rows):
+                    candidates.append((since, key, record))
+            # Dimentica gli SKU spariti dal catalogo (quelli archiviati restano)
+            stale = [key for key in self._activity if key not in rows]
+            for key in stale:
+                del self._activity[key]
+            self._dirty = self._dirty or bool(stale)
+        
+        moved = 0
+        # Prima gli SKU fermi da più tempo
+        for since, key, record in sorted(candidates, key=lambda item: item[0])[:self.max_per_cycle]:
+            log = logger.bind(sku=record.sku)
+            try:
+                page = self._move(record.page_id, "main", "archive")
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                log.warning("⚠️  Archiviazione di {} non riuscita: {}", record.sku, e)
+                continue
+            notion_index.pop(key, None)
+            with self._lock:
+                self._archived[key] = {"sku": record.sku, "page_id": page["id"], "archived_at": now}
+                if record.page_id in self._pending_trash:
+                    # Pagina principale non ancora nel cestino: un ripristino la riusa
+                    self._archived[key]["main_page_id"] = record.page_id
+                self._activity.pop(key, None)
+                self._dirty = True
+            moved += 1
+            log.info("🗄️  Archiviato {}: fermo da {:.0f} giorni", record.sku, (now - since) / 86400)
+        
+        if len(candidates) > moved:
+            logger.info(f"🗄️  {len(candidates) - moved} SKU inattivi restano da archiviare nei prossimi cicli")
+        return moved
+    
+    def restore(self, key: str, stock: int) -> Optional[Dict]:
+        """
+        Riporta nel database principale la pagina archiviata di uno SKU
+        
+        Args:
+            key: SKU normalizzato
+            stock: Stock attuale su WooCommerce (la pagina archiviata è ferma a zero)
+        
+        Returns:
+            Pagina nel database principale (creata, o quella originale se non era
+            ancora finita nel cestino), o None se la pagina archiviata
+            non esiste più (lo SKU viene dimenticato e il ciclo lo ricrea da zero)
+        """
+        entry = self._archived[key]
+        main_page_id = entry.get("main_page_id")
+        if main_page_id in self._pending_trash:
+            # La pagina principale non è mai finita nel cestino: basta eliminare la copia archiviata
+            with self._lock:
+                del self._pending_trash[main_page_id]
+                del self._archived[key]
+                self.returning.discard(key)
+                self._dirty = True
+            self.notion.update_item_stock(main_page_id, int(stock))
+            self._trash(entry["page_id"], "archive")
+            logger.bind(sku=entry["sku"]).info("📤 Ripristinato dall'archivio: {} (stock {})", entry["sku"], stock)
+            return {"id": main_page_id}
+        try:
+            page = self._move(entry["page_id"], "archive", "main", {"Stock": {"number": int(stock)}})
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if getattr(e, 'status', None) != 404:
+                raise
+            logger.bind(sku=entry["sku"]).warning("⚠️  Pagina archiviata di {} non trovata: verrà ricreata", entry["sku"])
+            page = None
+        with self._lock:
+            del self._archived[key]
+            self.returning.discard(key)
+            self._dirty = True
+        if page is not None:
+            logger.bind(sku=entry["sku"]).info("📤 Ripristinato dall'archivio: {} (stock {})", entry["sku"], stock)
+        return page
+    
+    def _client(self, side: str):
+        """Client del database principale ("main") o di archivio ("archive")"""
+        return self.notion if side == "main" else self.archive_notion
+    
+    def _move(self, page_id: str, source: str, target: str, overrides: Dict = None) -> Dict:
+        """
+        Sposta una pagina da un database all'altro (copia, poi cestino)
+        
+        Args:
+            page_id: Pagina da spostare
+            source: Database di origine ("main" o "archive")
+            target: Database di destinazione ("main" o "archive")
+            overrides: Proprietà da scrivere al posto di quelle copiate
+        
+        Returns:
+            Pagina creata nel database di destinazione (anche se il cestino
+            dell'origine è fallito ed è stato rinviato, vedi _trash)
+        """
+        page = self._client(source).retrieve_page(page_id)
+        target_client = self._client(target)
+        properties = self._copy_properties(page, target_client)
+        properties.update(overrides or {})
+        created = target_client.create_item(properties)
+        # Da qui la copia esiste: un cestino fallito si ritenta da solo, senza rifare la copia
+        self._trash(page_id, source)
+        return created
+    
+    def _trash(self, page_id: str, side: str) -> bool:
+        """
+        Mette una pagina nel cestino, o la ricorda per ritentare al prossimo ciclo
+        
+        Returns:
+            True se la pagina è nel cestino (o non esiste più)
+        """
+        try:
+            self._client(side).trash_item(page_id)
+        except Exception as e:
+            if getattr(e, 'status', None) != 404:
+                with self._lock:
+                    self._pending_trash[page_id] = side
+                    self._dirty = True
+                logger.warning(f"⚠️  Pagina {page_id} non spostata nel cestino, verrà ritentato al prossimo ciclo: {e}")
+                return False
+        with self._lock:
+            if self._pending_trash.pop(page_id, None) is not None:
+                self._dirty = True
+        return True
+    
+    @staticmethod
+    def _copy_properties(page: Dict, target) -> Dict:
+        """
+        Proprietà scrivibili di una pagina, limitate a quelle presenti con lo stesso
+        tipo nel database di destinazione (senza schema le copia tutte)
+        """
+        target.refresh_schema_if_stale()
+        schema = target.schema.properties if target.schema is not None else None
+        properties = {}
+        for name, prop in page.get('properties', {}).items():
+            prop_type = prop.get('type')
+            convert = WRITABLE_PROPERTIES.get(prop_type)
+            if convert is None or (schema is not None and schema.get(name, {}).get('type') != prop_type):
+                continue
+            value = convert(prop.get(prop_type))
+            if prop_type == 'select' and value:
+                # Le opzioni mancanti nella destinazione vengono create, come nel ciclo completo
+                target.ensure_select_options(name, [value["name"]])
+                option = target.select_value(name, value["name"])
+                value = {"name": option} if option else None
+            properties[name] = {prop_type: value}
+        return properties
+    
+    def summary(self) -> Dict:
+        """Numero di SKU archiviati (per il report)"""
+        return {"archived": len(self._archived)}
+    
+    def save(self):
+        """Salva lo stato dell'archivio su disco se è cambiato"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                    json.dump({"archived": self._archived, "activity": self._activity, "trash": self._pending_trash}, f)
+                os.replace(self.path + ".tmp", self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"⚠️  Impossibile salvare lo stato dell'archivio: {e}")
@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from typing import Dict, List, Set
+from sync.state import state_path
+
+class ImportCheckpoint:
+    """
+    Checkpoint append-only (JSONL) dell'importazione massiva
+    
+    Ogni pagina creata e ogni blocco di SKU scritti su WooCommerce viene
+    registrato subito: dopo un crash l'importazione riprende da dove si era fermata.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Percorso del file di checkpoint
+        """
+        self.path = path
+        self.created: Dict[str, str] = {}
+        self.backfilled: Set[str] = set()
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        """Rilegge il checkpoint esistente, ignorando un'eventuale ultima riga troncata"""
+        if not os.path.exists(self.path):
+            return
+        
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('event') == 'created':
+                    self.created[entry['sku']] = entry.get('page_id')
+                elif entry.get('event') == 'backfilled':
+                    self.backfilled.update(entry.get('skus', []))
+        
+        logger.info(f"♻️  Checkpoint importazione: {len(self.created)} item già creati, {len(self.backfilled)} SKU già scritti")
+    
+    def _append(self, entry: Dict):
+        """Aggiunge una riga al checkpoint e la scrive subito su disco"""
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+    
+    def mark_created(self, sku: str, page_id: str):
+        """Registra la creazione di un item Notion"""
+        self._append({"event": "created", "sku": sku, "page_id": page_id})
+        self.created[sku] = page_id
+    
+    def mark_backfilled(self, skus: List[str]):
+        """Registra gli SKU generati già scritti su WooCommerce"""
+        self._append({"event": "backfilled", "skus": skus})
+        self.backfilled.update(skus)
+    
+    def reset(self):
+        """Cancella il checkpoint per ripartire da zero"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.created.clear()
+        self.backfilled.clear()
+
+class BulkImporter:
+    """
+    Importazione massiva del catalogo WooCommerce in un database Notion
+    
+    Pensata per il primo popolamento: niente lookup riga per riga (il database
+    è vuoto o viene indicizzato una sola volta) e creazione delle pagine tramite
+    una pipeline concorrente limitata, al ritmo massimo concesso dal rate limiter Notion.
+    """
+    
+    # Righe per blocco: le opzioni select mancanti di un blocco si creano con una sola modifica dello schema
+    BATCH_SIZE = 100
+    
+    def __init__(self, synchronizer, checkpoint_path: str = None, workers: int = None):
+        """
+        Inizializza l'importatore
+        
+        Args:
+            synchronizer: StockSynchronizer (fornisce client ed estrazione dei campi)
+            checkpoint_path: Percorso del checkpoint (default: SYNC_STATE_DIR/bulk_import.jsonl)
+            workers: Creazioni Notion in parallelo (default: BULK_IMPORT_WORKERS o 4)
+        """
+        self.synchronizer = synchronizer
+        self.woo = synchronizer.woo
+        self.notion = synchronizer.notion
+        self.workers = workers or int(os.getenv('BULK_IMPORT_WORKERS', 4))
+        self.checkpoint = ImportCheckpoint(checkpoint_path or state_path('bulk_import.jsonl'))
+        self._stats_lock = threading.Lock()
+    
+    def _existing_skus(self) -> Set[str]:
+        """SKU già presenti in Notion: nessuna lettura se il database è vuoto"""
+        if self.notion.is_empty():
+            logger.info("📭 Database Notion vuoto - nessun lookup necessario")
+            return set()
+        
+        logger.info("📇 Indicizzazione degli SKU già presenti in Notion...")
+        records = self.notion.get_all_records(("SKU",))
+        return {self.synchronizer._normalize_sku(record.sku) for record in records if record.sku}
+    
+    def run(self) -> Dict:
+        """
+        Esegue l'importazione
+        
+        Returns:
+            Dict con conteggi: created, skipped, errors, backfilled
+        """
+        stats = {"created": 0, "skipped": 0, "errors": 0, "backfilled": 0}
+        known = self._existing_skus()
+        known.update(self.synchronizer._normalize_sku(sku) for sku in self.checkpoint.created)
+        
+        logger.info(f"🚚 Importazione massiva avviata ({self.workers} worker, {len(known)} SKU già presenti)")
+        
+        # Limita il numero di creazioni in coda: la lettura del catalogo procede
+        # di pari passo con le scritture senza accumulare l'intero catalogo in memoria
+        window = threading.BoundedSemaphore(self.workers * 2)
+        categories: Set[str] = set()
+        batch: List[Dict] = []
+        
+        def create(row: Dict):
+            try:
+                properties = self.synchronizer._build_notion_properties(
+                    row["name"], row["sku"], row["stock"], row["brand"], row["price"], row["categories"]
+                )
+                page = self.notion.create_item(properties)
+                self.checkpoint.mark_created(row["sku"], page['id'])
+                with self._stats_lock:
+                    stats["created"] += 1
+                    if stats["created"] % 100 == 0:
+                        logger.info(f"📈 Importazione: {stats['created']} item creati")
+            except Exception as e:
+                logger.error(f"✗ Errore nella creazione di {row['sku']}: {e}")
+                with self._stats_lock:
+                    stats["errors"] += 1
+            finally:
+                window.release()
+        
+        def submit_batch(executor: ThreadPoolExecutor):
+            # Categorie nuove del blocco create prima delle pagine che le usano
+            new_categories = {row["categories"] for row in batch} - categories
+            if new_categories:
+                self.notion.ensure_select_options("Category", new_categories)
+                categories.update(new_categories)
+            for row in batch:
+                window.acquire()
+                executor.submit(create, row)
+            batch.clear()
+        
+        products = self.woo.iter_products(
+            include_variants=True,
+            fields=self.synchronizer.WOO_FIELDS,
+            variant_fields=self.synchronizer.WOO_VARIANT_FIELDS
+        )
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for row in self.synchronizer._iter_rows(products):
+                key = self.synchronizer._normalize_sku(row["sku"])
+                if not key or key in known:
+                    stats["skipped"] += 1
+                    continue
+                known.add(key)
+                batch.append(row)
+                if len(batch) >= self.BATCH_SIZE:
+                    submit_batch(executor)
+            submit_batch(executor)
+        
+        stats["backfilled"] = self._backfill_generated_skus()
+        
+        logger.info(
+            f"✓ Importazione massiva completata: {stats['created']} creati, {stats['skipped']} saltati, "
+            f"{stats['errors']} errori, {stats['backfilled']} SKU scritti su WooCommerce"
+        )
+        return stats
+    
+    def _backfill_generated_skus(self) -> int:
+        """Scrive su WooCommerce, in batch, gli SKU ADIVO assegnati durante l'importazione"""
+        pending = [
+            sku for sku in self.checkpoint.created
+            if sku.startswith('ADIVO-') and sku not in self.checkpoint.backfilled
+        ]
+        if not pending:
+            return 0
+        
+        logger.info(f"🏷️  Scrittura batch di {len(pending)} SKU generati su WooCommerce...")
+        try:
+            written = self.woo.backfill_generated_skus(pending)
+            self.checkpoint.mark_backfilled(written)
+            if len(written) < len(pending):
+                logger.warning(f"⚠️  {len(pending) - len(written)} SKU rifiutati da WooCommerce, verranno riprovati al prossimo avvio")
+            return len(written)
+        except Exception as e:
+            logger.warning(f"⚠️  Scrittura SKU su WooCommerce non completata, verrà ripresa al prossimo avvio: {e}")
+            return 0
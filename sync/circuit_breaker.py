@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from collections import deque
+from loguru import logger
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Chiamata rifiutata perché il circuito del backend è aperto"""
+
+class CircuitBreaker:
+    """
+    Circuit breaker per un backend (WooCommerce o Notion)
+    
+    Tiene l'esito delle ultime `window` chiamate: quando la percentuale di fallimenti
+    supera `failure_rate` il circuito si apre e le chiamate successive falliscono
+    subito con CircuitOpenError, senza timeout né retry. Dopo `open_seconds` il
+    circuito passa a semiaperto e lascia passare `half_open_probes` chiamate di
+    prova: se riescono si richiude, altrimenti si riapre.
+    """
+    
+    def __init__(self, name: str, failure_rate: float = None, min_calls: int = None, window: int = None,
+                 open_seconds: float = None, half_open_probes: int = None):
+        """
+        Inizializza il circuit breaker
+        
+        Args:
+            name: Nome del backend (per log e report)
+            failure_rate: Quota di fallimenti che apre il circuito (default: CIRCUIT_FAILURE_RATE o 0.5)
+            min_calls: Chiamate minime osservate prima di poter aprire (default: CIRCUIT_MIN_CALLS o 10)
+            window: Numero di esiti considerati (default: CIRCUIT_WINDOW o 20)
+            open_seconds: Durata dell'apertura prima delle prove (default: CIRCUIT_OPEN_SECONDS o 60)
+            half_open_probes: Chiamate di prova in stato semiaperto (default: CIRCUIT_HALF_OPEN_PROBES o 1)
+        """
+        self.name = name
+        self.failure_rate = failure_rate or float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5))
+        self.min_calls = min_calls or int(os.getenv('CIRCUIT_MIN_CALLS', 10))
+        self.open_seconds = open_seconds or float(os.getenv('CIRCUIT_OPEN_SECONDS', 60))
+        self.half_open_probes = half_open_probes or int(os.getenv('CIRCUIT_HALF_OPEN_PROBES', 1))
+        self._outcomes = deque(maxlen=window or int(os.getenv('CIRCUIT_WINDOW', 20)))
+        self._lock = threading.Lock()
+        self._opened_at = 0.0
+        self._probes = 0
+        self.state = CLOSED
+        self.trips = 0
+        self.rejected = 0
+    
+    def before_call(self):
+        """
+        Verifica che la chiamata possa partire
+        
+        Raises:
+            CircuitOpenError: Se il circuito è aperto (o semiaperto con tutte le prove in corso)
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probes = 0
+                logger.info(f"🔌 Circuito {self.name} semiaperto: chiamate di prova")
+            
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuito {self.name} aperto: chiamata non eseguita")
+    
+    def record_success(self):
+        """Registra una chiamata riuscita"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._outcomes.clear()
+                logger.info(f"🔌 Circuito {self.name} richiuso: backend di nuovo raggiungibile")
+            self._outcomes.append(True)
+    
+    def record_failure(self):
+        """Registra un fallimento del backend (timeout, errore di rete, 429 o 5xx)"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self.state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_rate):
+                self._open()
+    
+    def _open(self):
+        """Apre il circuito (da chiamare con il lock acquisito)"""
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.trips += 1
+        self._outcomes.clear()
+        logger.error(f"🔌 Circuito {self.name} aperto per {self.open_seconds:.0f}s: backend non disponibile")
+    
+    @property
+    def is_open(self) -> bool:
+        """True se il circuito rifiuta le chiamate"""
+        return self.state == OPEN
+    
+    def snapshot(self) -> Dict:
+        """Stato e contatori per metriche e report"""
+        with self._lock:
+            return {"state": self.state, "trips": self.trips, "rejected": self.rejected}
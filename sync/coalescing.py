@@ -0,0 +1,112 @@
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set
+
+class _Flight:
+    """Richiesta in corso condivisa dai chiamanti con la stessa chiave"""
+    
+    __slots__ = ('done', 'result', 'error', 'generation')
+    
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """
+    Coalescenza delle letture identiche all'interno di un ciclo di sincronizzazione
+    
+    La prima richiesta per una chiave viene eseguita; le richieste concorrenti con
+    la stessa chiave ne attendono l'esito, quelle successive riusano il risultato
+    fino a fine ciclo. Ogni risultato porta dei tag (es. ID delle risorse restituite):
+    una scrittura invalida i risultati che contengono le risorse modificate.
+    """
+    
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Nome del backend (per il report)
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._results: Dict[str, object] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        self._generation = 0
+        self.stats = {"requests": 0, "hits": 0, "coalesced": 0}
+    
+    def begin_cycle(self):
+        """Dimentica i risultati del ciclo precedente e azzera i contatori"""
+        with self._lock:
+            self._results.clear()
+            self._tags.clear()
+            self.stats = {"requests": 0, "hits": 0, "coalesced": 0}
+    
+    def do(self, key: str, fn: Callable, tags: Callable[[object], Iterable[str]] = None):
+        """
+        Esegue `fn` una sola volta per chiave nel ciclo
+        
+        Args:
+            key: Chiave della lettura (endpoint e parametri)
+            fn: Funzione che esegue la lettura
+            tags: Funzione che ricava i tag di invalidazione dal risultato
+        
+        Returns:
+            Risultato della lettura (condiviso: i chiamanti non devono modificarlo)
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            if key in self._results:
+                self.stats["hits"] += 1
+                return self._results[key]
+            
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(self._generation)
+            else:
+                self.stats["coalesced"] += 1
+        
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and flight.generation == self._generation:
+                    # Un risultato invalidato mentre era in volo non va memorizzato
+                    self._results[key] = flight.result
+                    for tag in (tags(flight.result) if tags else ()):
+                        self._tags.setdefault(tag, set()).add(key)
+            flight.done.set()
+        return flight.result
+    
+    def invalidate(self, *tags: str):
+        """Scarta i risultati che portano uno dei tag indicati"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._results.pop(key, None)
+    
+    def summary(self) -> Dict:
+        """
+        Contatori del ciclo
+        
+        Returns:
+            Dict con requests, hits (risultati riusati), coalesced (attese su una
+            richiesta in volo) e saved_rate (percentuale di chiamate evitate)
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        saved = stats["hits"] + stats["coalesced"]
+        stats["saved_rate"] = saved / stats["requests"] * 100 if stats["requests"] else 0.0
+        return stats
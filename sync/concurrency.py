@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+from typing import Dict, Iterator
+
+class _Slot:
+    """Richiesta in corso: il chiamante segnala se la risposta indica sovraccarico"""
+    
+    __slots__ = ('overloaded', 'saturated')
+    
+    def __init__(self, saturated: bool = False):
+        self.overloaded = False
+        # True se la richiesta ha riempito la finestra: solo allora il suo esito la fa crescere
+        self.saturated = saturated
+
+class AdaptiveConcurrency:
+    """
+    Limitatore adattivo delle richieste in parallelo verso un backend (AIMD)
+    
+    La finestra cresce di circa una richiesta per ogni "giro" completato con latenza
+    stabile (aumento additivo) e si dimezza su 429/5xx, timeout o picchi di latenza
+    (diminuzione moltiplicativa). I worker che superano la finestra attendono.
+    
+    La finestra limita solo i percorsi che lavorano davvero in parallelo: letture
+    partizionate di Notion, lookup per SKU a gruppi, negozi sincronizzati insieme,
+    importazione massiva. Le passate riga per riga del ciclo sono seriali: le loro
+    richieste aggiornano la latenza media e riducono la finestra in caso di
+    sovraccarico, ma la fanno crescere solo le richieste partite a finestra piena,
+    così la finestra non sale fino al massimo senza che il parallelismo sia mai
+    stato provato. `peak` riporta il massimo di richieste davvero in parallelo.
+    """
+    
+    def __init__(self, name: str, initial: float = None, minimum: int = None, maximum: int = None,
+                 decrease_factor: float = None, latency_tolerance: float = None):
+        """
+        Inizializza il limitatore
+        
+        Args:
+            name: Nome del backend (per log e metriche)
+            initial: Finestra iniziale (default: 2)
+            minimum: Finestra minima (default: 1)
+            maximum: Finestra massima (default: 8)
+            decrease_factor: Fattore applicato alla finestra in caso di sovraccarico
+                (default: CONCURRENCY_DECREASE_FACTOR o 0.5)
+            latency_tolerance: Multiplo della latenza media oltre il quale la risposta
+                conta come picco (default: CONCURRENCY_LATENCY_TOLERANCE o 3)
+        """
+        self.name = name
+        self.minimum = max(1, minimum or 1)
+        self.maximum = max(self.minimum, maximum or 8)
+        self.limit = float(min(self.maximum, max(self.minimum, initial or 2)))
+        self.decrease_factor = decrease_factor or float(os.getenv('CONCURRENCY_DECREASE_FACTOR', 0.5))
+        self.latency_tolerance = latency_tolerance or float(os.getenv('CONCURRENCY_LATENCY_TOLERANCE', 3))
+        self.in_flight = 0
+        self.peak = 0
+        self.decreases = 0
+        self._latency = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+    
+    def acquire(self) -> bool:
+        """
+        Attende che la finestra consenta un'altra richiesta in parallelo
+        
+        Returns:
+            True se con questa richiesta la finestra è piena
+        """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            return self.in_flight >= int(self.limit)
+    
+    def release(self, started: float, overloaded: bool = False, saturated: bool = False):
+        """
+        Chiude una richiesta e adatta la finestra
+        
+        Args:
+            started: Istante di partenza della richiesta (time.monotonic())
+            overloaded: True se il backend ha segnalato sovraccarico (429/5xx o timeout)
+            saturated: True se la richiesta era partita a finestra piena (vedi acquire)
+        """
+        latency = time.monotonic() - started
+        with self._cond:
+            self.in_flight -= 1
+            
+            spike = (
+                self._latency is not None and self._samples >= 10
+                and latency > self._latency * self.latency_tolerance
+            )
+            if not overloaded:
+                # La media segue la latenza "sana" del backend
+                self._latency = latency if self._latency is None else 0.9 * self._latency + 0.1 * latency
+                self._samples += 1
+            
+            if overloaded or spike:
+                # Una sola riduzione per raffica: le richieste partite prima dell'ultima
+                # riduzione non la ripetono
+                if started >= self._last_decrease and self.limit > self.minimum:
+                    previous = self.limit
+                    self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+                    self.decreases += 1
+                    reason = "sovraccarico" if overloaded else f"latenza {latency:.2f}s"
+                    logger.debug(f"📉 Concorrenza {self.name}: {previous:.1f} → {self.limit:.1f} ({reason})")
+            elif saturated:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            
+            self._cond.notify_all()
+    
+    @contextmanager
+    def slot(self) -> Iterator[_Slot]:
+        """
+        Esegue una richiesta dentro la finestra, misurandone la latenza
+        
+        Yields:
+            Oggetto su cui impostare `overloaded = True` se la risposta indica sovraccarico
+        """
+        slot = _Slot(self.acquire())
+        started = time.monotonic()
+        try:
+            yield slot
+        finally:
+            self.release(started, slot.overloaded, slot.saturated)
+    
+    def snapshot(self) -> Dict:
+        """Finestra corrente e contatori per metriche e report"""
+        with self._cond:
+            return {
+                "window": int(self.limit),
+                "in_flight": self.in_flight,
+                "peak": self.peak,
+                "max": self.maximum,
+                "decreases": self.decreases,
+                "latency": round(self._latency, 3) if self._latency is not None else None
+            }
@@ -0,0 +1,183 @@
+from loguru import logger
+from typing import Dict, Optional
+
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+
+# Righe della dashboard: (chiave KPI, etichetta mostrata su Notion)
+DASHBOARD_LINES = [
+    ("updated_at", "⏰ Ultimo aggiornamento"),
+    ("total_skus", "📦 SKU totali"),
+    ("total_stock", "📊 Stock totale"),
+    ("out_of_stock", "🚫 SKU esauriti"),
+    ("discrepancies_critical", "🔴 Discrepanze CRITICAL"),
+    ("discrepancies_high", "🟠 Discrepanze HIGH"),
+    ("discrepancies_medium", "🟡 Discrepanze MEDIUM"),
+    ("discrepancies_low", "🟢 Discrepanze LOW"),
+    ("cycle_duration", "⏱️ Durata ciclo (s)"),
+    ("api_calls_woocommerce", "🔌 Chiamate API WooCommerce"),
+    ("api_calls_notion", "🔌 Chiamate API Notion"),
+    ("circuit_woocommerce", "🔌 Circuito WooCommerce"),
+    ("circuit_notion", "🔌 Circuito Notion"),
+    ("concurrency_woocommerce", "🎚️ Concorrenza WooCommerce"),
+    ("concurrency_notion", "🎚️ Concorrenza Notion"),
+]
+
+class KPIAggregator:
+    """
+    Aggregati KPI del magazzino mantenuti in modo incrementale
+    
+    Ogni osservazione di uno SKU corregge i totali con la sola differenza
+    rispetto al valore precedente, senza ricalcolare dall'intero snapshot.
+    """
+    
+    def __init__(self):
+        """Inizializza gli aggregati vuoti"""
+        self._stock: Dict[str, int] = {}
+        self._severity: Dict[str, str] = {}
+        self._seen = set()
+        self.total_stock = 0
+        self.out_of_stock = 0
+        self.severity_counts = {severity: 0 for severity in SEVERITIES}
+    
+    @property
+    def total_skus(self) -> int:
+        """Numero di SKU attualmente tracciati"""
+        return len(self._stock)
+    
+    def begin_cycle(self):
+        """Apre un nuovo ciclo di osservazioni"""
+        self._seen = set()
+    
+    def observe(self, sku: str, stock: int, severity: Optional[str] = None):
+        """
+        Registra lo stato corrente di uno SKU
+        
+        Args:
+            sku: SKU osservato
+            stock: Stock corrente (magazzino Notion)
+            severity: Gravità della discrepanza con WooCommerce (None se assente)
+        """
+        self._seen.add(sku)
+        stock = stock or 0
+        previous = self._stock.get(sku)
+        
+        if previous is not None:
+            self.total_stock -= previous
+            if previous <= 0:
+                self.out_of_stock -= 1
+        
+        self._stock[sku] = stock
+        self.total_stock += stock
+        if stock <= 0:
+            self.out_of_stock += 1
+        
+        self._set_severity(sku, severity)
+    
+    def remove(self, sku: str):
+        """Rimuove uno SKU dagli aggregati"""
+        previous = self._stock.pop(sku, None)
+        if previous is not None:
+            self.total_stock -= previous
+            if previous <= 0:
+                self.out_of_stock -= 1
+        self._set_severity(sku, None)
+    
+    def end_cycle(self):
+        """Chiude il ciclo rimuovendo gli SKU non più osservati"""
+        for sku in self._stock.keys() - self._seen:
+            self.remove(sku)
+    
+    def _set_severity(self, sku: str, severity: Optional[str]):
+        """Aggiorna il conteggio delle discrepanze per gravità"""
+        previous = self._severity.get(sku)
+        if previous == severity:
+            return
+        if previous:
+            self.severity_counts[previous] -= 1
+            del self._severity[sku]
+        if severity:
+            self.severity_counts[severity] = self.severity_counts.get(severity, 0) + 1
+            self._severity[sku] = severity
+    
+    def snapshot(self) -> Dict:
+        """Ritorna i valori correnti degli aggregati"""
+        return {
+            "total_skus": self.total_skus,
+            "total_stock": self.total_stock,
+            "out_of_stock": self.out_of_stock,
+            "discrepancies": dict(self.severity_counts)
+        }
+
+class NotionDashboard:
+    """
+    Pagina dashboard KPI su Notion aggiornata blocco per blocco
+    
+    Ogni KPI occupa un paragrafo della pagina; a ogni ciclo vengono
+    riscritti solo i paragrafi il cui testo è cambiato.
+    """
+    
+    def __init__(self, notion_client, page_id: str):
+        """
+        Inizializza la dashboard
+        
+        Args:
+            notion_client: Client Notion
+            page_id: ID della pagina Notion che ospita la dashboard
+        """
+        self.notion = notion_client
+        self.page_id = page_id
+        self._blocks: Dict[str, str] = {}
+        self._rendered: Dict[str, str] = {}
+        self._loaded = False
+    
+    def _load_blocks(self):
+        """Riconosce i paragrafi KPI già presenti nella pagina"""
+        labels = {label: key for key, label in DASHBOARD_LINES}
+        
+        for block in self.notion.list_block_children(self.page_id):
+            if block.get('type') != 'paragraph':
+                continue
+            rich_text = block.get('paragraph', {}).get('rich_text', [])
+            text = "".join(part.get('plain_text') or part.get('text', {}).get('content', '') for part in rich_text)
+            label = text.split(":", 1)[0]
+            key = labels.get(label)
+            if key and key not in self._blocks:
+                self._blocks[key] = block['id']
+                self._rendered[key] = text
+        
+        self._loaded = True
+    
+    def update(self, values: Dict) -> int:
+        """
+        Aggiorna la dashboard con i nuovi valori KPI
+        
+        Args:
+            values: Dict chiave KPI -> valore da mostrare
+        
+        Returns:
+            Numero di blocchi scritti
+        """
+        if not self._loaded:
+            self._load_blocks()
+        
+        lines = [(key, f"{label}: {values.get(key, '-')}") for key, label in DASHBOARD_LINES]
+        
+        # Crea in un'unica chiamata i paragrafi mancanti
+        missing = [(key, text) for key, text in lines if key not in self._blocks]
+        if missing:
+            created = self.notion.append_paragraphs(self.page_id, [text for _, text in missing])
+            for (key, text), block in zip(missing, created):
+                self._blocks[key] = block['id']
+                self._rendered[key] = text
+        
+        # Riscrive solo i paragrafi cambiati
+        written = len(missing)
+        for key, text in lines:
+            if self._rendered.get(key) == text:
+                continue
+            self.notion.update_paragraph(self._blocks[key], text)
+            self._rendered[key] = text
+            written += 1
+        
+        logger.debug(f"📊 Dashboard Notion aggiornata ({written} blocchi modificati)")
+        return written
@@ -0,0 +1,128 @@
+import json
+import os
+import time
+from loguru import logger
+from typing import Dict, List, Optional
+
+# Operazioni registrabili nella coda
+NOTION_TO_WOO = "notion_to_woo"
+WOO_TO_NOTION = "woo_to_notion"
+
+class DeadLetterQueue:
+    """
+    Coda persistente delle righe la cui sincronizzazione è fallita
+    
+    Ogni voce ricorda operazione, SKU, classe dell'errore e numero di tentativi.
+    Le righe in coda vengono ritentate con un backoff esponenziale proprio,
+    tra un ciclo e l'altro, invece di rifare tutto il lavoro a ogni ciclo completo.
+    """
+    
+    def __init__(self, path: str, base_delay: int = None, max_delay: int = None):
+        """
+        Inizializza la coda
+        
+        Args:
+            path: Percorso del file JSON della coda
+            base_delay: Secondi prima del primo nuovo tentativo (default: DLQ_RETRY_BASE_DELAY o 60)
+            max_delay: Attesa massima tra due tentativi (default: DLQ_RETRY_MAX_DELAY o 3600)
+        """
+        self.path = path
+        self.base_delay = base_delay or int(os.getenv('DLQ_RETRY_BASE_DELAY', 60))
+        self.max_delay = max_delay or int(os.getenv('DLQ_RETRY_MAX_DELAY', 3600))
+        self.entries: Dict[str, Dict] = {}
+        self._dirty = False
+        self._load()
+    
+    @staticmethod
+    def _key(operation: str, sku: str) -> str:
+        """Chiave di una voce (operazione + SKU normalizzato)"""
+        return f"{operation}:{(sku or '').strip().lower()}"
+    
+    def _load(self):
+        """Rilegge la coda salvata"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+            if self.entries:
+                logger.info(f"📮 Coda righe fallite: {len(self.entries)} voci da ritentare")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Coda righe fallite non leggibile, verrà ricreata: {e}")
+            self.entries = {}
+    
+    def record_failure(self, operation: str, sku: str, error: Exception, payload: Optional[Dict] = None):
+        """
+        Registra un fallimento e pianifica il prossimo tentativo
+        
+        Args:
+            operation: NOTION_TO_WOO o WOO_TO_NOTION
+            sku: SKU della riga
+            error: Eccezione sollevata
+            payload: Dati necessari a ritentare l'operazione
+        """
+        now = time.time()
+        entry = self.entries.setdefault(self._key(operation, sku), {
+            "operation": operation,
+            "sku": sku,
+            "attempts": 0,
+            "first_failed": now
+        })
+        entry["attempts"] += 1
+        entry["error_class"] = type(error).__name__
+        entry["error"] = str(error)[:500]
+        entry["last_failed"] = now
+        entry["next_retry"] = now + min(self.base_delay * 2 ** (entry["attempts"] - 1), self.max_delay)
+        if payload is not None:
+            entry["payload"] = payload
+        self._dirty = True
+    
+    def resolve(self, operation: str, sku: str):
+        """Rimuove una voce dopo una sincronizzazione riuscita"""
+        if self.entries.pop(self._key(operation, sku), None) is not None:
+            self._dirty = True
+            logger.info(f"📮 Riga recuperata dalla coda: {sku} ({operation})")
+    
+    def drop(self, operation: str, sku: str, reason: str):
+        """Rimuove una voce che non si può più ritentare, senza contarla come recuperata"""
+        if self.entries.pop(self._key(operation, sku), None) is not None:
+            self._dirty = True
+            logger.bind(sku=sku).warning("📮 Riga scartata dalla coda: {} ({}): {}", sku, operation, reason)
+    
+    def is_waiting(self, operation: str, sku: str) -> bool:
+        """True se la riga è in coda e il suo prossimo tentativo non è ancora arrivato"""
+        entry = self.entries.get(self._key(operation, sku))
+        return entry is not None and entry["next_retry"] > time.time()
+    
+    def due(self) -> List[Dict]:
+        """Voci il cui prossimo tentativo è scaduto"""
+        now = time.time()
+        return [entry for entry in self.entries.values() if entry["next_retry"] <= now]
+    
+    def summary(self) -> Dict:
+        """
+        Riepilogo per il report
+        
+        Returns:
+            Dict con pending, due e conteggi per classe di errore
+        """
+        by_error: Dict[str, int] = {}
+        for entry in self.entries.values():
+            by_error[entry["error_class"]] = by_error.get(entry["error_class"], 0) + 1
+        return {
+            "pending": len(self.entries),
+            "due": len(self.due()),
+            "by_error": by_error
+        }
+    
+    def save(self):
+        """Salva la coda su disco se è cambiata"""
+        if not self._dirty:
+            return
+        try:
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, default=str)
+            os.replace(self.path + ".tmp", self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"⚠️  Impossibile salvare la coda delle righe fallite: {e}")
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+from loguru import logger
+from typing import Dict, List, Set
+
+class FingerprintStore:
+    """
+    Impronte persistenti delle righe già riconciliate
+    
+    Per ogni SKU (normalizzato) conserva la coppia di hash dei campi sincronizzati
+    su WooCommerce e su Notion così com'erano all'ultima riconciliazione riuscita.
+    Se entrambi i lati producono ancora la stessa coppia, la riga non è cambiata
+    e la sincronizzazione completa può saltarla senza lookup né scritture.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Percorso del file JSON delle impronte
+        """
+        self.path = path
+        self._pairs: Dict[str, List[str]] = {}
+        self._seen: Set[str] = set()
+        self._dirty = False
+        self.skipped: Set[str] = set()
+        self._load()
+    
+    @staticmethod
+    def fingerprint(*values) -> str:
+        """Hash stabile di una sequenza di valori"""
+        return hashlib.sha1(json.dumps(values, default=str, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    def _load(self):
+        """Rilegge le impronte salvate (un file illeggibile equivale a nessuna impronta)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._pairs = json.load(f)
+            logger.debug(f"✓ Impronte di sincronizzazione caricate ({len(self._pairs)} SKU)")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Impronte di sincronizzazione non leggibili, verranno ricalcolate: {e}")
+            self._pairs = {}
+    
+    def begin_cycle(self):
+        """Azzera i contatori del ciclo"""
+        self._seen.clear()
+        self.skipped.clear()
+    
+    def matches(self, key: str, woo_fingerprint: str, notion_fingerprint: str) -> bool:
+        """
+        Verifica se una riga è invariata dall'ultima riconciliazione
+        
+        Args:
+            key: SKU normalizzato
+            woo_fingerprint: Impronta attuale del lato WooCommerce
+            notion_fingerprint: Impronta attuale del lato Notion
+        """
+        self._seen.add(key)
+        return self._pairs.get(key) == [woo_fingerprint, notion_fingerprint]
+    
+    def record(self, key: str, woo_fingerprint: str, notion_fingerprint: str):
+        """Registra la coppia di impronte di una riga appena riconciliata"""
+        self._seen.add(key)
+        if self._pairs.get(key) != [woo_fingerprint, notion_fingerprint]:
+            self._pairs[key] = [woo_fingerprint, notion_fingerprint]
+            self._dirty = True
+    
+    def forget(self, key: str):
+        """Dimentica una riga: verrà rielaborata per intero al prossimo ciclo"""
+        self._seen.add(key)
+        if self._pairs.pop(key, None) is not None:
+            self._dirty = True
+    
+    def save(self, prune: bool = False):
+        """
+        Salva le impronte su disco
+        
+        Args:
+            prune: Se True elimina gli SKU non incontrati nel ciclo (da usare solo
+                dopo un ciclo completo)
+        """
+        if prune:
+            stale = set(self._pairs) - self._seen
+            for key in stale:
+                del self._pairs[key]
+            self._dirty = self._dirty or bool(stale)
+        
+        if not self._dirty:
+            return
+        
+        try:
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(self._pairs, f)
+            os.replace(self.path + ".tmp", self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"⚠️  Impossibile salvare le impronte di sincronizzazione: {e}")
@@ -0,0 +1,242 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from loguru import logger
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Intestazione di ogni record: istante (epoch), tipo, lunghezza del payload compresso
+RECORD_HEADER = struct.Struct('<dBI')
+FULL, DELTA = 1, 2
+
+class StockHistory:
+    """
+    Archivio storico dello stock riconciliato, ciclo per ciclo
+    
+    Ogni ciclo completo aggiunge un record con le sole differenze rispetto al
+    ciclo precedente; ogni `checkpoint_every` cicli si apre un nuovo segmento che
+    comincia con lo stato completo. I record sono JSON compressi (zlib) preceduti
+    da un'intestazione binaria fissa: le query mappano in memoria (mmap) solo i
+    segmenti dell'intervallo richiesto e si fermano all'ultimo record che serve.
+    I segmenti più vecchi di `retention_days` vengono eliminati.
+    """
+    
+    def __init__(self, directory: str, checkpoint_every: int = None, retention_days: float = None):
+        """
+        Args:
+            directory: Cartella dei segmenti (creata se non esiste)
+            checkpoint_every: Cicli per segmento, cioè ogni quanti cicli salvare lo
+                stato completo (default: HISTORY_CHECKPOINT_EVERY o 48)
+            retention_days: Giorni di storia conservati (default: HISTORY_RETENTION_DAYS o 7)
+        """
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every or int(os.getenv('HISTORY_CHECKPOINT_EVERY', 48))
+        self.retention_days = retention_days or float(os.getenv('HISTORY_RETENTION_DAYS', 7))
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        
+        # Stato dell'ultimo ciclo registrato e record nel segmento corrente
+        segments = self._segments()
+        self._segment: Optional[str] = segments[-1][1] if segments else None
+        self._records = 0
+        self._state: Dict[str, int] = {}
+        if self._segment:
+            self._open_segment(self._segment)
+    
+    def _open_segment(self, path: str):
+        """
+        Riprende il segmento corrente dopo un riavvio
+        
+        Un segmento che finisce con un record troncato o illeggibile (crash durante
+        la scrittura) viene accorciato all'ultimo record valido, così i record
+        aggiunti dopo restano leggibili; se non ha nemmeno un record valido il
+        prossimo ciclo ne apre uno nuovo.
+        """
+        end = 0
+        for _, kind, payload, end in self._scan_segment(path):
+            self._state = self._apply(self._state, kind, payload)
+            self._records += 1
+        try:
+            if end == 0:
+                os.remove(path)
+                self._segment = None
+                logger.warning(f"⚠️  Segmento storico senza record validi eliminato: {os.path.basename(path)}")
+            elif end < os.path.getsize(path):
+                os.truncate(path, end)
+                logger.warning(f"⚠️  Segmento storico {os.path.basename(path)} accorciato all'ultimo record valido")
+        except OSError as e:
+            logger.warning(f"⚠️  Impossibile riparare il segmento storico: {e}")
+            self._segment = None
+    
+    def _segments(self) -> List[Tuple[float, str]]:
+        """Segmenti presenti, dal più vecchio (istante di apertura, percorso)"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith('segment_') and name.endswith('.hist'):
+                try:
+                    segments.append((float(name[len('segment_'):-len('.hist')]), os.path.join(self.directory, name)))
+                except ValueError:
+                    continue
+        return sorted(segments)
+    
+    @staticmethod
+    def _scan_segment(path: str) -> Iterator[Tuple[float, int, Dict, int]]:
+        """
+        Scorre i record validi di un segmento mappato in memoria
+        
+        La lettura si ferma al primo record troncato o illeggibile (crash durante
+        la scrittura): i delta successivi dipenderebbero da esso.
+        
+        Yields:
+            (istante, tipo, payload, offset di fine del record)
+        """
+        if os.path.getsize(path) == 0:
+            return
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(data):
+                timestamp, kind, length = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                if kind not in (FULL, DELTA) or start + length > len(data):
+                    return
+                try:
+                    payload = json.loads(zlib.decompress(data[start:start + length]))
+                except (zlib.error, ValueError) as e:
+                    logger.warning(f"⚠️  Record illeggibile nello storico {os.path.basename(path)} (offset {offset}): {e}")
+                    return
+                offset = start + length
+                yield timestamp, kind, payload, offset
+    
+    @classmethod
+    def _read_segment(cls, path: str) -> Iterator[Tuple[float, int, Dict]]:
+        """
+        Scorre i record validi di un segmento (vedi _scan_segment)
+        
+        Yields:
+            (istante, tipo, payload decompresso)
+        """
+        for timestamp, kind, payload, _ in cls._scan_segment(path):
+            yield timestamp, kind, payload
+    
+    @staticmethod
+    def _apply(state: Dict[str, int], kind: int, payload: Dict) -> Dict[str, int]:
+        """Applica un record a uno stato (un record completo lo sostituisce)"""
+        if kind == FULL:
+            return dict(payload["state"])
+        state = dict(state)
+        state.update(payload.get("set", {}))
+        for key in payload.get("del", []):
+            state.pop(key, None)
+        return state
+    
+    def _append(self, path: str, timestamp: float, kind: int, payload: Dict):
+        """Aggiunge un record compresso a un segmento"""
+        data = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        with open(path, 'ab') as f:
+            f.write(RECORD_HEADER.pack(timestamp, kind, len(data)) + data)
+            f.flush()
+    
+    def record(self, state: Dict[str, int]):
+        """
+        Registra lo stock riconciliato alla fine di un ciclo completo
+        
+        Args:
+            state: SKU normalizzato -> stock su cui i lati concordano
+        """
+        now = time.time()
+        state = {key: int(stock) for key, stock in state.items()}
+        with self._lock:
+            try:
+                if self._segment is None or self._records >= self.checkpoint_every:
+                    self._segment = os.path.join(self.directory, f"segment_{now:.3f}.hist")
+                    self._append(self._segment, now, FULL, {"state": state})
+                    self._records = 1
+                    self._prune(now)
+                else:
+                    changed = {key: stock for key, stock in state.items() if self._state.get(key) != stock}
+                    removed = [key for key in self._state if key not in state]
+                    if not changed and not removed:
+                        return
+                    self._append(self._segment, now, DELTA, {"set": changed, "del": removed})
+                    self._records += 1
+                self._state = state
+            except OSError as e:
+                logger.warning(f"⚠️  Impossibile aggiornare lo storico dello stock: {e}")
+    
+    def _prune(self, now: float):
+        """Elimina i segmenti interamente più vecchi della finestra di conservazione"""
+        cutoff = now - self.retention_days * 86400
+        segments = self._segments()
+        # Un segmento copre fino all'apertura del successivo
+        for (_, path), (next_start, _) in zip(segments, segments[1:]):
+            if next_start <= cutoff:
+                os.remove(path)
+                logger.debug(f"🗑️  Segmento storico eliminato: {os.path.basename(path)}")
+    
+    def state_at(self, when: float) -> Dict[str, int]:
+        """
+        Stock riconciliato di tutti gli SKU a un istante
+        
+        Args:
+            when: Istante (epoch)
+        
+        Returns:
+            SKU normalizzato -> stock dell'ultimo ciclo registrato non dopo `when`
+            (vuoto se `when` precede la storia conservata)
+        """
+        candidates = [path for start, path in self._segments() if start <= when]
+        if not candidates:
+            return {}
+        state: Dict[str, int] = {}
+        for timestamp, kind, payload in self._read_segment(candidates[-1]):
+            if timestamp > when:
+                break
+            state = self._apply(state, kind, payload)
+        return state
+    
+    def sku_history(self, sku: str, since: float = None, until: float = None) -> List[Dict]:
+        """
+        Variazioni dello stock riconciliato di uno SKU
+        
+        Args:
+            sku: SKU (confronto normalizzato)
+            since: Inizio dell'intervallo (epoch, None = tutta la storia)
+            until: Fine dell'intervallo (epoch, None = adesso)
+        
+        Returns:
+            Lista di {"time", "stock"} in ordine di tempo, una voce per ogni ciclo
+            che ha cambiato lo stock (stock None = SKU non più presente)
+        """
+        key = (sku.strip() if sku else "").lower()
+        until = until if until is not None else time.time()
+        segments = self._segments()
+        changes: List[Dict] = []
+        current = None
+        for index, (start, path) in enumerate(segments):
+            # Un segmento copre fino all'apertura del successivo e comincia con lo stato completo
+            end = segments[index + 1][0] if index + 1 < len(segments) else float('inf')
+            if start > until or (since is not None and end <= since):
+                continue
+            for timestamp, kind, data in self._read_segment(path):
+                if timestamp > until:
+                    break
+                if kind == FULL:
+                    stock = data["state"].get(key)
+                elif key in data.get("set", {}):
+                    stock = data["set"][key]
+                elif key in data.get("del", []):
+                    stock = None
+                else:
+                    continue
+                if stock != current:
+                    changes.append({"time": timestamp, "stock": stock})
+                    current = stock
+        
+        if since is not None:
+            # Il valore in vigore all'inizio dell'intervallo resta come prima voce
+            before = [change for change in changes if change["time"] < since]
+            changes = before[-1:] + [change for change in changes if change["time"] >= since]
+        return changes
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from loguru import logger
+from typing import Dict, Optional
+
+class CachedResponse:
+    """Risposta GET memorizzata con i validatori necessari a riconvalidarla"""
+    
+    __slots__ = ('etag', 'last_modified', 'digest', 'data')
+    
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], digest: str, data):
+        """
+        Args:
+            etag: Header ETag restituito dallo store (se presente)
+            last_modified: Header Last-Modified restituito dallo store (se presente)
+            digest: SHA-256 del corpo della risposta
+            data: Corpo già decodificato da JSON
+        """
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.data = data
+    
+    def conditional_headers(self) -> Dict[str, str]:
+        """Header per una GET condizionale (vuoto se lo store non fornisce validatori)"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class ResponseCache:
+    """
+    Cache LRU delle risposte GET di WooCommerce
+    
+    Ogni lettura viene sempre riconvalidata con lo store: con `If-None-Match` /
+    `If-Modified-Since` quando lo store restituisce ETag o Last-Modified, altrimenti
+    confrontando l'hash del corpo. Se la pagina non è cambiata si riusa il corpo già
+    decodificato, senza rifare il parsing JSON. Le voci possono essere salvate anche
+    su disco per sopravvivere ai riavvii.
+    """
+    
+    def __init__(self, max_entries: int = 256, directory: str = None):
+        """
+        Inizializza la cache
+        
+        Args:
+            max_entries: Numero massimo di risposte in memoria (le meno usate vengono scartate)
+            directory: Cartella per la copia su disco (None = solo memoria)
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"not_modified": 0, "unchanged": 0, "misses": 0}
+        
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def key(endpoint: str, params: Optional[Dict]) -> str:
+        """Chiave di cache per endpoint e query parameters"""
+        query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return f"{endpoint}?{query}"
+    
+    @staticmethod
+    def digest(body: bytes) -> str:
+        """Hash del corpo di una risposta"""
+        return hashlib.sha256(body).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        """File su disco di una voce"""
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".json")
+    
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Voce in cache per la chiave (dalla memoria o, se assente, dal disco)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        
+        if not self.directory:
+            return None
+        
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                stored = json.load(f)
+            entry = CachedResponse(stored.get('etag'), stored.get('last_modified'), stored['digest'], stored['data'])
+        except (OSError, ValueError, KeyError):
+            return None
+        
+        self._remember(key, entry)
+        return entry
+    
+    def put(self, key: str, entry: CachedResponse):
+        """Memorizza una risposta (e la salva su disco se configurato)"""
+        self._remember(key, entry)
+        
+        if not self.directory:
+            return
+        
+        try:
+            path = self._path(key)
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({
+                    "etag": entry.etag,
+                    "last_modified": entry.last_modified,
+                    "digest": entry.digest,
+                    "data": entry.data
+                }, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+        except (OSError, TypeError) as e:
+            logger.debug(f"⚠️  Cache HTTP non salvata su disco: {e}")
+    
+    def _remember(self, key: str, entry: CachedResponse):
+        """Inserisce una voce in memoria applicando l'evizione LRU"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def record(self, outcome: str):
+        """Conta l'esito di una lettura: 'not_modified', 'unchanged' o 'misses'"""
+        with self._lock:
+            self.stats[outcome] += 1
+    
+    def summary(self, since: Optional[Dict] = None) -> Dict:
+        """
+        Esiti delle letture e percentuale di hit
+        
+        Args:
+            since: Contatori di un summary precedente (per le statistiche di un solo ciclo)
+        
+        Returns:
+            Dict con not_modified, unchanged, misses e hit_rate (letture servite senza nuovo parsing)
+        """
+        with self._lock:
+            counts = {k: v - (since or {}).get(k, 0) for k, v in self.stats.items()}
+        hits = counts["not_modified"] + counts["unchanged"]
+        total = hits + counts["misses"]
+        counts["hit_rate"] = hits / total * 100 if total else 0.0
+        return counts
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import zlib
+from loguru import logger
+from typing import Dict
+
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+
+class RowLogSampler:
+    """
+    Campionamento dei messaggi per riga (quelli con `sku` nel contesto loguru)
+    
+    Entro `threshold` messaggi per ciclo passa tutto; oltre la soglia passano solo
+    i messaggi di uno SKU ogni `rate`, scelti in modo stabile dall'hash dello SKU
+    così che uno SKU campionato sia tracciabile per intero. Warning ed errori
+    passano sempre.
+    """
+    
+    def __init__(self, threshold: int = None, rate: int = None):
+        """
+        Args:
+            threshold: Messaggi per riga consentiti per ciclo prima del campionamento
+                (default: LOG_SAMPLE_THRESHOLD o 1000)
+            rate: Oltre la soglia viene registrato uno SKU ogni `rate` (default: LOG_SAMPLE_RATE o 10)
+        """
+        self.threshold = threshold or int(os.getenv('LOG_SAMPLE_THRESHOLD', 1000))
+        self.rate = max(1, rate or int(os.getenv('LOG_SAMPLE_RATE', 10)))
+        self._lock = threading.Lock()
+        self.emitted = 0
+        self.suppressed = 0
+    
+    def begin_cycle(self) -> Dict:
+        """
+        Azzera i contatori del ciclo
+        
+        Returns:
+            Contatori del ciclo appena concluso (emitted, suppressed)
+        """
+        with self._lock:
+            previous = {"emitted": self.emitted, "suppressed": self.suppressed}
+            self.emitted = 0
+            self.suppressed = 0
+        return previous
+    
+    def __call__(self, record) -> bool:
+        """Filtro loguru: decide se il messaggio va scritto"""
+        sku = record["extra"].get("sku")
+        if sku is None or record["level"].no >= logger.level("WARNING").no:
+            return True
+        
+        with self._lock:
+            if self.emitted < self.threshold or zlib.crc32(str(sku).encode('utf-8')) % self.rate == 0:
+                self.emitted += 1
+                return True
+            self.suppressed += 1
+            return False
+
+row_sampler = RowLogSampler()
+
+def _apply_sampling(record):
+    """Patcher loguru: annota nei messaggi per riga se vanno scritti"""
+    if "sku" in record["extra"]:
+        record["extra"]["sampled"] = row_sampler(record)
+
+def _is_sampled(record) -> bool:
+    """Filtro dei sink: scarta i messaggi per riga esclusi dal campionamento"""
+    return record["extra"].get("sampled", True)
+
+def configure_logging(log_level: str = None):
+    """
+    Configura i sink loguru del processo di sincronizzazione
+    
+    I sink sono asincroni (`enqueue=True`): formattazione e scrittura avvengono in
+    un thread dedicato, non nel ciclo delle righe. Con LOG_JSON=true il file di log
+    contiene record JSON strutturati (contesto `sku` incluso).
+    
+    Args:
+        log_level: Livello minimo (default: LOG_LEVEL o INFO)
+    """
+    log_level = log_level or os.getenv('LOG_LEVEL', 'INFO')
+    serialize = os.getenv('LOG_JSON', 'false').lower() == 'true'
+    
+    # Il campionamento è deciso una sola volta per record (patcher) e letto dai filtri dei sink
+    logger.remove()
+    logger.configure(patcher=_apply_sampling)
+    logger.add(
+        "logs/stock_sync.log",
+        level=log_level,
+        format=LOG_FORMAT,
+        rotation="500 MB",
+        retention="7 days",
+        enqueue=True,
+        serialize=serialize,
+        filter=_is_sampled
+    )
+    logger.add(sys.stdout, level=log_level, format=LOG_FORMAT, enqueue=True, colorize=False, filter=_is_sampled)
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+from loguru import logger
+from typing import Dict, Iterable, List, Optional, Set
+
+class MergeBaseStore:
+    """
+    Ultimo stock riconciliato per SKU, base comune del merge a tre vie
+    
+    Con la base nota, le modifiche dei due lati (vendite sul negozio, correzioni su
+    Notion) si calcolano come differenze e si sommano, invece di sovrascriversi a
+    vicenda. Per ogni SKU si tiene anche la storia recente dei valori riconciliati,
+    per riconoscere gli SKU che oscillano tra due valori a ogni ciclo.
+    """
+    
+    def __init__(self, path: str, history: int = None, oscillation_returns: int = None):
+        """
+        Args:
+            path: Percorso del file JSON delle basi
+            history: Valori riconciliati conservati per SKU (default: MERGE_HISTORY o 6)
+            oscillation_returns: Ritorni a un valore di due riconciliazioni prima oltre i quali
+                lo SKU è considerato oscillante (default: MERGE_OSCILLATION_RETURNS o 2)
+        """
+        self.path = path
+        self.history = history or int(os.getenv('MERGE_HISTORY', 6))
+        self.oscillation_returns = oscillation_returns or int(os.getenv('MERGE_OSCILLATION_RETURNS', 2))
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.oscillating: Set[str] = set()
+        self._load()
+    
+    def _load(self):
+        """Rilegge le basi salvate (un file illeggibile equivale a nessuna base)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+            logger.debug(f"✓ Basi di merge caricate ({len(self._entries)} SKU)")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Basi di merge non leggibili, verranno ricreate: {e}")
+            self._entries = {}
+    
+    def begin_cycle(self):
+        """Azzera gli SKU oscillanti del ciclo"""
+        self.oscillating = set()
+    
+    def base(self, key: str) -> Optional[int]:
+        """Ultimo stock riconciliato di uno SKU (None se mai riconciliato)"""
+        entry = self._entries.get(key)
+        return entry["base"] if entry else None
+    
+    @staticmethod
+    def merge(base: Optional[int], notion_stock: int, woo_stocks: Iterable[int]) -> int:
+        """
+        Merge a tre vie dello stock
+        
+        Args:
+            base: Ultimo stock riconciliato (None = Notion prevale, come senza base)
+            notion_stock: Stock attuale su Notion
+            woo_stocks: Stock attuale su ciascun negozio WooCommerce
+        
+        Returns:
+            Base più la somma delle variazioni di tutti i lati (mai negativo)
+        """
+        if base is None:
+            return int(notion_stock)
+        return max(0, int(notion_stock) + sum(int(stock) - base for stock in woo_stocks))
+    
+    def bases(self) -> Dict[str, int]:
+        """Ultimo stock riconciliato di tutti gli SKU"""
+        with self._lock:
+            return {key: entry["base"] for key, entry in self._entries.items()}
+    
+    def record(self, key: str, stock: int):
+        """Registra lo stock su cui i due lati di uno SKU si sono appena allineati"""
+        stock = int(stock)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["base"] == stock:
+                return
+            if entry is None:
+                entry = self._entries[key] = {"base": stock, "history": []}
+            entry["base"] = stock
+            history: List[int] = entry["history"]
+            history.append(stock)
+            del history[:-self.history]
+            self._dirty = True
+            
+            # Oscillazione: lo stock torna più volte al valore di due riconciliazioni prima
+            returns = sum(
+                1 for i in range(2, len(history))
+                if history[i] == history[i - 2] != history[i - 1]
+            )
+            if returns >= self.oscillation_returns:
+                self.oscillating.add(key)
+    
+    def prune(self, present):
+        """
+        Dimentica le basi degli SKU non più presenti nel catalogo
+        
+        Gli SKU archiviati restano nel catalogo e conservano la base, che serve
+        al merge quando vengono ripristinati.
+        
+        Args:
+            present: SKU normalizzati letti nel ciclo completo
+        """
+        present = set(present)
+        with self._lock:
+            stale = [key for key in self._entries if key not in present]
+            for key in stale:
+                del self._entries[key]
+            self._dirty = self._dirty or bool(stale)
+    
+    def log_oscillating(self):
+        """Segnala gli SKU che nel ciclo sono tornati a oscillare"""
+        if self.oscillating:
+            logger.warning(f"🔁 SKU che oscillano tra due valori: {', '.join(sorted(self.oscillating)[:20])}")
+    
+    def save(self):
+        """Salva le basi su disco se sono cambiate"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f)
+                os.replace(self.path + ".tmp", self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"⚠️  Impossibile salvare le basi di merge: {e}")
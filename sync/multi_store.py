@@ -0,0 +1,232 @@
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from typing import Dict, List, Tuple
+from sync.logging_setup import row_sampler
+from sync.merge_base import MergeBaseStore
+from sync.stock_sync import StockSynchronizer
+from sync.woocommerce_client import WooCommerceClient
+
+def store_configs() -> List[Dict]:
+    """
+    Legge dall'ambiente i negozi WooCommerce da sincronizzare
+    
+    Con WOOCOMMERCE_STORES (es. "main,outlet,b2b") ogni negozio usa le variabili
+    WOOCOMMERCE_<NOME>_API_URL, _CONSUMER_KEY e _CONSUMER_SECRET; il primo può
+    ricadere sulle variabili WOOCOMMERCE_* senza nome. Senza WOOCOMMERCE_STORES
+    c'è un solo negozio, configurato come sempre.
+    
+    Returns:
+        Lista di dict con store, api_url, consumer_key e consumer_secret
+    """
+    names = [name.strip() for name in os.getenv('WOOCOMMERCE_STORES', '').split(',') if name.strip()]
+    if not names:
+        return [{
+            "store": None,
+            "api_url": os.getenv('WOOCOMMERCE_API_URL'),
+            "consumer_key": os.getenv('WOOCOMMERCE_CONSUMER_KEY'),
+            "consumer_secret": os.getenv('WOOCOMMERCE_CONSUMER_SECRET')
+        }]
+    
+    configs = []
+    for index, name in enumerate(names):
+        prefix = f"WOOCOMMERCE_{name.upper()}_"
+        config = {"store": name}
+        for key in ("api_url", "consumer_key", "consumer_secret"):
+            fallback = os.getenv(f"WOOCOMMERCE_{key.upper()}") if index == 0 else None
+            config[key] = os.getenv(prefix + key.upper(), fallback)
+            if not config[key]:
+                raise ValueError(f"Variabile {prefix + key.upper()} mancante per il negozio {name}")
+        configs.append(config)
+    return configs
+
+def create_woo_clients() -> List[WooCommerceClient]:
+    """Crea un client WooCommerce per ogni negozio configurato"""
+    return [WooCommerceClient(**config) for config in store_configs()]
+
+class MultiStoreSynchronizer:
+    """
+    Sincronizzazione di più negozi WooCommerce che condividono lo stock di un
+    unico database Notion
+    
+    Per ciclo: i cataloghi dei negozi e il database Notion vengono letti in
+    parallelo, una volta sola; lo stock Notion viene scritto su tutti i negozi in
+    parallelo; infine ogni SKU viene scritto su Notion una volta sola, con la riga
+    del negozio con lo stock più basso (lo stock è condiviso, quindi una vendita
+    su qualunque negozio lo riduce). Con un solo negozio delega a StockSynchronizer.
+    """
+    
+    def __init__(self, synchronizers: List[StockSynchronizer]):
+        """
+        Args:
+            synchronizers: Un sincronizzatore per negozio, tutti sullo stesso client Notion
+                (il primo è il negozio principale)
+        """
+        self.synchronizers = synchronizers
+        self.primary = synchronizers[0]
+        self.notion = self.primary.notion
+        # La base del merge è lo stock condiviso: un solo archivio per tutti i negozi
+        self.merge_base = self.primary.merge_base
+        self.tiers = self.primary.tiers
+        self.history = self.primary.history
+        self.stock_view = self.primary.stock_view
+        self.archive = self.primary.archive
+        for synchronizer in synchronizers:
+            synchronizer.peers = synchronizers
+        for synchronizer in synchronizers[1:]:
+            synchronizer.merge_base = self.merge_base
+            synchronizer.tiers = self.tiers
+            synchronizer.history = self.history
+            synchronizer.stock_view = self.stock_view
+            synchronizer.archive = self.archive
+    
+    @property
+    def row_stats(self) -> Counter:
+        """Esiti per riga dell'ultimo ciclo, sommati su tutti i negozi"""
+        stats = sum((synchronizer.row_stats for synchronizer in self.synchronizers), Counter())
+        # Gli SKU oscillanti sono contati sulla base condivisa, non per negozio
+        stats["oscillating"] = len(self.merge_base.oscillating)
+        return stats
+    
+    @staticmethod
+    def _store_name(synchronizer: StockSynchronizer) -> str:
+        """Nome del negozio di un sincronizzatore (per i log)"""
+        return synchronizer.woo.store or "default"
+    
+    def sync(self):
+        """Esegue la sincronizzazione completa di tutti i negozi"""
+        if len(self.synchronizers) == 1:
+            return self.primary.sync()
+        
+        stores = len(self.synchronizers)
+        try:
+            logger.info(f"🔄 Inizio sincronizzazione di {stores} negozi...")
+            row_sampler.begin_cycle()
+            self.notion.coalescer.begin_cycle()
+            self.notion.refresh_schema_if_stale()
+            
+            # Cataloghi dei negozi e database Notion letti in parallelo, una volta per ciclo
+            with ThreadPoolExecutor(max_workers=stores + 1, thread_name_prefix="store") as pool:
+                records = pool.submit(self.notion.get_all_records, StockSynchronizer.NOTION_PROPERTIES)
+                catalogs = list(pool.map(self._load_store, self.synchronizers))
+                notion_records = records.result()
+            rows_by_sku = StockSynchronizer.rows_by_sku(self.synchronizers)
+            if self.archive is not None:
+                self.archive.begin_cycle(rows_by_sku)
+            self._plan_merges(notion_records)
+            
+            # Notion → negozi: le scritture partono in parallelo su tutti i negozi
+            with ThreadPoolExecutor(max_workers=stores, thread_name_prefix="store") as pool:
+                list(pool.map(lambda synchronizer: synchronizer._sync_notion_to_woo(notion_records), self.synchronizers))
+            
+            # Negozi → Notion: una sola scrittura per SKU, in serie sul database condiviso
+            for synchronizer, rows in self._merge_rows():
+                logger.debug(f"📤 {len(rows)} righe dal negozio {self._store_name(synchronizer)}")
+                synchronizer._sync_woo_to_notion(rows=rows)
+            
+            # Uno SKU si archivia solo se è inattivo su tutti i negozi
+            if self.archive is not None:
+                self.primary.row_stats["archived_now"] = self.archive.archive_inactive(
+                    rows_by_sku, self.primary._notion_index
+                )
+            self.tiers.prune(self.archive.active(rows_by_sku) if self.archive is not None else rows_by_sku)
+            self.merge_base.prune(rows_by_sku)
+            for synchronizer in self.synchronizers:
+                synchronizer.finish_cycle()
+            self.merge_base.log_oscillating()
+            bases = self.merge_base.bases()
+            self.history.record(bases)
+            # Metadati dal primo negozio che ha lo SKU, stock dalla base condivisa
+            self.stock_view.publish(
+                (row for synchronizer in self.synchronizers for row in synchronizer._woo_rows.values()), bases
+            )
+            # Le analisi AI leggono il negozio principale: lo stock è condiviso tra i negozi
+            self.primary.keep_cycle_data(catalogs[0], self.synchronizers)
+            StockSynchronizer.log_row_stats(self.row_stats)
+            logger.info(f"✓ Sincronizzazione di {stores} negozi completata")
+        except Exception as e:
+            for synchronizer in self.synchronizers:
+                synchronizer.abort_cycle()
+            logger.error(f"✗ Errore durante la sincronizzazione dei negozi: {e}", exc_info=True)
+            raise
+        finally:
+            for synchronizer in self.synchronizers:
+                synchronizer.close_cycle()
+    
+    @staticmethod
+    def _load_store(synchronizer: StockSynchronizer) -> List[Dict]:
+        """Prepara il ciclo di un negozio e ne legge il catalogo"""
+        synchronizer.begin_cycle()
+        return synchronizer.load_catalog()
+    
+    def _plan_merges(self, notion_records: List):
+        """
+        Calcola lo stock concordato degli SKU presenti in più negozi
+        
+        Le variazioni di Notion e di ogni negozio rispetto alla base comune si
+        sommano, così una vendita su un negozio arriva a tutti gli altri.
+        """
+        for record in notion_records:
+            if not record.sku or record.stock is None:
+                continue
+            key = StockSynchronizer._normalize_sku(record.sku)
+            holders = [synchronizer for synchronizer in self.synchronizers if key in synchronizer._woo_rows]
+            if len(holders) < 2:
+                continue
+            target = MergeBaseStore.merge(
+                self.merge_base.base(key), record.stock, [synchronizer._woo_rows[key]["stock"] for synchronizer in holders]
+            )
+            for synchronizer in holders:
+                synchronizer._merge_targets[key] = target
+    
+    def _merge_rows(self) -> List[Tuple[StockSynchronizer, List[Dict]]]:
+        """
+        Sceglie per ogni SKU la riga da scrivere su Notion
+        
+        Vince il negozio con lo stock più basso; a parità, il primo configurato.
+        
+        Returns:
+            Righe raggruppate per negozio di provenienza (nell'ordine configurato)
+        """
+        merged: Dict[str, Tuple[StockSynchronizer, Dict]] = {}
+        for synchronizer in self.synchronizers:
+            for key, row in synchronizer._woo_rows.items():
+                current = merged.get(key)
+                if current is None or int(row["stock"] or 0) < int(current[1]["stock"] or 0):
+                    merged[key] = (synchronizer, row)
+        
+        groups: Dict[int, List[Dict]] = {id(synchronizer): [] for synchronizer in self.synchronizers}
+        for synchronizer, row in merged.values():
+            groups[id(synchronizer)].append(row)
+        return [(synchronizer, groups[id(synchronizer)]) for synchronizer in self.synchronizers if groups[id(synchronizer)]]
+    
+    def take_cycle_data(self):
+        """Catalogo del negozio principale e item Notion dell'ultimo ciclo (vedi StockSynchronizer.take_cycle_data)"""
+        return self.primary.take_cycle_data()
+    
+    def sync_skus(self, skus, records=None) -> Dict:
+        """Riconcilia solo gli SKU indicati su tutti i negozi (vedi StockSynchronizer.sync_skus)"""
+        return self.primary.sync_skus(skus, records, stores=self.synchronizers)
+    
+    def sync_hot(self) -> Dict:
+        """Giro della fascia calda su tutti i negozi (vedi StockSynchronizer.sync_hot)"""
+        return self.primary.sync_hot(stores=self.synchronizers)
+    
+    def retry_dead_letters(self) -> Dict:
+        """Ritenta le righe in coda di tutti i negozi"""
+        totals = Counter()
+        for synchronizer in self.synchronizers:
+            totals.update(synchronizer.retry_dead_letters())
+        return dict(totals)
+    
+    def dead_letters_summary(self) -> Dict:
+        """Riepilogo delle code delle righe fallite, sommato su tutti i negozi"""
+        summary = {"pending": 0, "due": 0, "by_error": Counter()}
+        for synchronizer in self.synchronizers:
+            store = synchronizer.dead_letters.summary()
+            summary["pending"] += store["pending"]
+            summary["due"] += store["due"]
+            summary["by_error"].update(store["by_error"])
+        summary["by_error"] = dict(summary["by_error"])
+        return summary
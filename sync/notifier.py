@@ -1,18 +1,22 @@
 from loguru import logger
 from typing import List, Dict
 from datetime import datetime
+from sync.dashboard import KPIAggregator, NotionDashboard
 
 class NotionNotifier:
     """Gestisce notifiche intelligenti su Notion"""
     
-    def __init__(self, notion_client):
+    def __init__(self, notion_client, dashboard_page_id: str = None):
         """
         Inizializza il notifier
         
         Args:
             notion_client: Client Notion per comunicare
+            dashboard_page_id: ID della pagina Notion per la dashboard KPI (opzionale)
         """
         self.notion = notion_client
+        self.kpi = KPIAggregator()
+        self.dashboard = NotionDashboard(notion_client, dashboard_page_id) if dashboard_page_id else None
         logger.info("✓ Notion Notifier inizializzato")
     
     def notify_discrepancies(self, discrepancies: List[Dict]):
@@ -114,7 +118,7 @@ class NotionNotifier:
         Aggiorna le note dei prodotti in Notion con analisi AI
         
         Args:
-            notion_items: Item Notion da aggiornare
+            notion_items: Item Notion da aggiornare (NotionRecord)
             analysis_result: Risultato dell'analisi AI
             ai_agent: Istanza AI Agent
         """
@@ -169,8 +173,111 @@ class NotionNotifier:
                 for sugg in sync_data['suggestions'][:5]:  # Primi 5
                     report += f"  • {sugg['product_name']} ({sugg['current_stock']} unità)\n"
             
+            if 'kpi' in sync_data:
+                kpi = sync_data['kpi']
+                report += "\n📈 KPI magazzino:\n"
+                report += f"  • SKU totali: {kpi.get('total_skus', 0)}\n"
+                report += f"  • Stock totale: {kpi.get('total_stock', 0)}\n"
+                report += f"  • SKU esauriti: {kpi.get('out_of_stock', 0)}\n"
+            
+            if sync_data.get('rows'):
+                rows = sync_data['rows']
+                report += (
+                    f"🧾 Righe: {rows.get('updated', 0)} stock aggiornati, {rows.get('created', 0)} creati, "
+                    f"{rows.get('pushed', 0)} inviati a WooCommerce, {rows.get('unchanged', 0)} invariati, "
+                    f"{rows.get('errors', 0)} errori\n"
+                )
+                if rows.get('oscillating'):
+                    report += f"🔁 SKU oscillanti tra Notion e WooCommerce: {rows['oscillating']}\n"
+                if rows.get('archived_now') or rows.get('restored'):
+                    report += f"🗄️  Archivio: {rows.get('archived_now', 0)} SKU archiviati, {rows.get('restored', 0)} ripristinati\n"
+            
+            if sync_data.get('tiers'):
+                tiers = sync_data['tiers']
+                report += f"🔥 Fasce SKU: {tiers['hot_total']} calde ({tiers['hot']} per giro), {tiers['cold']} fredde\n"
+            
+            if sync_data.get('dead_letters', {}).get('pending'):
+                dead_letters = sync_data['dead_letters']
+                errors = ", ".join(f"{name}: {count}" for name, count in dead_letters.get('by_error', {}).items())
+                report += f"📮 Righe fallite in coda: {dead_letters['pending']} ({dead_letters.get('due', 0)} da ritentare) - {errors}\n"
+            
+            if 'cycle' in sync_data:
+                cycle = sync_data['cycle']
+                api_calls = cycle.get('api_calls', {})
+                report += f"⏱️  Durata ciclo: {cycle.get('duration', 0):.1f}s\n"
+                report += f"🔌 Chiamate API: WooCommerce {api_calls.get('woocommerce', 0)}, Notion {api_calls.get('notion', 0)}\n"
+                circuits = cycle.get('circuits', {})
+                if circuits:
+                    report += "🔌 Circuit breaker: " + ", ".join(
+                        f"{name} {state['state']} ({state['trips']} aperture, {state['rejected']} chiamate bloccate)"
+                        for name, state in circuits.items()
+                    ) + "\n"
+                coalescing = cycle.get('coalescing', {})
+                if coalescing:
+                    report += "🔗 Letture coalescenti: " + ", ".join(
+                        f"{name} {stats['hits']} riusate, {stats['coalesced']} condivise su {stats['requests']}"
+                        for name, stats in coalescing.items()
+                    ) + "\n"
+                concurrency = cycle.get('concurrency', {})
+                if concurrency:
+                    report += "🎚️  Concorrenza adattiva: " + ", ".join(
+                        f"{name} {window['window']}/{window['max']} (picco {window.get('peak', 0)} in parallelo, "
+                        f"{window['decreases']} riduzioni)"
+                        for name, window in concurrency.items()
+                    ) + "\n"
+                woo_cache = cycle.get('woo_cache')
+                if woo_cache:
+                    report += (
+                        f"🗃️  Cache WooCommerce: {woo_cache['hit_rate']:.0f}% hit "
+                        f"({woo_cache['not_modified']} 304, {woo_cache['unchanged']} invariate, {woo_cache['misses']} nuove)\n"
+                    )
+            
+            if self.dashboard:
+                self._update_dashboard(timestamp, sync_data)
+            
             return report
         
         except Exception as e:
             logger.error(f"✗ Errore nella creazione report: {e}")
             return "Errore nella generazione del report"
+    
+    @staticmethod
+    def _circuit_label(state: Dict) -> str:
+        """Testo della dashboard per lo stato di un circuit breaker"""
+        if not state:
+            return "n/d"
+        return f"{state['state']} ({state['trips']} aperture)"
+    
+    def _update_dashboard(self, timestamp: str, sync_data: Dict):
+        """
+        Aggiorna la dashboard KPI su Notion con i dati del ciclo
+        
+        Args:
+            timestamp: Data/ora del report
+            sync_data: Dati della sincronizzazione
+        """
+        try:
+            kpi = sync_data.get('kpi', self.kpi.snapshot())
+            cycle = sync_data.get('cycle', {})
+            api_calls = cycle.get('api_calls', {})
+            discrepancies = kpi.get('discrepancies', {})
+            
+            self.dashboard.update({
+                "updated_at": timestamp,
+                "total_skus": kpi.get('total_skus', 0),
+                "total_stock": kpi.get('total_stock', 0),
+                "out_of_stock": kpi.get('out_of_stock', 0),
+                "discrepancies_critical": discrepancies.get('CRITICAL', 0),
+                "discrepancies_high": discrepancies.get('HIGH', 0),
+                "discrepancies_medium": discrepancies.get('MEDIUM', 0),
+                "discrepancies_low": discrepancies.get('LOW', 0),
+                "cycle_duration": f"{cycle.get('duration', 0):.1f}",
+                "api_calls_woocommerce": api_calls.get('woocommerce', 0),
+                "api_calls_notion": api_calls.get('notion', 0),
+                "circuit_woocommerce": self._circuit_label(cycle.get('circuits', {}).get('woocommerce')),
+                "circuit_notion": self._circuit_label(cycle.get('circuits', {}).get('notion')),
+                "concurrency_woocommerce": cycle.get('concurrency', {}).get('woocommerce', {}).get('window', 'n/d'),
+                "concurrency_notion": cycle.get('concurrency', {}).get('notion', {}).get('window', 'n/d')
+            })
+        except Exception as e:
+            logger.warning(f"⚠️  Errore nell'aggiornamento della dashboard Notion: {e}")
@@ -1,6 +1,20 @@
 from notion_client import Client
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
 from loguru import logger
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import os
+import threading
+import time
+import httpx
+from sync.circuit_breaker import CircuitBreaker, CircuitOpenError
+from sync.coalescing import SingleFlight
+from sync.concurrency import AdaptiveConcurrency
+from sync.notion_schema import NotionSchema, NotionRecord, EXTRACTORS
+from sync.notion_partitions import category_partitions, sku_prefix_partitions, DEFAULT_SKU_PREFIXES
+from sync.projection import notion_property_ids
+from sync.rate_limiter import RateLimiter
 
 class NotionClient:
     """Client per interagire con il database Notion"""
@@ -15,6 +29,30 @@ class NotionClient:
         """
         self.token = token
         self.database_id = database_id
+        self.api_calls = 0
+        self.schema: Optional[NotionSchema] = None
+        self.schema_ttl = int(os.getenv('NOTION_SCHEMA_TTL', 3600))
+        self._schema_loaded_at: Optional[float] = None
+        self._calls_lock = threading.Lock()
+        self.breaker = CircuitBreaker("Notion")
+        self.concurrency = AdaptiveConcurrency("Notion", maximum=int(os.getenv('NOTION_MAX_CONCURRENCY', 4)))
+        self.coalescer = SingleFlight("Notion")
+        self.rate_limiter = RateLimiter(
+            rate=float(os.getenv('NOTION_RATE_LIMIT', 3)),
+            burst=int(os.getenv('NOTION_RATE_BURST', 3))
+        )
+        
+        # Lettura completa partizionata (category, sku_prefix o vuoto = seriale)
+        self.partition_by = os.getenv('NOTION_PARTITIONED_READ', '').strip().lower() or None
+        self.partition_workers = int(os.getenv('NOTION_PARTITION_WORKERS', 4))
+        sku_prefixes = os.getenv('NOTION_PARTITION_SKU_PREFIXES', '')
+        self.sku_prefixes = tuple(p.strip() for p in sku_prefixes.split(',') if p.strip()) or DEFAULT_SKU_PREFIXES
+        self.known_item_count: Optional[int] = None
+        # Ogni quante letture complete una è seriale, per aggiornare il conteggio di riferimento
+        self.serial_read_every = int(os.getenv('NOTION_PARTITION_SERIAL_EVERY', 12))
+        self._partitioned_reads = 0
+        # True se l'ultima lettura completa è stata partizionata (può non vedere alcune righe)
+        self.last_read_partitioned = False
         
         try:
             self.client = Client(auth=token)
@@ -23,85 +61,433 @@ class NotionClient:
             logger.error(f"✗ Errore nella connessione a Notion: {e}")
             raise
     
-    def get_all_items(self) -> List[Dict]:
-        """Recupera tutti gli item dal database Notion"""
+    def _call(self, fn, **kwargs):
+        """
+        Esegue una chiamata all'API Notion rispettando il rate limit e la
+        finestra di concorrenza adattiva, tenendo il conteggio delle richieste
+        
+        Args:
+            fn: Metodo dell'SDK Notion da invocare (es. self.client.pages.update)
+            **kwargs: Argomenti della chiamata
+        
+        Raises:
+            CircuitOpenError: Se Notion è considerato non disponibile
+        """
+        self.breaker.before_call()
+        self.rate_limiter.acquire()
+        with self._calls_lock:
+            self.api_calls += 1
+        
+        with self.concurrency.slot() as slot:
+            try:
+                result = fn(**kwargs)
+            except Exception as e:
+                slot.overloaded = self._is_outage(e)
+                if slot.overloaded:
+                    self.breaker.record_failure()
+                else:
+                    # Errore di validazione o not found: Notion ha comunque risposto
+                    self.breaker.record_success()
+                raise
+        
+        self.breaker.record_success()
+        return result
+    
+    @staticmethod
+    def _is_outage(error: Exception) -> bool:
+        """True se l'errore indica Notion non disponibile (timeout, rete, 429 o 5xx)"""
+        if isinstance(error, (RequestTimeoutError, httpx.TransportError)):
+            return True
+        return isinstance(error, HTTPResponseError) and (error.status >= 500 or error.status == 429)
+    
+    def _query_kwargs(self, properties=None) -> Dict:
+        """Argomenti comuni di databases.query, con proiezione delle proprietà se richiesta"""
+        kwargs = {"database_id": self.database_id}
+        if properties:
+            if self.schema is None:
+                self.load_schema()
+            property_ids = notion_property_ids(self.schema, properties)
+            if property_ids:
+                kwargs["filter_properties"] = property_ids
+        return kwargs
+    
+    def iter_items(self, properties=None) -> Iterator[Dict]:
+        """
+        Scorre tutti gli item del database Notion, una pagina di risultati alla volta
+        
+        Args:
+            properties: Nomi delle proprietà da richiedere (None = tutte)
+        """
+        return self._iter_query(self._query_kwargs(properties))
+    
+    def _iter_query(self, query_kwargs: Dict) -> Iterator[Dict]:
+        """Segue il cursore di una databases.query fino all'ultima pagina di risultati"""
+        has_more = True
+        start_cursor = None
+        
+        while has_more:
+            response = self._call(
+                self.client.databases.query,
+                start_cursor=start_cursor,
+                **query_kwargs
+            )
+            
+            yield from response.get('results', [])
+            has_more = response.get('has_more', False)
+            start_cursor = response.get('next_cursor')
+    
+    def _read_partitioned(self, properties, partition_by: str) -> Optional[Tuple[List[Dict], List[NotionRecord]]]:
+        """
+        Legge l'intero database scorrendo in parallelo i cursori di partizioni disgiunte
+        
+        Le partizioni condividono il rate limiter del client. Il risultato viene
+        verificato: ogni pagina deve comparire una sola volta, nella partizione
+        che la contiene, e il totale non può essere inferiore all'ultimo conteggio
+        ottenuto con una lettura seriale (ripetuta ogni serial_read_every letture).
+        
+        Args:
+            properties: Nomi delle proprietà da richiedere (None = tutte)
+            partition_by: 'category' o 'sku_prefix'
+        
+        Returns:
+            Tupla (pagine, record) o None se la lettura partizionata non è affidabile
+        """
+        if self.schema is None:
+            self.load_schema()
+        
+        if partition_by == 'category':
+            partitions = category_partitions(self.schema)
+            partition_property = 'Category'
+        elif partition_by == 'sku_prefix':
+            try:
+                partitions = sku_prefix_partitions(self.sku_prefixes)
+            except ValueError as e:
+                logger.warning(f"⚠️  {e}")
+                return None
+            partition_property = 'SKU'
+        else:
+            logger.warning(f"⚠️  Partizionamento Notion sconosciuto: {partition_by}")
+            return None
+        
+        if not partitions:
+            logger.warning(f"⚠️  Impossibile partizionare il database per {partition_by}")
+            return None
+        
+        # La proprietà di partizione serve alla verifica locale
+        if properties:
+            properties = tuple(dict.fromkeys([*properties, partition_property]))
+        base_kwargs = self._query_kwargs(properties)
+        
+        def read(partition):
+            return list(self._iter_query(dict(base_kwargs, filter=partition.filter)))
+        
+        workers = max(1, min(self.partition_workers, len(partitions)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(read, partitions))
+        
+        pages, records = [], []
+        seen = set()
+        duplicates = misplaced = 0
+        for partition, partition_pages in zip(partitions, results):
+            for page in partition_pages:
+                if page['id'] in seen:
+                    duplicates += 1
+                    continue
+                seen.add(page['id'])
+                record = self.to_record(page)
+                if not partition.contains(record):
+                    misplaced += 1
+                pages.append(page)
+                records.append(record)
+        
+        if duplicates or misplaced:
+            logger.warning(f"⚠️  Partizioni Notion non disgiunte ({duplicates} duplicati, {misplaced} fuori partizione)")
+            return None
+        if self.known_item_count is not None and len(pages) < self.known_item_count:
+            logger.warning(f"⚠️  Partizioni Notion incomplete ({len(pages)} item, attesi almeno {self.known_item_count})")
+            return None
+        
+        logger.debug(f"✓ Lettura partizionata Notion: {len(partitions)} partizioni, {len(pages)} item")
+        return pages, records
+    
+    def _read_all(self, properties=None, with_records=False) -> Tuple[List[Dict], Optional[List[NotionRecord]]]:
+        """Lettura completa: partizionata se configurata e verificabile, altrimenti seriale"""
+        # La prima lettura è sempre seriale e lo è una ogni serial_read_every: fornisce il
+        # conteggio di riferimento per la verifica, aggiornato con le righe aggiunte dall'interfaccia
+        serial_due = self.serial_read_every > 0 and self._partitioned_reads >= self.serial_read_every
+        if self.partition_by and self.known_item_count is not None and not serial_due:
+            result = self._read_partitioned(properties, self.partition_by)
+            if result is not None:
+                self._partitioned_reads += 1
+                self.last_read_partitioned = True
+                return result
+            logger.info("ℹ️  Ritorno alla lettura seriale del database Notion")
+        
+        pages = list(self.iter_items(properties))
+        self.known_item_count = len(pages)
+        self._partitioned_reads = 0
+        self.last_read_partitioned = False
+        return pages, [self.to_record(page) for page in pages] if with_records else None
+    
+    def get_all_items(self, properties=None) -> List[Dict]:
+        """Recupera tutti gli item dal database Notion (opzionalmente solo alcune proprietà)"""
         try:
             logger.debug("📥 Recupero item da Notion...")
-            items = []
-            has_more = True
-            start_cursor = None
-            
-            while has_more:
-                response = self.client.databases.query(
-                    database_id=self.database_id,
-                    start_cursor=start_cursor
-                )
-                
-                items.extend(response.get('results', []))
-                has_more = response.get('has_more', False)
-                start_cursor = response.get('next_cursor')
-            
+            items, _ = self._read_all(properties)
             logger.info(f"✓ Recuperati {len(items)} item da Notion")
             return items
         except Exception as e:
             logger.error(f"✗ Errore nel recupero degli item: {e}")
             raise
     
-    def get_item_by_sku(self, sku: str):
+    def is_empty(self) -> bool:
+        """Verifica con una sola richiesta se il database non contiene item"""
+        response = self._call(
+            self.client.databases.query,
+            page_size=1,
+            **self._query_kwargs(("SKU",))
+        )
+        return not response.get('results')
+    
+    def load_schema(self) -> NotionSchema:
+        """Recupera lo schema del database e lo compila in estrattori per proprietà"""
+        try:
+            database = self._call(self.client.databases.retrieve, database_id=self.database_id)
+            self.schema = NotionSchema(database.get('properties', {}))
+            self._schema_loaded_at = time.monotonic()
+            logger.debug(f"✓ Schema Notion caricato ({len(self.schema.properties)} proprietà)")
+        except Exception as e:
+            logger.warning(f"⚠️  Schema Notion non disponibile, verrà ricavato dalle pagine: {e}")
+        return self.schema
+    
+    def refresh_schema_if_stale(self) -> Optional[NotionSchema]:
+        """Ricarica lo schema se non è mai stato letto o se è più vecchio di NOTION_SCHEMA_TTL"""
+        if self._schema_loaded_at is None or time.monotonic() - self._schema_loaded_at >= self.schema_ttl:
+            self.load_schema()
+        return self.schema
+    
+    @staticmethod
+    def normalize_select_name(name: str) -> str:
+        """Adatta un nome alle regole delle opzioni select Notion (niente virgole, max 100 caratteri)"""
+        return " ".join((name or "").replace(",", " ").split())[:100].strip()
+    
+    def select_value(self, prop_name: str, name: str) -> str:
         """
-        Recupera un item dal database usando lo SKU
-        Normalizza lo SKU (trim e case-insensitive) per evitare duplicati
+        Verifica localmente un valore da scrivere in una proprietà select
+        
+        Args:
+            prop_name: Nome della proprietà select
+            name: Valore desiderato
+        
+        Returns:
+            Nome dell'opzione da scrivere, o stringa vuota se l'opzione non esiste
+            (la proprietà viene omessa invece di far fallire l'intera scrittura)
+        """
+        name = self.normalize_select_name(name)
+        if not name or self.schema is None:
+            return name
+        
+        options = self.schema.select_options(prop_name)
+        if options is None or name in options:
+            return name
+        
+        logger.debug(f"⊘ Opzione '{name}' assente dalla select {prop_name} - proprietà non scritta")
+        return ""
+    
+    def ensure_select_options(self, prop_name: str, names) -> int:
+        """
+        Crea con un'unica modifica dello schema le opzioni select mancanti
+        
+        Args:
+            prop_name: Nome della proprietà select
+            names: Valori che le prossime scritture useranno
+        
+        Returns:
+            Numero di opzioni create
         """
+        self.refresh_schema_if_stale()
+        if self.schema is None:
+            return 0
+        
+        options = self.schema.select_options(prop_name)
+        if options is None:
+            return 0
+        
+        missing = sorted({self.normalize_select_name(name) for name in names if name} - options - {""})
+        if not missing:
+            return 0
+        
         try:
-            # Normalizza lo SKU per la ricerca
-            sku_normalized = sku.strip() if sku else ""
-            
-            if not sku_normalized:
-                logger.warning("⚠️  SKU vuoto - impossibile cercare item")
-                return None
-            
-            logger.info(f"🔍 Ricerca item con SKU: '{sku_normalized}'")
-            
-            # Primo tentativo: ricerca esatta
-            response = self.client.databases.query(
+            existing = self.schema.properties[prop_name].get('select', {}).get('options', [])
+            database = self._call(
+                self.client.databases.update,
                 database_id=self.database_id,
-                filter={
-                    "property": "SKU",
-                    "rich_text": {
-                        "equals": sku_normalized
+                properties={
+                    prop_name: {
+                        "select": {
+                            "options": [
+                                {key: option[key] for key in ('id', 'name', 'color') if key in option}
+                                for option in existing
+                            ] + [{"name": name} for name in missing]
+                        }
                     }
                 }
             )
-            
-            if response['results']:
-                found_item = response['results'][0]
-                logger.info(f"✓ Trovato item esatto per SKU: {sku_normalized}")
-                return found_item
-            
-            # Se non trovato con ricerca esatta, recupera tutti gli item e cerca manualmente
-            logger.info(f"⚠️  SKU esatto non trovato '{sku_normalized}', ricerca manuale tra tutti gli item...")
-            all_items = self.get_all_items()
-            
-            for item in all_items:
-                try:
-                    item_sku = self.extract_property(item, 'SKU')
-                    if item_sku:
-                        item_sku_normalized = item_sku.strip().lower()
-                        search_sku_normalized = sku_normalized.lower()
-                        if item_sku_normalized == search_sku_normalized:
-                            logger.info(f"✓ Trovato item con SKU normalizzato: '{sku_normalized}' (match: '{item_sku}')")
-                            return item
-                except Exception as e:
-                    logger.debug(f"⚠️  Errore nell'estrazione SKU da item: {e}")
-                    continue
-            
-            logger.warning(f"✗ Item NON trovato per SKU: '{sku_normalized}' - verrà creato nuovo item")
-            return None
-            
+            self.schema = NotionSchema(database.get('properties', {}))
+            self._schema_loaded_at = time.monotonic()
+            logger.info(f"✓ Aggiunte {len(missing)} opzioni alla select {prop_name}: {', '.join(missing)}")
+            return len(missing)
+        except Exception as e:
+            logger.warning(f"⚠️  Impossibile aggiungere opzioni alla select {prop_name}: {e}")
+            return 0
+    
+    def to_record(self, page: Dict) -> NotionRecord:
+        """Converte una pagina Notion in un NotionRecord compatto"""
+        if self.schema is None:
+            self.load_schema()
+        if self.schema is None:
+            self.schema = NotionSchema.from_page(page)
+        return self.schema.to_record(page)
+    
+    def iter_records(self, properties=None) -> Iterator[NotionRecord]:
+        """Scorre tutti gli item del database come NotionRecord"""
+        for page in self.iter_items(properties):
+            yield self.to_record(page)
+    
+    def get_all_records(self, properties=None) -> List[NotionRecord]:
+        """
+        Recupera tutti gli item dal database Notion come NotionRecord
+        
+        Args:
+            properties: Nomi delle proprietà da richiedere (None = tutte)
+        """
+        try:
+            logger.debug("📥 Recupero item da Notion...")
+            _, records = self._read_all(properties, with_records=True)
+            logger.info(f"✓ Recuperati {len(records)} item da Notion")
+            return records
+        except Exception as e:
+            logger.error(f"✗ Errore nel recupero degli item: {e}")
+            raise
+    
+    def query_records(self, filter: Dict, properties=None) -> List[NotionRecord]:
+        """
+        Item del database che soddisfano un filtro Notion, come NotionRecord
+        
+        Args:
+            filter: Filtro di databases.query
+            properties: Nomi delle proprietà da richiedere (None = tutte)
+        """
+        return [self.to_record(page) for page in self._iter_query(dict(self._query_kwargs(properties), filter=filter))]
+    
+    def get_records_by_skus(self, skus, properties=None) -> Dict[str, NotionRecord]:
+        """
+        Recupera gli item di più SKU con una query filtrata (OR) ogni 100 SKU
+        
+        Args:
+            skus: SKU da cercare (confronto esatto, come il primo tentativo di get_item_by_sku)
+            properties: Nomi delle proprietà da richiedere (None = tutte)
+        
+        Returns:
+            Dict SKU normalizzato (trim, minuscolo) -> NotionRecord; gli SKU non trovati non compaiono
+        """
+        wanted = list(dict.fromkeys(sku.strip() for sku in skus if sku and sku.strip()))
+        found = {}
+        for start in range(0, len(wanted), 100):
+            chunk = wanted[start:start + 100]
+            conditions = [{"property": "SKU", "rich_text": {"equals": sku}} for sku in chunk]
+            for record in self.query_records({"or": conditions} if len(conditions) > 1 else conditions[0], properties):
+                if record.sku:
+                    found.setdefault(record.sku.strip().lower(), record)
+        logger.debug(f"🔍 Lookup multiplo: {len(found)}/{len(wanted)} SKU trovati su Notion")
+        return found
+    
+    def get_item_by_sku(self, sku: str, properties=None):
+        """
+        Recupera un item dal database usando lo SKU
+        Normalizza lo SKU (trim e case-insensitive) per evitare duplicati
+        
+        Ricerche identiche nello stesso ciclo condividono un'unica esecuzione;
+        aggiornamenti e creazioni di item invalidano i risultati interessati.
+        
+        Args:
+            sku: SKU da cercare
+            properties: Nomi delle proprietà da richiedere (None = tutte)
+        """
+        try:
+            key = f"item_by_sku:{(sku or '').strip().lower()}:{','.join(properties or ())}"
+            return self.coalescer.do(key, lambda: self._find_item_by_sku(sku, properties), self._item_tags)
+        except CircuitOpenError:
+            # Notion non disponibile: "non trovato" porterebbe a creare un duplicato
+            raise
         except Exception as e:
             logger.error(f"✗ Errore nel recupero dell'item per SKU: {e}")
             return None
     
+    @staticmethod
+    def _item_tags(item) -> List[str]:
+        """Tag di invalidazione di una ricerca per SKU: ID della pagina o 'missing' se non trovata"""
+        return [item['id']] if item else ["missing"]
+    
+    def _find_item_by_sku(self, sku: str, properties=None):
+        """Ricerca per SKU vera e propria (vedi get_item_by_sku)"""
+        # Normalizza lo SKU per la ricerca
+        sku_normalized = sku.strip() if sku else ""
+        
+        if not sku_normalized:
+            logger.warning("⚠️  SKU vuoto - impossibile cercare item")
+            return None
+        
+        logger.debug(f"🔍 Ricerca item con SKU: '{sku_normalized}'")
+        
+        # Primo tentativo: ricerca esatta
+        query_kwargs = self._query_kwargs(properties)
+        response = self._call(
+            self.client.databases.query,
+            **query_kwargs,
+            filter={
+                "property": "SKU",
+                "rich_text": {
+                    "equals": sku_normalized
+                }
+            }
+        )
+        
+        if response['results']:
+            found_item = response['results'][0]
+            logger.debug(f"✓ Trovato item esatto per SKU: {sku_normalized}")
+            return found_item
+        
+        # Se non trovato con ricerca esatta, recupera tutti gli item e cerca manualmente
+        logger.debug(f"⚠️  SKU esatto non trovato '{sku_normalized}', ricerca manuale tra tutti gli item...")
+        search_sku_normalized = sku_normalized.lower()
+        
+        # La scansione legge solo lo SKU; la pagina trovata viene poi recuperata per intero
+        for item in self.iter_items(properties=("SKU",)):
+            try:
+                item_sku = self.to_record(item).sku
+                if item_sku:
+                    item_sku_normalized = item_sku.strip().lower()
+                    if item_sku_normalized == search_sku_normalized:
+                        logger.debug(f"✓ Trovato item con SKU normalizzato: '{sku_normalized}' (match: '{item_sku}')")
+                        retrieve_kwargs = {"page_id": item['id']}
+                        if "filter_properties" in query_kwargs:
+                            retrieve_kwargs["filter_properties"] = query_kwargs["filter_properties"]
+                        return self._call(self.client.pages.retrieve, **retrieve_kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.debug(f"⚠️  Errore nell'estrazione SKU da item: {e}")
+                continue
+        
+        logger.warning(f"✗ Item NON trovato per SKU: '{sku_normalized}' - verrà creato nuovo item")
+        return None
+    
+    def get_record_by_sku(self, sku: str, properties=None) -> Optional[NotionRecord]:
+        """Recupera un item tramite SKU come NotionRecord (None se assente)"""
+        item = self.get_item_by_sku(sku, properties)
+        return self.to_record(item) if item else None
+    
     def update_item_stock(self, page_id: str, quantity: int, brand: str = "", price: str = "", categories: str = ""):
         """
         Aggiorna lo stock (e opzionalmente brand, prezzo e categorie) di un item
@@ -136,7 +522,8 @@ class NotionClient:
                 except (ValueError, TypeError):
                     logger.warning(f"⚠️  Prezzo non valido per aggiornamento: {price}")
             
-            # Aggiungi Category se fornita (come Select)
+            # Aggiungi Category se fornita (come Select), solo se l'opzione esiste
+            categories = self.select_value("Category", categories)
             if categories:
                 update_data["Category"] = {
                     "select": {
@@ -144,10 +531,12 @@ class NotionClient:
                     }
                 }
             
-            self.client.pages.update(
+            self._call(
+                self.client.pages.update,
                 page_id=page_id,
                 properties=update_data
             )
+            self.coalescer.invalidate(page_id)
             log_msg = f"✓ Stock Notion aggiornato - Page {page_id}: {quantity} unità"
             if brand:
                 log_msg += f", Brand: {brand}"
@@ -155,7 +544,7 @@ class NotionClient:
                 log_msg += f", Prezzo: {price}"
             if categories:
                 log_msg += f", Categorie: {categories}"
-            logger.info(log_msg)
+            logger.debug(log_msg)
         except Exception as e:
             logger.error(f"✗ Errore nell'aggiornamento dello stock Notion: {e}")
             raise
@@ -168,32 +557,129 @@ class NotionClient:
             properties: Proprietà dell'item
         """
         try:
-            page = self.client.pages.create(
+            page = self._call(
+                self.client.pages.create,
                 parent={"database_id": self.database_id},
                 properties=properties
             )
-            logger.info(f"✓ Nuovo item creato in Notion: {page['id']}")
+            if self.known_item_count is not None:
+                self.known_item_count += 1
+            # Le ricerche che non trovavano lo SKU potrebbero ora trovarlo
+            self.coalescer.invalidate("missing")
+            logger.debug(f"✓ Nuovo item creato in Notion: {page['id']}")
             return page
         except Exception as e:
             logger.error(f"✗ Errore nella creazione dell'item: {e}")
             raise
     
+    def retrieve_page(self, page_id: str) -> Dict:
+        """Recupera una pagina Notion con tutte le proprietà"""
+        return self._call(self.client.pages.retrieve, page_id=page_id)
+    
+    def trash_item(self, page_id: str):
+        """
+        Sposta un item nel cestino di Notion (recuperabile dall'interfaccia)
+        
+        Args:
+            page_id: ID della pagina Notion
+        """
+        try:
+            self._call(self.client.pages.update, page_id=page_id, archived=True)
+            if self.known_item_count is not None:
+                self.known_item_count -= 1
+            self.coalescer.invalidate(page_id)
+            logger.debug(f"✓ Item spostato nel cestino: {page_id}")
+        except Exception as e:
+            logger.error(f"✗ Errore nello spostamento dell'item nel cestino: {e}")
+            raise
+    
+    def for_database(self, database_id: str) -> 'NotionClient':
+        """
+        Client per un altro database dello stesso workspace
+        
+        Il rate limit di Notion vale per integrazione: il nuovo client condivide
+        connessione, rate limiter, circuito e finestra di concorrenza con questo,
+        ma ha schema, conteggio degli item e coalescenza propri.
+        
+        Args:
+            database_id: ID dell'altro database
+        """
+        sibling = copy.copy(self)
+        sibling.database_id = database_id
+        sibling.api_calls = 0
+        sibling.schema = None
+        sibling._schema_loaded_at = None
+        sibling.known_item_count = None
+        sibling._partitioned_reads = 0
+        sibling.last_read_partitioned = False
+        sibling.coalescer = SingleFlight("Notion")
+        return sibling
+    
+    def list_block_children(self, block_id: str) -> List[Dict]:
+        """Recupera i blocchi figli di una pagina o di un blocco"""
+        try:
+            blocks = []
+            has_more = True
+            start_cursor = None
+            
+            while has_more:
+                kwargs = {"block_id": block_id}
+                if start_cursor:
+                    kwargs["start_cursor"] = start_cursor
+                response = self._call(self.client.blocks.children.list, **kwargs)
+                blocks.extend(response.get('results', []))
+                has_more = response.get('has_more', False)
+                start_cursor = response.get('next_cursor')
+            
+            return blocks
+        except Exception as e:
+            logger.error(f"✗ Errore nel recupero dei blocchi di {block_id}: {e}")
+            raise
+    
+    def append_paragraphs(self, block_id: str, texts: List[str]) -> List[Dict]:
+        """
+        Aggiunge paragrafi di testo in coda a una pagina
+        
+        Args:
+            block_id: ID della pagina o del blocco padre
+            texts: Testi dei paragrafi da aggiungere
+        
+        Returns:
+            Lista dei blocchi creati (nello stesso ordine dei testi)
+        """
+        try:
+            children = [
+                {
+                    "object": "block",
+                    "type": "paragraph",
+                    "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}
+                }
+                for text in texts
+            ]
+            response = self._call(self.client.blocks.children.append, block_id=block_id, children=children)
+            return response.get('results', [])
+        except Exception as e:
+            logger.error(f"✗ Errore nell'aggiunta di blocchi a {block_id}: {e}")
+            raise
+    
+    def update_paragraph(self, block_id: str, text: str):
+        """Sostituisce il testo di un blocco paragrafo"""
+        try:
+            self._call(
+                self.client.blocks.update,
+                block_id=block_id,
+                paragraph={"rich_text": [{"type": "text", "text": {"content": text}}]}
+            )
+        except Exception as e:
+            logger.error(f"✗ Errore nell'aggiornamento del blocco {block_id}: {e}")
+            raise
+    
     def extract_property(self, page: Dict, property_name: str):
         """Estrae il valore di una proprietà da una pagina Notion"""
         try:
             prop = page['properties'].get(property_name, {})
-            prop_type = prop.get('type')
-            
-            if prop_type == 'title':
-                return prop.get('title', [{}])[0].get('text', {}).get('content', '')
-            elif prop_type == 'rich_text':
-                return prop.get('rich_text', [{}])[0].get('text', {}).get('content', '')
-            elif prop_type == 'number':
-                return prop.get('number', 0)
-            elif prop_type == 'select':
-                return prop.get('select', {}).get('name', '')
-            else:
-                return None
+            extractor = EXTRACTORS.get(prop.get('type'))
+            return extractor(prop) if extractor else None
         except Exception as e:
             logger.warning(f"⚠️  Errore nell'estrazione della proprietà {property_name}: {e}")
             return None
@@ -0,0 +1,95 @@
+from typing import Callable, Dict, List, Optional, Sequence
+from sync.notion_schema import NotionRecord
+
+# Prefissi di default per la partizione per SKU: primo carattere alfanumerico
+DEFAULT_SKU_PREFIXES = tuple("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+class NotionPartition:
+    """Intervallo disgiunto del database Notion letto con un proprio cursore"""
+    
+    __slots__ = ('label', 'filter', 'contains')
+    
+    def __init__(self, label: str, filter: Dict, contains: Callable[[NotionRecord], bool]):
+        """
+        Args:
+            label: Nome leggibile della partizione (per i log)
+            filter: Filtro Notion che seleziona le righe della partizione
+            contains: Predicato locale equivalente al filtro, usato per la verifica
+        """
+        self.label = label
+        self.filter = filter
+        self.contains = contains
+
+def category_partitions(schema) -> Optional[List[NotionPartition]]:
+    """
+    Partiziona il database per valore della select `Category`
+    
+    Una select ha al più un valore, quindi le opzioni dello schema, la partizione
+    "vuota" e quella delle opzioni non presenti nello schema (ad esempio aggiunte
+    dall'interfaccia di Notion dopo la lettura dello schema) coprono ogni riga
+    esattamente una volta.
+    
+    Returns:
+        Lista di partizioni o None se lo schema non ha una select Category
+    """
+    prop = schema.properties.get('Category', {}) if schema else {}
+    if prop.get('type') != 'select':
+        return None
+    
+    partitions = []
+    names = set()
+    for option in prop.get('select', {}).get('options', []):
+        name = option.get('name')
+        names.add(name)
+        partitions.append(NotionPartition(
+            f"Category={name}",
+            {"property": "Category", "select": {"equals": name}},
+            lambda record, name=name: record.category == name
+        ))
+    
+    partitions.append(NotionPartition(
+        "Category=∅",
+        {"property": "Category", "select": {"is_empty": True}},
+        lambda record: not record.category
+    ))
+    partitions.append(NotionPartition(
+        "Category=altro",
+        {"and": [{"property": "Category", "select": {"is_not_empty": True}}] + [
+            {"property": "Category", "select": {"does_not_equal": name}} for name in sorted(names)
+        ]},
+        lambda record: bool(record.category) and record.category not in names
+    ))
+    return partitions
+
+def sku_prefix_partitions(prefixes: Sequence[str] = DEFAULT_SKU_PREFIXES) -> List[NotionPartition]:
+    """
+    Partiziona il database per prefisso dello SKU
+    
+    I prefissi devono essere disgiunti (nessun prefisso è prefisso di un altro); le righe
+    con SKU vuoto formano una partizione a parte. I filtri di Notion non esprimono
+    "non inizia con": gli SKU che non iniziano con nessun prefisso non sono coperti e
+    compaiono solo nelle letture seriali periodiche (NOTION_PARTITION_SERIAL_EVERY).
+    
+    Raises:
+        ValueError: Se un prefisso è prefisso di un altro
+    """
+    normalized = [prefix.upper() for prefix in prefixes]
+    for i, prefix in enumerate(normalized):
+        for other in normalized[i + 1:]:
+            if prefix.startswith(other) or other.startswith(prefix):
+                raise ValueError(f"Prefissi SKU sovrapposti: '{prefix}' e '{other}'")
+    
+    partitions = [
+        NotionPartition(
+            f"SKU^{prefix}",
+            {"property": "SKU", "rich_text": {"starts_with": prefix}},
+            lambda record, prefix=prefix.upper(): (record.sku or '').upper().startswith(prefix)
+        )
+        for prefix in prefixes
+    ]
+    partitions.append(NotionPartition(
+        "SKU=∅",
+        {"property": "SKU", "rich_text": {"is_empty": True}},
+        lambda record: not record.sku
+    ))
+    return partitions
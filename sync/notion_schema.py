@@ -0,0 +1,111 @@
+from loguru import logger
+from typing import Dict, Optional, Set
+
+# Campo del record -> nome della proprietà nel database Notion
+RECORD_PROPERTIES = {
+    "sku": "SKU",
+    "stock": "Stock",
+    "name": "Name",
+    "brand": "Brand",
+    "price": "Price",
+    "category": "Category",
+}
+
+def _extract_title(prop: Dict) -> str:
+    """Testo di una proprietà title"""
+    parts = prop.get('title') or []
+    return parts[0].get('text', {}).get('content', '') if parts else ''
+
+def _extract_rich_text(prop: Dict) -> str:
+    """Testo di una proprietà rich_text"""
+    parts = prop.get('rich_text') or []
+    return parts[0].get('text', {}).get('content', '') if parts else ''
+
+def _extract_number(prop: Dict):
+    """Valore di una proprietà number (None se vuota)"""
+    return prop.get('number')
+
+def _extract_select(prop: Dict) -> str:
+    """Nome dell'opzione di una proprietà select"""
+    return (prop.get('select') or {}).get('name', '')
+
+# Tipo di proprietà Notion -> funzione di estrazione del valore
+EXTRACTORS = {
+    "title": _extract_title,
+    "rich_text": _extract_rich_text,
+    "number": _extract_number,
+    "select": _extract_select,
+}
+
+class NotionRecord:
+    """Riga compatta del database Notion con i soli campi usati dalla sincronizzazione"""
+    
+    __slots__ = ('page_id', 'sku', 'stock', 'name', 'brand', 'price', 'category', 'last_edited')
+    
+    def __init__(self, page_id: str, sku: str = '', stock: Optional[int] = None, name: str = '',
+                 brand: str = '', price: Optional[float] = None, category: str = '', last_edited: str = None):
+        self.page_id = page_id
+        self.sku = sku
+        self.stock = stock
+        self.name = name
+        self.brand = brand
+        self.price = price
+        self.category = category
+        self.last_edited = last_edited
+    
+    def __repr__(self):
+        return f"NotionRecord(sku={self.sku!r}, stock={self.stock!r}, page_id={self.page_id!r})"
+
+class NotionSchema:
+    """
+    Schema del database Notion compilato in estrattori per proprietà
+    
+    Il tipo di ogni proprietà viene risolto una sola volta: la conversione
+    di una pagina in NotionRecord applica direttamente l'estrattore giusto.
+    """
+    
+    def __init__(self, properties: Dict):
+        """
+        Compila lo schema
+        
+        Args:
+            properties: Dict 'properties' del database Notion (nome -> definizione)
+        """
+        self.properties = properties
+        self._plan = []
+        self._select_options: Dict[str, Set[str]] = {
+            name: {option.get('name') for option in prop.get('select', {}).get('options', [])}
+            for name, prop in properties.items()
+            if prop.get('type') == 'select'
+        }
+        
+        for field, prop_name in RECORD_PROPERTIES.items():
+            prop_type = properties.get(prop_name, {}).get('type')
+            extractor = EXTRACTORS.get(prop_type)
+            if extractor:
+                self._plan.append((field, prop_name, extractor))
+            else:
+                logger.debug(f"⚠️  Proprietà Notion '{prop_name}' assente o di tipo non supportato ({prop_type})")
+        
+        self._plan = tuple(self._plan)
+    
+    @classmethod
+    def from_page(cls, page: Dict) -> 'NotionSchema':
+        """Ricava lo schema dai tipi delle proprietà di una pagina"""
+        return cls(page.get('properties', {}))
+    
+    def select_options(self, prop_name: str) -> Optional[Set[str]]:
+        """Nomi delle opzioni di una proprietà select (None se non è una select)"""
+        return self._select_options.get(prop_name)
+    
+    def to_record(self, page: Dict) -> NotionRecord:
+        """Converte una pagina Notion in un NotionRecord"""
+        properties = page.get('properties', {})
+        record = NotionRecord(page['id'], last_edited=page.get('last_edited_time'))
+        
+        for field, prop_name, extractor in self._plan:
+            prop = properties.get(prop_name)
+            if prop is not None:
+                setattr(record, field, extractor(prop))
+        
+        return record
@@ -0,0 +1,141 @@
+import cProfile
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from loguru import logger
+from typing import Iterator, Optional
+
+class StackSampler:
+    """
+    Campionatore statistico degli stack di tutti i thread del processo
+    
+    Ogni `interval` secondi legge gli stack correnti (sys._current_frames) e conta
+    gli stack "collassati" (frame separati da ';'), il formato letto da flamegraph.pl
+    e speedscope.
+    """
+    
+    def __init__(self, interval: float = None):
+        """
+        Args:
+            interval: Secondi tra due campioni (default: PROFILE_SAMPLE_INTERVAL o 0.005)
+        """
+        self.interval = interval or float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Avvia il campionamento in un thread dedicato"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Ferma il campionamento"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self):
+        """Ciclo di campionamento (eseguito nel thread del campionatore)"""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+    
+    def write_folded(self, path: str):
+        """Scrive gli stack collassati (una riga "stack conteggio" per stack)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class ProfileTrigger:
+    """
+    Profilazione su richiesta del processo di sincronizzazione in esecuzione
+    
+    Il segnale SIGUSR1 o il file `logs/profile.request` fanno girare il prossimo
+    sync_job sotto cProfile e sotto il campionatore di stack: in `logs/` finiscono
+    un file .prof (pstats, snakeviz) e un file .folded (flame graph). Se nessuno
+    la richiede, l'unico costo è un controllo dell'esistenza del file per ciclo.
+    """
+    
+    def __init__(self, directory: str = "logs", flag_file: str = None):
+        """
+        Args:
+            directory: Cartella dei profili generati
+            flag_file: File che richiede la profilazione (default: PROFILE_FLAG_FILE o logs/profile.request)
+        """
+        self.directory = directory
+        self.flag_file = flag_file or os.getenv('PROFILE_FLAG_FILE', os.path.join(directory, 'profile.request'))
+        self._requested = threading.Event()
+    
+    def install(self):
+        """Registra il gestore di SIGUSR1 (solo dove il segnale esiste)"""
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request())
+            logger.debug(f"🔬 Profilazione su richiesta: kill -USR1 {os.getpid()} o crea {self.flag_file}")
+    
+    def request(self):
+        """Richiede la profilazione del prossimo ciclo"""
+        self._requested.set()
+    
+    def consume(self) -> bool:
+        """
+        Verifica (e consuma) una richiesta di profilazione
+        
+        Returns:
+            True se il prossimo ciclo va profilato
+        """
+        requested = self._requested.is_set()
+        if os.path.exists(self.flag_file):
+            requested = True
+            try:
+                os.remove(self.flag_file)
+            except OSError as e:
+                logger.warning(f"⚠️  Impossibile rimuovere {self.flag_file}: {e}")
+        self._requested.clear()
+        return requested
+    
+    @contextmanager
+    def maybe_profile(self, label: str = "sync") -> Iterator[None]:
+        """Esegue il blocco sotto profilazione solo se è stata richiesta"""
+        if not self.consume():
+            yield
+            return
+        
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"profile_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        logger.info(f"🔬 Profilazione del ciclo {label} avviata")
+        sampler = StackSampler()
+        profiler = cProfile.Profile()
+        started = time.monotonic()
+        sampler.start()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            sampler.stop()
+            try:
+                profiler.dump_stats(base + ".prof")
+                sampler.write_folded(base + ".folded")
+                logger.info(
+                    f"🔬 Profilo salvato in {base}.prof e {base}.folded "
+                    f"({time.monotonic() - started:.1f}s, {sum(sampler.stacks.values())} campioni)"
+                )
+            except OSError as e:
+                logger.warning(f"⚠️  Impossibile salvare il profilo: {e}")
@@ -0,0 +1,43 @@
+from typing import Iterable, List, Optional
+
+# Campi sempre necessari al client WooCommerce per costruire SKU e varianti
+WOO_REQUIRED_FIELDS = ("id", "type", "sku", "name")
+WOO_VARIATION_REQUIRED_FIELDS = ("id", "sku", "attributes", "stock_quantity", "manage_stock")
+
+def woo_fields_param(fields: Optional[Iterable[str]], required: Iterable[str] = ()) -> Optional[str]:
+    """
+    Costruisce il parametro `_fields` per una lettura WooCommerce
+
+    Args:
+        fields: Campi richiesti dal chiamante (None = payload completo)
+        required: Campi sempre necessari al client
+
+    Returns:
+        Stringa comma-separated per `_fields` o None se non va proiettato nulla
+    """
+    if not fields:
+        return None
+    return ",".join(dict.fromkeys([*required, *fields]))
+
+def notion_property_ids(schema, names: Optional[Iterable[str]]) -> Optional[List[str]]:
+    """
+    Traduce i nomi delle proprietà Notion negli ID richiesti da `filter_properties`
+
+    Args:
+        schema: NotionSchema del database (None se non ancora caricato)
+        names: Nomi delle proprietà richieste dal chiamante (None = tutte)
+
+    Returns:
+        Lista di ID di proprietà o None se la proiezione non è applicabile
+    """
+    if not names or schema is None:
+        return None
+
+    ids = []
+    for name in names:
+        prop = schema.properties.get(name)
+        if not prop or 'id' not in prop:
+            # Proprietà sconosciuta allo schema: meglio leggere tutto che perdere dati
+            return None
+        ids.append(prop['id'])
+    return ids
@@ -0,0 +1,45 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    Limitatore di frequenza a token bucket, condivisibile tra thread
+    
+    Garantisce in media al massimo `rate` richieste al secondo, con raffiche
+    fino a `burst` richieste consecutive.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Inizializza il limitatore
+        
+        Args:
+            rate: Richieste al secondo consentite (0 o negativo = nessun limite)
+            burst: Numero massimo di richieste consecutive senza attesa
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+    
+    def acquire(self):
+        """Attende finché non è disponibile un token, poi lo consuma"""
+        if self.rate <= 0:
+            return
+        
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                wait_time = (1 - self._tokens) / self.rate
+                self.waited += wait_time
+            
+            time.sleep(wait_time)
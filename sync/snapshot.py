@@ -0,0 +1,372 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+from loguru import logger
+from typing import Dict, Iterator, List, Optional
+from sync.coalescing import SingleFlight
+from sync.notion_client import NotionClient
+from sync.notion_schema import NotionRecord
+from sync.woocommerce_client import WooCommerceClient
+
+INDEX_FILE = "index.json"
+SNAPSHOT_FILES = {"woocommerce": "woocommerce.jsonl.gz", "notion": "notion.jsonl.gz"}
+TAXONOMY_ENDPOINTS = ("products/categories", "products/brands")
+
+def _normalize_sku(sku: str) -> str:
+    """Normalizza lo SKU per l'indice (trim e lowercase, come la sincronizzazione)"""
+    return (sku.strip() if sku else "").lower()
+
+class _BlockWriter:
+    """
+    Scrittura di un file JSONL compresso a blocchi
+    
+    Ogni blocco di righe è un membro gzip indipendente: il file resta un normale
+    .jsonl.gz leggibile per intero, ma un blocco si decomprime da solo partendo
+    dal suo offset, senza leggere quelli precedenti.
+    """
+    
+    def __init__(self, path: str, block_rows: int):
+        self._file = open(path, 'wb')
+        self.block_rows = block_rows
+        self.offsets: List[int] = []
+        self.rows = 0
+        self._lines: List[str] = []
+    
+    def add(self, item: Dict) -> int:
+        """Aggiunge una riga e ritorna il numero del blocco che la conterrà"""
+        block = len(self.offsets)
+        self._lines.append(json.dumps(item, ensure_ascii=False))
+        self.rows += 1
+        if len(self._lines) >= self.block_rows:
+            self._flush()
+        return block
+    
+    def _flush(self):
+        """Comprime le righe in attesa in un nuovo blocco"""
+        if not self._lines:
+            return
+        self.offsets.append(self._file.tell())
+        self._file.write(gzip.compress(("\n".join(self._lines) + "\n").encode('utf-8')))
+        self._lines = []
+    
+    def close(self) -> Dict:
+        """Chiude il file e ritorna la sua voce dell'indice"""
+        self._flush()
+        size = self._file.tell()
+        self._file.close()
+        return {"file": os.path.basename(self._file.name), "rows": self.rows, "blocks": self.offsets, "bytes": size}
+
+def export_snapshot(woo_client, notion_client, directory: str, block_rows: int = None) -> Dict:
+    """
+    Esporta catalogo WooCommerce (con varianti) e database Notion in uno snapshot offline
+    
+    Prodotti e item vengono scritti man mano che si leggono le pagine, senza tenere
+    in memoria l'intero catalogo. L'indice (index.json) viene scritto per ultimo:
+    una cartella senza indice è uno snapshot incompleto.
+    
+    Args:
+        woo_client: Client WooCommerce da esportare
+        notion_client: Client Notion da esportare (None = solo WooCommerce)
+        directory: Cartella dello snapshot (creata se non esiste)
+        block_rows: Righe per blocco compresso (default: SNAPSHOT_BLOCK_ROWS o 500)
+    
+    Returns:
+        Indice dello snapshot
+    """
+    block_rows = block_rows or int(os.getenv('SNAPSHOT_BLOCK_ROWS', 500))
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, INDEX_FILE)):
+        os.remove(os.path.join(directory, INDEX_FILE))
+    started = time.monotonic()
+    index = {
+        "version": 1,
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "store": woo_client.store,
+        "files": {},
+        "skus": {"woocommerce": {}, "notion": {}},
+        "ids": {},
+        "taxonomy": {}
+    }
+    
+    logger.info(f"📦 Esportazione snapshot in {directory}...")
+    writer = _BlockWriter(os.path.join(directory, SNAPSHOT_FILES["woocommerce"]), block_rows)
+    try:
+        for product in woo_client.iter_products(include_variants=True):
+            block = writer.add(product)
+            index["ids"][str(product.get('id'))] = block
+            for item in [product, *product.get('_variants', [])]:
+                index["skus"]["woocommerce"].setdefault(_normalize_sku(item.get('_sku')), block)
+    finally:
+        index["files"]["woocommerce"] = writer.close()
+    
+    for endpoint in TAXONOMY_ENDPOINTS:
+        try:
+            terms = woo_client.iter_pages(endpoint, {"per_page": 100, "_fields": "id,name"})
+            index["taxonomy"][endpoint] = [term for term in terms if isinstance(term, dict) and 'id' in term]
+        except Exception as e:
+            logger.warning(f"⚠️  Tassonomia '{endpoint}' non esportata: {e}")
+    
+    if notion_client is not None:
+        writer = _BlockWriter(os.path.join(directory, SNAPSHOT_FILES["notion"]), block_rows)
+        try:
+            for record in notion_client.iter_records():
+                block = writer.add({slot: getattr(record, slot) for slot in NotionRecord.__slots__})
+                if record.sku:
+                    index["skus"]["notion"].setdefault(_normalize_sku(record.sku), block)
+        finally:
+            index["files"]["notion"] = writer.close()
+    
+    with open(os.path.join(directory, INDEX_FILE + ".tmp"), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(os.path.join(directory, INDEX_FILE + ".tmp"), os.path.join(directory, INDEX_FILE))
+    
+    files = index["files"]
+    logger.info(
+        f"✓ Snapshot esportato in {time.monotonic() - started:.1f}s: {files['woocommerce']['rows']} prodotti WooCommerce, "
+        f"{files['notion']['rows'] if 'notion' in files else 0} item Notion"
+    )
+    return index
+
+class Snapshot:
+    """
+    Snapshot offline letto da disco
+    
+    Le letture complete scorrono i file compressi riga per riga; i lookup per SKU
+    o ID decomprimono solo il blocco indicato dall'indice.
+    """
+    
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Cartella dello snapshot (con index.json)
+        """
+        self.directory = directory
+        index_path = os.path.join(directory, INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"Snapshot incompleto o inesistente: {index_path} mancante")
+        with open(index_path, encoding='utf-8') as f:
+            self.index = json.load(f)
+        self._blocks: Dict = {}
+    
+    def has(self, kind: str) -> bool:
+        """Verifica se lo snapshot contiene un backend ('woocommerce' o 'notion')"""
+        return kind in self.index["files"]
+    
+    def iter_rows(self, kind: str) -> Iterator[Dict]:
+        """Scorre tutte le righe di un backend"""
+        if not self.has(kind):
+            return
+        with gzip.open(os.path.join(self.directory, self.index["files"][kind]["file"]), 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    
+    def _block(self, kind: str, block: int) -> List[Dict]:
+        """Righe di un blocco (gli ultimi blocchi letti restano in memoria)"""
+        key = (kind, block)
+        if key not in self._blocks:
+            entry = self.index["files"][kind]
+            start = entry["blocks"][block]
+            end = entry["blocks"][block + 1] if block + 1 < len(entry["blocks"]) else entry["bytes"]
+            with open(os.path.join(self.directory, entry["file"]), 'rb') as f:
+                f.seek(start)
+                data = gzip.decompress(f.read(end - start))
+            if len(self._blocks) >= 8:
+                self._blocks.pop(next(iter(self._blocks)))
+            self._blocks[key] = [json.loads(line) for line in data.decode('utf-8').splitlines()]
+        return self._blocks[key]
+    
+    def find(self, kind: str, sku: str) -> List[Dict]:
+        """Righe del blocco che contiene uno SKU (lista vuota se lo SKU non c'è)"""
+        block = self.index["skus"].get(kind, {}).get(_normalize_sku(sku))
+        return self._block(kind, block) if block is not None else []
+    
+    def product_by_id(self, product_id) -> Optional[Dict]:
+        """Prodotto WooCommerce per ID (None se assente)"""
+        block = self.index["ids"].get(str(product_id))
+        if block is None:
+            return None
+        return next((dict(product) for product in self._block("woocommerce", block) if product.get('id') == int(product_id)), None)
+
+class OfflineWooClient:
+    """
+    Client WooCommerce in sola lettura su uno snapshot
+    
+    Espone le letture usate da sincronizzazione, analisi AI e script di debug.
+    Le scritture non partono: vengono registrate in `planned`, così una
+    sincronizzazione sullo snapshot produce il piano delle modifiche.
+    """
+    
+    LOOKUP_FIELDS = WooCommerceClient.LOOKUP_FIELDS
+    parse_generated_sku = staticmethod(WooCommerceClient.parse_generated_sku)
+    
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.store = snapshot.index.get("store")
+        self.api_calls = 0
+        self.coalescer = SingleFlight("WooCommerce offline")
+        self.planned: List[Dict] = []
+    
+    def _plan(self, operation: str, sku, data) -> Dict:
+        """Registra una scrittura al posto di eseguirla"""
+        entry = {"backend": "woocommerce", "operation": operation, "sku": sku, "data": data}
+        self.planned.append(entry)
+        return entry
+    
+    def cache_summary(self, since=None):
+        """Nessuna cache HTTP offline"""
+        return None
+    
+    def iter_pages(self, endpoint, params=None):
+        """Termini di tassonomia salvati nello snapshot (gli unici endpoint di lista disponibili)"""
+        yield from self.snapshot.index.get("taxonomy", {}).get(endpoint, [])
+    
+    def iter_products(self, include_variants=True, fields=None, variant_fields=None, params=None):
+        """Scorre i prodotti dello snapshot (payload completo: i campi richiesti sono sempre presenti)"""
+        for product in self.snapshot.iter_rows("woocommerce"):
+            if not include_variants:
+                product['_variants'] = []
+            yield product
+    
+    def get_products(self, include_variants=True, fields=None, variant_fields=None):
+        """Tutti i prodotti dello snapshot"""
+        products = list(self.iter_products(include_variants))
+        logger.info(f"✓ Letti {len(products)} prodotti (con varianti) dallo snapshot")
+        return products
+    
+    def get_product_by_id(self, product_id):
+        """Prodotto per ID (None se assente)"""
+        return self.snapshot.product_by_id(product_id)
+    
+    def get_product_by_sku(self, sku, fields=None):
+        """Prodotto o variante per SKU (None se assente)"""
+        key = _normalize_sku(sku)
+        for product in self.snapshot.find("woocommerce", sku):
+            for item in [product, *product.get('_variants', [])]:
+                if _normalize_sku(item.get('_sku')) == key:
+                    return dict(item)
+        return None
+    
+    def get_products_by_skus(self, skus, fields=None):
+        """Dict SKU normalizzato -> prodotto/variante per gli SKU presenti nello snapshot"""
+        found = {}
+        for sku in skus:
+            product = self.get_product_by_sku(sku) if sku else None
+            if product:
+                found[_normalize_sku(sku)] = product
+        return found
+    
+    def update_product_stock(self, sku, quantity, product=None):
+        """Pianifica l'aggiornamento dello stock di un prodotto o variante"""
+        return self._plan("update_product_stock", sku, {"stock_quantity": quantity})
+    
+    def update_product_data(self, sku, data_dict):
+        """Pianifica l'aggiornamento dei dati di un prodotto o variante"""
+        return self._plan("update_product_data", sku, data_dict)
+    
+    def batch_update_products(self, updates):
+        """Pianifica un aggiornamento batch di prodotti"""
+        return [self._plan("update_product_data", None, update) for update in updates]
+    
+    def batch_update_variations(self, product_id, updates):
+        """Pianifica un aggiornamento batch delle varianti di un prodotto"""
+        return [self._plan("update_product_data", None, dict(update, parent_id=product_id)) for update in updates]
+    
+    def backfill_generated_skus(self, skus):
+        """Pianifica la scrittura degli SKU generati"""
+        for sku in skus:
+            self._plan("update_product_data", sku, {"sku": sku})
+        return list(skus)
+
+class OfflineNotionClient:
+    """
+    Client Notion in sola lettura su uno snapshot
+    
+    Come OfflineWooClient: letture dallo snapshot, scritture registrate in `planned`.
+    Lo schema del database non è salvato, quindi ogni opzione select è accettata
+    e i filtri di query_records non vengono valutati.
+    """
+    
+    normalize_select_name = staticmethod(NotionClient.normalize_select_name)
+    
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.schema = None
+        self.api_calls = 0
+        self.coalescer = SingleFlight("Notion offline")
+        # Lo snapshot contiene tutte le righe: l'indice non va mai confermato su Notion
+        self.last_read_partitioned = False
+        self.planned: List[Dict] = []
+        # page_id -> SKU degli item letti, per rendere leggibile il piano
+        self._page_skus: Dict[str, str] = {}
+    
+    def _plan(self, operation: str, sku, data) -> Dict:
+        """Registra una scrittura al posto di eseguirla"""
+        entry = {"backend": "notion", "operation": operation, "sku": sku, "data": data}
+        self.planned.append(entry)
+        return entry
+    
+    def refresh_schema_if_stale(self):
+        """Nessuno schema offline"""
+        return None
+    
+    def select_value(self, prop_name: str, name: str) -> str:
+        """Valore select normalizzato (senza schema ogni opzione è accettata)"""
+        return self.normalize_select_name(name)
+    
+    def ensure_select_options(self, prop_name: str, names) -> int:
+        """Pianifica la creazione delle opzioni select"""
+        self._plan("ensure_select_options", None, {"property": prop_name, "names": sorted(set(names))})
+        return 0
+    
+    def iter_records(self, properties=None) -> Iterator[NotionRecord]:
+        """Scorre gli item dello snapshot come NotionRecord"""
+        for row in self.snapshot.iter_rows("notion"):
+            self._page_skus[row["page_id"]] = row["sku"]
+            yield NotionRecord(**row)
+    
+    def get_all_records(self, properties=None) -> List[NotionRecord]:
+        """Tutti gli item dello snapshot"""
+        records = list(self.iter_records())
+        logger.info(f"✓ Letti {len(records)} item Notion dallo snapshot")
+        return records
+    
+    def is_empty(self) -> bool:
+        """Verifica se lo snapshot non contiene item Notion"""
+        return not self.snapshot.has("notion") or self.snapshot.index["files"]["notion"]["rows"] == 0
+    
+    def query_records(self, filter: Dict, properties=None) -> List[NotionRecord]:
+        """Query filtrate: non disponibili offline"""
+        logger.debug("ℹ️  Filtri Notion non valutati sullo snapshot: nessun item restituito")
+        return []
+    
+    def get_record_by_sku(self, sku: str, properties=None) -> Optional[NotionRecord]:
+        """Item per SKU (None se assente)"""
+        key = _normalize_sku(sku)
+        row = next((row for row in self.snapshot.find("notion", sku) if _normalize_sku(row.get('sku')) == key), None)
+        if not row:
+            return None
+        self._page_skus[row["page_id"]] = row["sku"]
+        return NotionRecord(**row)
+    
+    def get_records_by_skus(self, skus, properties=None) -> Dict[str, NotionRecord]:
+        """Dict SKU normalizzato -> NotionRecord per gli SKU presenti nello snapshot"""
+        found = {}
+        for sku in skus:
+            record = self.get_record_by_sku(sku) if sku else None
+            if record:
+                found[_normalize_sku(sku)] = record
+        return found
+    
+    def update_item_stock(self, page_id: str, quantity: int, brand: str = "", price: str = "", categories: str = ""):
+        """Pianifica l'aggiornamento di un item"""
+        data = {"page_id": page_id, "stock": quantity, "brand": brand, "price": price, "categories": categories}
+        return self._plan("update_item_stock", self._page_skus.get(page_id), data)
+    
+    def create_item(self, properties: Dict):
+        """Pianifica la creazione di un item (ritorna una pagina fittizia)"""
+        sku = "".join(part.get('plain_text') or part.get('text', {}).get('content', '')
+                      for part in properties.get('SKU', {}).get('rich_text', []))
+        self._plan("create_item", sku, properties)
+        return {"id": f"offline-{len(self.planned)}"}
@@ -0,0 +1,18 @@
+import os
+
+def state_path(filename: str) -> str:
+    """
+    Percorso di un file di stato persistente della sincronizzazione
+    
+    I file vivono in SYNC_STATE_DIR (default: config/state), una cartella
+    montata come volume nel container così da sopravvivere ai riavvii.
+    
+    Args:
+        filename: Nome del file di stato
+    
+    Returns:
+        Percorso completo (la cartella viene creata se non esiste)
+    """
+    state_dir = os.getenv('SYNC_STATE_DIR', os.path.join('config', 'state'))
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
@@ -0,0 +1,262 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+class StockView:
+    """
+    Vista locale dello stock sincronizzato, letta dall'API HTTP locale
+    
+    Dopo ogni ciclo completo contiene una voce per SKU (nome, categorie, brand,
+    prezzo e stock riconciliato); tra un ciclo e l'altro lo stock viene
+    aggiornato dalle riconciliazioni mirate. La vista è salvata su disco, così
+    l'API risponde anche subito dopo un riavvio, prima del primo ciclo.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Percorso del file JSON della vista
+        """
+        self.path = path
+        self._items: Dict[str, Dict] = {}
+        self.updated_at: Optional[float] = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+    
+    def _load(self):
+        """Rilegge la vista salvata (un file illeggibile equivale a una vista vuota)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._items = data.get("items", {})
+            self.updated_at = data.get("updated_at")
+            logger.debug(f"✓ Vista dello stock caricata ({len(self._items)} SKU)")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Vista dello stock non leggibile, verrà ricreata: {e}")
+            self._items = {}
+    
+    def publish(self, rows: Iterable[Dict], bases: Dict[str, int]):
+        """
+        Sostituisce la vista con le righe di un ciclo completo e la salva
+        
+        Args:
+            rows: Righe del catalogo WooCommerce (name, sku, stock, brand, price, categories)
+            bases: SKU normalizzato -> stock riconciliato (prevale sullo stock della riga)
+        """
+        items = {}
+        for row in rows:
+            key = (row["sku"] or "").strip().lower()
+            if not key or key in items:
+                continue
+            items[key] = {
+                "sku": row["sku"],
+                "name": row["name"],
+                "stock": int(bases.get(key, row["stock"] or 0)),
+                "categories": [name.strip() for name in (row["categories"] or "").split(",") if name.strip()],
+                "brand": row["brand"],
+                "price": row["price"]
+            }
+        with self._lock:
+            self._items = items
+            self.updated_at = time.time()
+            self.version += 1
+            self._dirty = True
+        self.save()
+    
+    def set_stock(self, key: str, stock: int):
+        """Aggiorna lo stock di uno SKU già presente nella vista (riconciliazione mirata)"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item["stock"] == int(stock):
+                return
+            self._items[key] = dict(item, stock=int(stock))
+            self.updated_at = time.time()
+            self.version += 1
+            self._dirty = True
+    
+    def get(self, sku: str) -> Optional[Dict]:
+        """Voce di uno SKU (None se assente)"""
+        return self._items.get((sku or "").strip().lower())
+    
+    def by_category(self, category: str) -> List[Dict]:
+        """Voci di una categoria (confronto senza maiuscole), ordinate per SKU"""
+        category = category.strip().lower()
+        items = self._items.values()
+        return sorted(
+            (item for item in items if category in (name.lower() for name in item["categories"])),
+            key=lambda item: item["sku"]
+        )
+    
+    def low_stock(self, threshold: int) -> List[Dict]:
+        """Voci con stock non superiore alla soglia, dalla meno disponibile"""
+        return sorted(
+            (item for item in self._items.values() if item["stock"] <= threshold),
+            key=lambda item: (item["stock"], item["sku"])
+        )
+    
+    def summary(self) -> Dict:
+        """Numero di SKU e istante dell'ultimo aggiornamento"""
+        return {"skus": len(self._items), "updated_at": self.updated_at, "version": self.version}
+    
+    def save(self):
+        """Salva la vista su disco se è cambiata"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                    json.dump({"items": self._items, "updated_at": self.updated_at}, f, ensure_ascii=False)
+                os.replace(self.path + ".tmp", self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"⚠️  Impossibile salvare la vista dello stock: {e}")
+
+class _StockRequestHandler(BaseHTTPRequestHandler):
+    """Richieste GET dell'API locale dello stock (la vista è in `server.view`)"""
+    
+    server_version = "StockSync"
+    
+    def do_GET(self):
+        """Instrada la richiesta verso la vista dello stock"""
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        view: StockView = self.server.view
+        
+        if not self._authorized():
+            return self._send(401, {"error": "Token mancante o non valido"}, headers={"WWW-Authenticate": "Bearer"})
+        if parts == ["health"]:
+            return self._send(200, view.summary())
+        if len(parts) == 2 and parts[0] == "stock":
+            item = view.get(parts[1])
+            if item is None:
+                return self._send(404, {"error": f"SKU {parts[1]} non trovato"})
+            return self._send(200, item)
+        if parts == ["stock"] and query.get("category"):
+            items = view.by_category(query["category"])
+            return self._send(200, {"category": query["category"], "count": len(items), "items": items})
+        if parts == ["low-stock"]:
+            try:
+                threshold = int(query.get("threshold", self.server.low_stock))
+            except ValueError:
+                return self._send(400, {"error": "threshold deve essere un intero"})
+            items = view.low_stock(threshold)
+            return self._send(200, {"threshold": threshold, "count": len(items), "items": items})
+        return self._send(404, {"error": "Risorsa non trovata"})
+    
+    def _authorized(self) -> bool:
+        """True se non è richiesto un token o se la richiesta porta quello giusto"""
+        token = self.server.token
+        if not token:
+            return True
+        header = self.headers.get('Authorization', '')
+        return header.startswith('Bearer ') and hmac.compare_digest(header[len('Bearer '):].strip(), token)
+    
+    def _read_only(self):
+        """Rifiuta ogni metodo diverso da GET"""
+        self._send(405, {"error": "API in sola lettura"}, headers={"Allow": "GET"})
+    
+    do_POST = do_PUT = do_PATCH = do_DELETE = _read_only
+    
+    def _send(self, status: int, payload: Dict, headers: Dict = None):
+        """Risponde in JSON con ETag; 304 se il client ha già la stessa versione"""
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if status == 200 and etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if status == 200:
+            self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        """Registra le richieste nel log loguru (a livello DEBUG) invece che su stderr"""
+        logger.debug(f"🌐 API stock: {self.address_string()} {format % args}")
+
+class StockApiServer:
+    """
+    API HTTP locale in sola lettura sullo stock sincronizzato
+    
+    Gli strumenti interni (postazioni di imballaggio, assistenza clienti) leggono
+    lo stock da qui invece di interrogare Notion e WooCommerce, senza consumare i
+    rate limit della sincronizzazione.
+    
+    Endpoint: GET /stock/<sku>, GET /stock?category=<nome>,
+    GET /low-stock[?threshold=N], GET /health
+    
+    Di default ascolta solo su 127.0.0.1. Su un indirizzo raggiungibile dall'esterno
+    richiede STOCK_API_TOKEN: ogni richiesta deve portare `Authorization: Bearer <token>`.
+    """
+    
+    def __init__(self, view: StockView, host: str = None, port: int = None, low_stock: int = None,
+                 token: str = None):
+        """
+        Args:
+            view: Vista dello stock da servire
+            host: Indirizzo di ascolto (default: STOCK_API_HOST o 127.0.0.1)
+            port: Porta (default: STOCK_API_PORT o 8000)
+            low_stock: Soglia predefinita di /low-stock (default: STOCK_WARNING_THRESHOLD o 10)
+            token: Bearer token richiesto a ogni richiesta (default: STOCK_API_TOKEN, vuoto = nessuno)
+            
+        Raises:
+            ValueError: Se l'indirizzo di ascolto non è locale e manca il token
+        """
+        self.view = view
+        self.host = host or os.getenv('STOCK_API_HOST', '127.0.0.1')
+        self.port = port if port is not None else int(os.getenv('STOCK_API_PORT', 8000))
+        self.low_stock = low_stock if low_stock is not None else int(os.getenv('STOCK_WARNING_THRESHOLD', 10))
+        self.token = token if token is not None else os.getenv('STOCK_API_TOKEN', '')
+        if not self.token and not self._is_loopback(self.host):
+            raise ValueError(f"STOCK_API_TOKEN obbligatorio per ascoltare su {self.host} (indirizzo non locale)")
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    @staticmethod
+    def _is_loopback(host: str) -> bool:
+        """True se l'indirizzo è raggiungibile solo dalla macchina locale"""
+        if host == 'localhost':
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+    
+    def start(self):
+        """Avvia il server in un thread dedicato"""
+        self._server = ThreadingHTTPServer((self.host, self.port), _StockRequestHandler)
+        self._server.daemon_threads = True
+        self._server.view = self.view
+        self._server.low_stock = self.low_stock
+        self._server.token = self.token
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="stock-api", daemon=True).start()
+        logger.info(
+            f"🌐 API stock in ascolto su http://{self.host}:{self.port}" + (" (con token)" if self.token else "")
+        )
+    
+    def stop(self):
+        """Ferma il server"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,9 +1,38 @@
+import os
+import time
+from collections import Counter
 from loguru import logger
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sync.ai_agent import AIAgent
+from sync.archive import SkuArchive
+from sync.circuit_breaker import CircuitOpenError
+from sync.dead_letter import DeadLetterQueue, NOTION_TO_WOO, WOO_TO_NOTION
+from sync.fingerprints import FingerprintStore
+from sync.history import StockHistory
+from sync.logging_setup import row_sampler
+from sync.merge_base import MergeBaseStore
+from sync.notion_schema import NotionRecord
+from sync.tiering import TierScheduler
+from sync.state import state_path
+from sync.stock_api import StockView
+from sync.taxonomy import WooTaxonomyCache
+from sync.woocommerce_client import WooCommerceClient
 
 class StockSynchronizer:
     """Sincronizzatore di stock tra WooCommerce e Notion"""
     
+    # Campi letti dalla sincronizzazione (proiezione delle letture API), più quelli delle
+    # analisi AI che riusano il catalogo del ciclo
+    WOO_FIELDS = tuple(dict.fromkeys((
+        "id", "sku", "name", "type", "status", "stock_quantity", "price", "regular_price",
+        "categories", "brands", "meta_data", "attributes", "date_modified_gmt"
+    ) + AIAgent.WOO_FIELDS))
+    WOO_VARIANT_FIELDS = ("id", "sku", "status", "stock_quantity", "manage_stock", "price", "regular_price", "attributes")
+    WOO_LOOKUP_FIELDS = WooCommerceClient.LOOKUP_FIELDS
+    # Proprietà lette per ogni item: anche quelle dell'impronta del lato Notion
+    NOTION_LOOKUP_PROPERTIES = ("SKU", "Stock", "Name", "Brand", "Price", "Category")
+    NOTION_PROPERTIES = tuple(dict.fromkeys(NOTION_LOOKUP_PROPERTIES + AIAgent.NOTION_PROPERTIES))
+    
     def __init__(self, woo_client, notion_client):
         """
         Inizializza il sincronizzatore
@@ -14,22 +43,405 @@ class StockSynchronizer:
         """
         self.woo = woo_client
         self.notion = notion_client
+        self._notion_index: Optional[Dict[str, NotionRecord]] = None
+        self.taxonomy = WooTaxonomyCache(woo_client)
+        # product_id -> (date_modified, versione tassonomia, brand, categoria)
+        self._attribute_cache: Dict[int, Tuple] = {}
+        # Id dei prodotti del catalogo letto nel ciclo (per potare la cache degli attributi)
+        self._catalog_ids: Set[int] = set()
+        # Righe del catalogo WooCommerce letto a inizio ciclo, per SKU normalizzato
+        self._woo_rows: Optional[Dict[str, Dict]] = None
+        # Sincronizzatori dei negozi che condividono lo stock (MultiStoreSynchronizer li imposta tutti)
+        self.peers: List['StockSynchronizer'] = [self]
+        # Con più negozi ognuno ha i propri file di stato
+        suffix = f"_{woo_client.store}" if woo_client.store else ""
+        self.fingerprints = FingerprintStore(state_path(f"fingerprints{suffix}.json")) \
+            if os.getenv('SYNC_FINGERPRINTS', 'true').lower() == 'true' else None
+        self.dead_letters = DeadLetterQueue(state_path(f"dead_letters{suffix}.json"))
+        # Base comune del merge a tre vie (condivisa tra i negozi) e stock concordato nel ciclo
+        self.merge_base = MergeBaseStore(state_path('merge_base.json'))
+        self._merge_targets: Dict[str, int] = {}
+        # Fasce calda/fredda degli SKU (condivise tra i negozi) e ultimo giro della fascia calda
+        self.tiers = TierScheduler(state_path('tiers.json'))
+        # Storico dello stock riconciliato ciclo per ciclo (condiviso tra i negozi)
+        self.history = StockHistory(state_path('history'))
+        # Stock servito dall'API HTTP locale (condiviso tra i negozi)
+        self.stock_view = StockView(state_path('stock_view.json'))
+        # Database Notion di archivio degli SKU inattivi (condiviso tra i negozi, None se non configurato)
+        self.archive = SkuArchive.from_env(notion_client, state_path('archive.json'))
+        self._last_hot_run = time.time()
+        # Fine dell'ultimo giro della fascia calda: gli SKU riconciliati dopo (dal ciclo completo) vengono saltati
+        self._last_hot_end = time.time()
+        # Esiti per riga del ciclo corrente: riassunti in una riga di log a fine ciclo
+        self.row_stats: Counter = Counter()
+        # Catalogo e item Notion dell'ultimo ciclo completo, riusati dalle analisi AI
+        self.cycle_products: Optional[List[Dict]] = None
+        self.cycle_records: Optional[List[NotionRecord]] = None
     
     def sync(self):
         """Esegue la sincronizzazione completa dello stock"""
         try:
             logger.info("🔄 Inizio sincronizzazione...")
+            row_sampler.begin_cycle()
+            self.notion.coalescer.begin_cycle()
+            self.notion.refresh_schema_if_stale()
+            self.begin_cycle()
+            
+            # Il catalogo WooCommerce viene letto una volta sola: serve anche a confrontare
+            # le impronte nella passata Notion → WooCommerce
+            woo_products = self.load_catalog()
+            rows_by_sku = self.rows_by_sku([self])
+            if self.archive is not None:
+                self.archive.begin_cycle(rows_by_sku)
             
             # Sincronizza da Notion a WooCommerce (priorità alle modifiche manuali su Notion)
-            self._sync_notion_to_woo()
+            self._sync_notion_to_woo(self.notion.get_all_records(self.NOTION_PROPERTIES))
             
             # Sincronizza da WooCommerce a Notion (sincronizza nuovi prodotti e aggiornamenti da WooCommerce)
-            self._sync_woo_to_notion()
+            self._sync_woo_to_notion(woo_products)
             
+            # Sposta nell'archivio gli SKU inattivi (fuori dalle fasce di sincronizzazione)
+            if self.archive is not None:
+                self.row_stats["archived_now"] = self.archive.archive_inactive(rows_by_sku, self._notion_index)
+            self.tiers.prune(self.archive.active(self._woo_rows) if self.archive is not None else self._woo_rows)
+            self.merge_base.prune(rows_by_sku)
+            self.finish_cycle()
+            self.merge_base.log_oscillating()
+            bases = self.merge_base.bases()
+            self.history.record(bases)
+            self.stock_view.publish(self._woo_rows.values(), bases)
+            self.keep_cycle_data(woo_products, [self])
+            self.log_row_stats(self.row_stats)
             logger.info("✓ Sincronizzazione completata")
         except Exception as e:
+            self.abort_cycle()
             logger.error(f"✗ Errore durante la sincronizzazione: {e}", exc_info=True)
             raise
+        finally:
+            self.close_cycle()
+    
+    def keep_cycle_data(self, woo_products: List[Dict], stores: List['StockSynchronizer']):
+        """
+        Conserva catalogo e item Notion del ciclo appena completato per le analisi AI
+        
+        Gli item sono quelli dell'indice del ciclo: stock già riconciliato, item creati o
+        ripristinati inclusi, item archiviati esclusi.
+        
+        Args:
+            woo_products: Prodotti del negozio letti a inizio ciclo (stock aggiornato dalle scritture)
+            stores: Sincronizzatori dei negozi, i cui indici Notion vengono uniti
+        """
+        records: Dict[str, NotionRecord] = {}
+        for store in stores:
+            for key, record in (store._notion_index or {}).items():
+                records.setdefault(key, record)
+        self.cycle_products = woo_products
+        self.cycle_records = list(records.values())
+    
+    def take_cycle_data(self) -> Tuple[Optional[List[Dict]], Optional[List[NotionRecord]]]:
+        """
+        Catalogo e item Notion dell'ultimo ciclo completo, rilasciati dopo la lettura
+        
+        Returns:
+            (prodotti WooCommerce, item Notion), (None, None) se il ciclo non è stato completato
+        """
+        data = (self.cycle_products, self.cycle_records)
+        self.cycle_products = self.cycle_records = None
+        return data
+    
+    def begin_cycle(self):
+        """Azzera lo stato del ciclo lato WooCommerce (indice Notion, contatori, coalescenza)"""
+        self._notion_index = None
+        self._merge_targets = {}
+        self.row_stats = Counter()
+        self.merge_base.begin_cycle()
+        self.woo.coalescer.begin_cycle()
+        self.taxonomy.refresh_if_stale()
+    
+    def load_catalog(self) -> List[Dict]:
+        """
+        Legge il catalogo WooCommerce del ciclo e ne indicizza le righe per SKU
+        
+        Returns:
+            Prodotti WooCommerce (con varianti)
+        """
+        woo_products = self.woo.get_products(
+            include_variants=True,
+            fields=self.WOO_FIELDS,
+            variant_fields=self.WOO_VARIANT_FIELDS
+        )
+        self._woo_rows = {}
+        self._catalog_ids = {product.get('id') for product in woo_products}
+        for row in self._iter_rows(woo_products):
+            self._woo_rows.setdefault(self._normalize_sku(row["sku"]), row)
+        if self.fingerprints is not None:
+            self.fingerprints.begin_cycle()
+        return woo_products
+    
+    @staticmethod
+    def rows_by_sku(stores: List['StockSynchronizer']) -> Dict[str, List[Dict]]:
+        """Righe del catalogo del ciclo per SKU normalizzato, una per ogni negozio che lo ha"""
+        rows: Dict[str, List[Dict]] = {}
+        for store in stores:
+            for key, row in store._woo_rows.items():
+                rows.setdefault(key, []).append(row)
+        return rows
+    
+    def finish_cycle(self):
+        """Salva impronte, basi di merge, fasce e archivio di un ciclo completato"""
+        # Brand e categoria memorizzati solo per i prodotti ancora nel catalogo
+        self._attribute_cache = {
+            product_id: cached for product_id, cached in self._attribute_cache.items()
+            if product_id in self._catalog_ids
+        }
+        self.merge_base.save()
+        self.tiers.save()
+        if self.archive is not None:
+            self.archive.save()
+        self.row_stats["oscillating"] = len(self.merge_base.oscillating)
+        if self.fingerprints is not None:
+            self.fingerprints.save(prune=True)
+            self.row_stats["unchanged"] = len(self.fingerprints.skipped)
+    
+    def abort_cycle(self):
+        """Salva impronte e basi raccolte da un ciclo interrotto (senza potare le impronte non viste)"""
+        self.merge_base.save()
+        self.tiers.save()
+        if self.archive is not None:
+            self.archive.save()
+        if self.fingerprints is not None:
+            self.fingerprints.save()
+    
+    def close_cycle(self):
+        """Rilascia il catalogo del ciclo e salva la coda delle righe fallite"""
+        self._woo_rows = None
+        self.dead_letters.save()
+    
+    @staticmethod
+    def log_row_stats(stats: Counter):
+        """Scrive il riepilogo per riga del ciclo (al posto di un messaggio per ogni riga)"""
+        sampling = row_sampler.begin_cycle()
+        logger.info(
+            f"📊 Righe: {stats['updated']} stock aggiornati, {stats['metadata']} metadata, "
+            f"{stats['created']} creati, {stats['pushed']} inviati a WooCommerce, "
+            f"{stats['in_sync']} già allineati, {stats['unchanged']} invariati, {stats['resting']} freddi rinviati, "
+            f"{stats['not_found']} non trovati, {stats['oscillating']} oscillanti, {stats['errors']} errori"
+            + (f", {stats['archived_now']} archiviati, {stats['restored']} ripristinati, {stats['archived']} esclusi perché in archivio"
+               if stats['archived'] or stats['archived_now'] or stats['restored'] else "")
+            + (f" ({sampling['suppressed']} messaggi per riga campionati)" if sampling['suppressed'] else "")
+        )
+    
+    @staticmethod
+    def _normalize_sku(sku: str) -> str:
+        """Normalizza lo SKU per i confronti (trim e lowercase)"""
+        return (sku.strip() if sku else "").lower()
+    
+    def _index_notion(self, records: List[NotionRecord]):
+        """Indicizza i record Notion per SKU normalizzato, evitando lookup riga per riga"""
+        self._notion_index = {}
+        for record in records:
+            if record.sku:
+                self._notion_index.setdefault(self._normalize_sku(record.sku), record)
+    
+    def _is_resting(self, key: str, notion_stock) -> bool:
+        """
+        True se il ciclo completo può saltare lo SKU: freddo, riconciliato da meno di
+        TIER_COLD_INTERVAL e fermo allo stock riconciliato su Notion e su ogni negozio.
+        Uno SKU esaurito su un qualsiasi lato non viene mai saltato.
+        """
+        if not key or not notion_stock:
+            return False
+        stocks = [notion_stock] + [
+            int(peer._woo_rows[key]["stock"] or 0)
+            for peer in self.peers if peer._woo_rows is not None and key in peer._woo_rows
+        ]
+        return len(stocks) > 1 and 0 not in stocks and self.tiers.is_resting(key, stocks)
+    
+    def _lookup_notion(self, sku: str) -> Optional[NotionRecord]:
+        """
+        Cerca l'item Notion di uno SKU
+        
+        Usa l'indice costruito nel ciclo corrente; senza indice interroga Notion.
+        Se l'indice viene da una lettura partizionata, uno SKU assente viene
+        confermato su Notion prima che il chiamante crei un item duplicato.
+        """
+        if self._notion_index is None:
+            return self.notion.get_record_by_sku(sku, self.NOTION_LOOKUP_PROPERTIES)
+        key = self._normalize_sku(sku)
+        record = self._notion_index.get(key)
+        if record is None and self.notion.last_read_partitioned:
+            record = self.notion.get_record_by_sku(sku, self.NOTION_LOOKUP_PROPERTIES)
+            if record is not None:
+                logger.bind(sku=sku).warning("⚠️  {} assente dalla lettura partizionata di Notion: trovato con un lookup", sku)
+                self._notion_index[key] = record
+        return record
+    
+    def _remember_notion(self, sku: str, page_id: str, stock: int, record: NotionRecord = None):
+        """
+        Aggiorna l'indice Notion dopo una scrittura
+        
+        Args:
+            record: Record già aggiornato con i campi scritti (None = aggiorna solo lo stock)
+        """
+        if self._notion_index is None:
+            return
+        key = self._normalize_sku(sku)
+        if record is not None:
+            self._notion_index[key] = record
+            return
+        record = self._notion_index.get(key)
+        if record is None:
+            self._notion_index[key] = NotionRecord(page_id, sku=sku, stock=stock)
+        else:
+            record.stock = stock
+    
+    def _apply_written(self, record: NotionRecord, stock: int, brand: str, price, categories: str):
+        """
+        Riporta su un record i campi appena scritti su Notion
+        
+        Segue le regole di update_item_stock e _build_notion_properties (brand, prezzo
+        e categoria vuoti o non validi non vengono scritti), così il record coincide
+        con quello che la prossima lettura del database restituirà.
+        """
+        record.stock = stock
+        if brand:
+            record.brand = brand
+        try:
+            if price:
+                record.price = float(str(price))
+        except (ValueError, TypeError):
+            pass
+        category = self.notion.select_value("Category", categories)
+        if category:
+            record.category = category
+    
+    def _woo_fingerprint(self, name: str, sku: str, stock, brand: str, price, categories: str) -> str:
+        """Impronta dei campi WooCommerce che la sincronizzazione scrive su Notion"""
+        return FingerprintStore.fingerprint(name, sku, int(stock or 0), brand, str(price or ''), categories)
+    
+    @staticmethod
+    def _notion_fingerprint(record: NotionRecord) -> str:
+        """Impronta dei campi Notion corrispondenti a quelli dell'impronta WooCommerce"""
+        price = float(record.price) if record.price is not None else None
+        return FingerprintStore.fingerprint(
+            record.name, record.sku, int(record.stock), record.brand, price, record.category
+        )
+    
+    def _is_unchanged(self, key: str, woo_fingerprint: str, record: Optional[NotionRecord]) -> bool:
+        """True se la riga ha le stesse impronte dell'ultima riconciliazione su entrambi i lati"""
+        if self.fingerprints is None or not key or record is None or record.stock is None:
+            return False
+        if self.fingerprints.matches(key, woo_fingerprint, self._notion_fingerprint(record)):
+            self.fingerprints.skipped.add(key)
+            return True
+        return False
+    
+    def _record_fingerprint(self, key: str, woo_fingerprint: str, woo_stock, record: NotionRecord):
+        """
+        Registra le impronte di una riga appena riconciliata
+        
+        Solo una riga con lo stesso stock sui due lati è davvero riconciliata: altrimenti
+        il ciclo successivo deve rielaborarla per intero.
+        
+        Args:
+            record: Record Notion con i campi appena scritti (vedi _apply_written)
+        """
+        if self.fingerprints is None or not key:
+            return
+        if record.stock is not None and int(woo_stock or 0) == int(record.stock):
+            self.fingerprints.record(key, woo_fingerprint, self._notion_fingerprint(record))
+        else:
+            self.fingerprints.forget(key)
+    
+    def _record_base(self, key: str, sku: str, woo_stock, notion_stock):
+        """Registra base di merge e fascia dello SKU se i due lati concordano sullo stock"""
+        if key and notion_stock is not None and int(woo_stock or 0) == int(notion_stock):
+            self.merge_base.record(key, notion_stock)
+            self.tiers.observe(key, sku, notion_stock)
+            self.stock_view.set_stock(key, notion_stock)
+    
+    def _merge_target(self, key: str, notion_stock: int, woo_stock: int) -> int:
+        """
+        Stock concordato di uno SKU tra Notion e WooCommerce
+        
+        Usa il valore già calcolato nel ciclo (es. dal merge su più negozi), altrimenti
+        il merge a tre vie con la base dell'ultima riconciliazione.
+        """
+        if key in self._merge_targets:
+            return self._merge_targets[key]
+        return MergeBaseStore.merge(self.merge_base.base(key), notion_stock, [woo_stock])
+    
+    def _iter_rows(self, woo_products: List[Dict]) -> Iterator[Dict]:
+        """
+        Scorre le righe sincronizzabili del catalogo: prodotti semplici
+        (o variabili senza varianti) e singole varianti
+        
+        Args:
+            woo_products: Prodotti WooCommerce con '_sku' e '_variants'
+        
+        Yields:
+            Dict con name, sku, stock, brand, price, categories e status della riga
+            (più 'variant' e 'source', il prodotto o la variante da cui deriva)
+        """
+        for product in woo_products:
+            product_name = product.get('name', 'N/A')
+            price = product.get('price', product.get('regular_price', ''))
+            brand, categories = self._resolve_attributes(product)
+            variants = product.get('_variants', [])
+            status = product.get('status', 'publish')
+            
+            if not (product.get('type', 'simple') == 'variable' and variants):
+                yield {
+                    "name": product_name,
+                    "sku": product.get('_sku'),
+                    "stock": product.get('stock_quantity') or 0,
+                    "brand": brand,
+                    "price": price,
+                    "categories": categories,
+                    "status": status,
+                    "variant": False,
+                    "source": product
+                }
+            
+            for variant in variants:
+                yield {
+                    "name": variant.get('_product_name', product_name),
+                    "sku": variant.get('_sku'),
+                    "stock": variant.get('stock_quantity') or 0,
+                    "brand": brand,
+                    "price": variant.get('price', variant.get('regular_price', price)),
+                    "categories": categories,
+                    # Una variante è pubblicata solo se lo è anche il prodotto padre
+                    "status": variant.get('status', 'publish') if status == 'publish' else status,
+                    "variant": True,
+                    "source": variant
+                }
+    
+    def _resolve_attributes(self, product: Dict) -> Tuple[str, str]:
+        """
+        Risolve brand e categoria di un prodotto, memorizzando il risultato
+        
+        Finché `date_modified_gmt` del prodotto e la versione della tassonomia
+        non cambiano, l'estrazione non viene ripetuta.
+        
+        Args:
+            product: Dati del prodotto da WooCommerce
+        
+        Returns:
+            Tupla (brand, categoria)
+        """
+        product_id = product.get('id')
+        modified = product.get('date_modified_gmt')
+        cached = self._attribute_cache.get(product_id)
+        
+        if cached and modified and cached[0] == modified and cached[1] == self.taxonomy.version:
+            return cached[2], cached[3]
+        
+        brand = self._extract_brand(product)
+        categories = self._extract_categories(product)
+        if product_id is not None and modified:
+            self._attribute_cache[product_id] = (modified, self.taxonomy.version, brand, categories)
+        return brand, categories
     
     def _extract_categories(self, product: Dict) -> str:
         """
@@ -38,14 +450,14 @@ class StockSynchronizer:
         
         Args:
             product: Dati del prodotto da WooCommerce
-            
+        
         Returns:
             Prima categoria o stringa vuota
         """
         if product.get('categories'):
             categories_list = product.get('categories', [])
             if categories_list and isinstance(categories_list, list):
-                first_category = categories_list[0].get('name', '').strip()
+                first_category = self.taxonomy.category_name(categories_list[0])
                 if first_category:
                     return first_category
         return ""
@@ -56,7 +468,7 @@ class StockSynchronizer:
         
         Args:
             product: Dati del prodotto da WooCommerce
-            
+        
         Returns:
             Brand string
         """
@@ -68,7 +480,7 @@ class StockSynchronizer:
         if product.get('brands'):
             brands_list = product.get('brands', [])
             if brands_list and isinstance(brands_list, list):
-                brand_name = brands_list[0].get('name', '').strip()
+                brand_name = self.taxonomy.brand_name(brands_list[0])
                 if brand_name:
                     return brand_name
         
@@ -93,151 +505,168 @@ class StockSynchronizer:
         # Se non trovo il brand, restituisci stringa vuota
         return brand
     
-    def _sync_woo_to_notion(self):
-        """Sincronizza i prodotti (e varianti) da WooCommerce a Notion"""
+    def _sync_woo_to_notion(self, woo_products: List[Dict] = None, rows: List[Dict] = None):
+        """
+        Sincronizza i prodotti (e varianti) da WooCommerce a Notion
+        
+        Args:
+            woo_products: Catalogo già letto nel ciclo (None = lo legge da WooCommerce)
+            rows: Righe già risolte da sincronizzare al posto del catalogo (più negozi)
+        """
         try:
             logger.debug("📤 Sincronizzazione WooCommerce → Notion...")
             
-            woo_products = self.woo.get_products(include_variants=True)
+            if rows is None:
+                if woo_products is None:
+                    woo_products = self.woo.get_products(
+                        include_variants=True,
+                        fields=self.WOO_FIELDS,
+                        variant_fields=self.WOO_VARIANT_FIELDS
+                    )
+                # Se è un prodotto variabile CON varianti, _iter_rows restituisce SOLO le varianti, NON il padre
+                rows = list(self._iter_rows(woo_products))
+            
+            # Crea in un'unica modifica dello schema le categorie Notion mancanti
+            self.notion.ensure_select_options("Category", {row["categories"] for row in rows})
+            
             synced_count = 0
             synced_skus = set()  # Traccia gli SKU già sincronizzati per evitare duplicati
             
-            for product in woo_products:
+            for row in rows:
+                sku = row["sku"]
+                sku_normalized = self._normalize_sku(sku)
+                
+                # Controlla se lo SKU è già stato sincronizzato in questa sessione
+                if sku_normalized and sku_normalized in synced_skus:
+                    logger.bind(sku=sku).warning("⊘ Duplicato rilevato: {} ({}) - SKU già sincronizzato", row['name'], sku)
+                    continue
+                
+                # Le righe fallite di recente vengono ritentate dalla coda, non dal ciclo completo
+                if self.dead_letters.is_waiting(WOO_TO_NOTION, sku):
+                    continue
+                
+                # SKU freddi riconciliati di recente: tornano al ciclo dopo TIER_COLD_INTERVAL
+                notion_record = self._notion_index.get(sku_normalized) if self._notion_index is not None else None
+                if notion_record is not None and self._is_resting(sku_normalized, notion_record.stock):
+                    self.row_stats["resting"] += 1
+                    continue
+                
+                # Gli SKU archiviati restano fuori dal ciclo finché un negozio non li ripubblica o riassortisce
+                archived = self.archive is not None and self.archive.is_archived(sku_normalized)
+                if archived and sku_normalized not in self.archive.returning:
+                    self.row_stats["archived"] += 1
+                    continue
+                
                 try:
-                    product_id = product.get('id')
-                    product_name = product.get('name', 'N/A')
-                    product_type = product.get('type', 'simple')
-                    sku = product.get('_sku')
-                    
-                    # Normalizza lo SKU (trim e lowercase per confronti)
-                    sku_normalized = (sku.strip() if sku else "").lower()
-                    
-                    # Controlla se lo SKU è già stato sincronizzato in questa sessione
-                    if sku_normalized and sku_normalized in synced_skus:
-                        logger.warning(f"⊘ Duplicato rilevato: {product_name} ({sku}) - SKU già sincronizzato")
-                        continue
-                    
-                    stock = product.get('stock_quantity') or 0
-                    price = product.get('price', product.get('regular_price', ''))
-                    brand = self._extract_brand(product)
-                    categories = self._extract_categories(product)
-                    variants = product.get('_variants', [])
-                    
-                    # Se è un prodotto variabile CON varianti, sincronizza SOLO le varianti, NON il padre
-                    if product_type == 'variable' and variants:
-                        logger.debug(f"⊘ Prodotto variabile {product_name} - sincronizzerò solo le {len(variants)} varianti")
-                    else:
-                        # Sincronizza il prodotto principale (semplice o variabile senza varianti)
-                        notion_item = self.notion.get_item_by_sku(sku)
-                        
-                        if notion_item:
-                            # Se il prodotto esiste in Notion, applica logica del minore
-                            page_id = notion_item['id']
-                            existing_stock = self.notion.extract_property(notion_item, 'Stock')
-                            
-                            # Usa il minore tra stock Notion e WooCommerce (previene aumento accidentale)
-                            update_stock = min(existing_stock if existing_stock is not None else stock, stock or 0)
-                            
-                            # Aggiorna Notion se lo stock calcolato è diverso da quello esistente
-                            if update_stock != existing_stock:
-                                self.notion.update_item_stock(page_id, update_stock, brand, price, categories)
-                                logger.info(f"✓ Aggiornato (stock minore): {product_name} ({sku}) Stock: {update_stock} (Notion: {existing_stock}, WooCommerce: {stock}), Brand: {brand}")
-                            else:
-                                # Se lo stock è uguale, aggiorna solo i campi metadata
-                                self.notion.update_item_stock(page_id, update_stock, brand, price, categories)
-                                logger.debug(f"✓ Aggiornato (metadata): {product_name} ({sku}), Brand: {brand}, Prezzo: {price}")
-                            
-                            # Traccia lo SKU come già sincronizzato
-                            if sku_normalized:
-                                synced_skus.add(sku_normalized)
-                        else:
-                            # Crea item in Notion
-                            logger.info(f"📝 Creazione item Notion: {product_name} ({sku})")
-                            properties = self._build_notion_properties(product_name, sku, stock, brand, price, categories)
-                            self.notion.create_item(properties)
-                            logger.info(f"✓ Creato: {product_name} ({sku})")
-                            synced_count += 1
-                            
-                            # Traccia lo SKU come sincronizzato
-                            if sku_normalized:
-                                synced_skus.add(sku_normalized)
-                            
-                            # Se lo SKU era generato, aggiorna anche WooCommerce
-                            if sku.startswith('ADIVO-'):
-                                try:
-                                    self.woo.update_product_data(sku, {"sku": sku})
-                                    logger.debug(f"✓ SKU aggiornato su WooCommerce: {sku}")
-                                except Exception as e:
-                                    logger.warning(f"⚠️  Non posso aggiornare SKU su WooCommerce: {e}")
+                    if archived:
+                        self._restore_row(row)
+                    if self._sync_row_to_notion(row):
+                        synced_count += 1
+                    self.dead_letters.resolve(WOO_TO_NOTION, sku)
                     
-                    # Sincronizza varianti se presenti
-                    for variant in variants:
-                        try:
-                            variant_sku = variant.get('_sku')
-                            variant_stock = variant.get('stock_quantity') or 0
-                            variant_name = variant.get('_product_name', product_name)
-                            variant_price = variant.get('price', variant.get('regular_price', price))
-                            
-                            # Normalizza lo SKU della variante
-                            variant_sku_normalized = (variant_sku.strip() if variant_sku else "").lower()
-                            
-                            # Controlla se lo SKU della variante è già stato sincronizzato
-                            if variant_sku_normalized and variant_sku_normalized in synced_skus:
-                                logger.warning(f"⊘ Duplicato variante rilevato: {variant_name} ({variant_sku}) - SKU già sincronizzato")
-                                continue
-                            
-                            variant_item = self.notion.get_item_by_sku(variant_sku)
-                            
-                            if variant_item:
-                                page_id = variant_item['id']
-                                existing_variant_stock = self.notion.extract_property(variant_item, 'Stock')
-                                
-                                # Usa il minore tra stock Notion e WooCommerce (previene aumento accidentale)
-                                update_variant_stock = min(existing_variant_stock if existing_variant_stock is not None else variant_stock, variant_stock or 0)
-                                
-                                # Aggiorna Notion se lo stock calcolato è diverso da quello esistente
-                                if update_variant_stock != existing_variant_stock:
-                                    self.notion.update_item_stock(page_id, update_variant_stock, brand, variant_price, categories)
-                                    logger.info(f"✓ Aggiornato variante (stock minore): {variant_name} ({variant_sku}) Stock: {update_variant_stock} (Notion: {existing_variant_stock}, WooCommerce: {variant_stock})")
-                                else:
-                                    # Se lo stock è uguale, aggiorna solo i campi metadata
-                                    self.notion.update_item_stock(page_id, update_variant_stock, brand, variant_price, categories)
-                                    logger.debug(f"✓ Aggiornato variante (metadata): {variant_name} ({variant_sku})")
-                                
-                                # Traccia lo SKU della variante come già sincronizzato
-                                if variant_sku_normalized:
-                                    synced_skus.add(variant_sku_normalized)
-                            else:
-                                logger.info(f"📝 Creazione variante Notion: {variant_name} ({variant_sku})")
-                                properties = self._build_notion_properties(variant_name, variant_sku, variant_stock, brand, variant_price, categories)
-                                self.notion.create_item(properties)
-                                logger.info(f"✓ Creata variante: {variant_name}")
-                                synced_count += 1
-                                
-                                # Traccia lo SKU della variante come sincronizzato
-                                if variant_sku_normalized:
-                                    synced_skus.add(variant_sku_normalized)
-                                
-                                # Se lo SKU era generato, aggiorna anche WooCommerce
-                                if variant_sku.startswith('ADIVO-'):
-                                    try:
-                                        self.woo.update_product_data(variant_sku, {"sku": variant_sku})
-                                        logger.debug(f"✓ SKU variante aggiornato su WooCommerce: {variant_sku}")
-                                    except Exception as e:
-                                        logger.warning(f"⚠️  Non posso aggiornare SKU variante su WooCommerce: {e}")
-                        except Exception as e:
-                            logger.error(f"✗ Errore sincronizzazione variante {variant_sku}: {e}")
-                            continue
-                
+                    # Traccia lo SKU come già sincronizzato
+                    if sku_normalized:
+                        synced_skus.add(sku_normalized)
+                except CircuitOpenError:
+                    # Backend non disponibile: il resto del ciclo fallirebbe comunque
+                    raise
                 except Exception as e:
-                    logger.error(f"✗ Errore sincronizzazione prodotto {product_id}: {e}")
-                    continue
+                    self.row_stats["errors"] += 1
+                    logger.bind(sku=sku).error(
+                        "✗ Errore sincronizzazione {} {}: {}", 'variante' if row['variant'] else 'prodotto', sku, e
+                    )
+                    self.dead_letters.record_failure(WOO_TO_NOTION, sku, e, self._row_payload(row))
             
             logger.info(f"✓ Sincronizzazione WooCommerce → Notion completata ({synced_count} creazioni)")
         except Exception as e:
             logger.error(f"✗ Errore nella sincronizzazione WooCommerce → Notion: {e}")
             raise
     
+    def _sync_row_to_notion(self, row: Dict) -> bool:
+        """
+        Sincronizza una riga WooCommerce (prodotto o variante) su Notion
+        
+        Args:
+            row: Riga prodotta da _iter_rows
+        
+        Returns:
+            True se è stato creato un nuovo item Notion
+        """
+        name, sku, stock = row["name"], row["sku"], row["stock"]
+        brand, price, categories = row["brand"], row["price"], row["categories"]
+        kind = "variante" if row.get("variant") else "item"
+        sku_normalized = self._normalize_sku(sku)
+        log = logger.bind(sku=sku)
+        
+        notion_record = self._lookup_notion(sku)
+        woo_fingerprint = self._woo_fingerprint(name, sku, stock, brand, price, categories)
+        
+        if notion_record and self._is_unchanged(sku_normalized, woo_fingerprint, notion_record):
+            # Nessun cambiamento su entrambi i lati dall'ultima riconciliazione
+            log.debug("⏭️  Invariato: {} ({})", name, sku)
+            return False
+        
+        if notion_record:
+            # Se il prodotto esiste in Notion, applica logica del minore
+            page_id = notion_record.page_id
+            existing_stock = notion_record.stock
+            
+            # Stock concordato dal merge a tre vie nella passata Notion → WooCommerce;
+            # senza merge usa il minore tra Notion e WooCommerce (previene aumento accidentale)
+            update_stock = self._merge_targets.pop(sku_normalized, None)
+            if update_stock is None:
+                update_stock = min(existing_stock if existing_stock is not None else stock, stock or 0)
+            
+            # Aggiorna Notion: stock (se cambiato) e campi metadata
+            self.notion.update_item_stock(page_id, update_stock, brand, price, categories)
+            if update_stock != existing_stock:
+                self.row_stats["updated"] += 1
+                log.info(
+                    "✓ Aggiornato {} (stock minore): {} ({}) Stock: {} (Notion: {}, WooCommerce: {}), Brand: {}",
+                    kind, name, sku, update_stock, existing_stock, stock, brand
+                )
+            else:
+                self.row_stats["metadata"] += 1
+                log.debug("✓ Aggiornato {} (metadata): {} ({}), Brand: {}, Prezzo: {}", kind, name, sku, brand, price)
+            self._apply_written(notion_record, update_stock, brand, price, categories)
+            self._remember_notion(sku, page_id, update_stock, notion_record)
+            self._record_fingerprint(sku_normalized, woo_fingerprint, stock, notion_record)
+            self._record_base(sku_normalized, sku, stock, update_stock)
+            return False
+        
+        # Crea item in Notion
+        log.debug("📝 Creazione {} Notion: {} ({})", kind, name, sku)
+        properties = self._build_notion_properties(name, sku, stock, brand, price, categories)
+        page = self.notion.create_item(properties)
+        record = NotionRecord(page['id'], sku=sku, name=name)
+        self._apply_written(record, stock, brand, price, categories)
+        self._remember_notion(sku, page['id'], stock, record)
+        self._record_fingerprint(sku_normalized, woo_fingerprint, stock, record)
+        self._record_base(sku_normalized, sku, stock, stock)
+        self.row_stats["created"] += 1
+        log.info("✓ Creato {}: {} ({})", kind, name, sku)
+        
+        # Se lo SKU era generato, aggiorna anche WooCommerce
+        if sku.startswith('ADIVO-'):
+            try:
+                self.woo.update_product_data(sku, {"sku": sku})
+                log.debug("✓ SKU aggiornato su WooCommerce: {}", sku)
+            except Exception as e:
+                log.warning("⚠️  Non posso aggiornare SKU su WooCommerce: {}", e)
+        return True
+    
+    def _restore_row(self, row: Dict):
+        """Riporta dall'archivio la pagina Notion di una riga tornata attiva"""
+        page = self.archive.restore(self._normalize_sku(row["sku"]), row["stock"] or 0)
+        if page is not None:
+            self._remember_notion(row["sku"], page['id'], int(row["stock"] or 0))
+            self.row_stats["restored"] += 1
+    
+    @staticmethod
+    def _row_payload(row: Dict) -> Dict:
+        """Campi di una riga da conservare nella coda per ritentarla"""
+        return {key: row[key] for key in ("name", "sku", "stock", "brand", "price", "categories", "variant")}
+    
     def _build_notion_properties(self, name: str, sku: str, stock: int, brand: str = "", price: str = "", categories: str = "") -> Dict:
         """
         Costruisce le proprietà per un item Notion
@@ -249,7 +678,7 @@ class StockSynchronizer:
             brand: Brand/Marca del prodotto
             price: Prezzo del prodotto (come stringa o numero)
             categories: Categorie del prodotto (come stringa comma-separated)
-            
+        
         Returns:
             Dict con proprietà formattate per Notion
         """
@@ -281,7 +710,8 @@ class StockSynchronizer:
             except (ValueError, TypeError):
                 logger.warning(f"⚠️  Prezzo non valido: {price}")
         
-        # Aggiungi Category se presente (come Select)
+        # Aggiungi Category se presente (come Select), solo se l'opzione esiste
+        categories = self.notion.select_value("Category", categories)
         if categories:
             properties["Category"] = {
                 "select": {
@@ -291,52 +721,358 @@ class StockSynchronizer:
         
         return properties
     
-    def _sync_notion_to_woo(self):
-        """Sincronizza i prodotti da Notion a WooCommerce"""
+    def _sync_notion_to_woo(self, notion_records: List[NotionRecord] = None):
+        """
+        Sincronizza i prodotti da Notion a WooCommerce
+        
+        Args:
+            notion_records: Item Notion già letti nel ciclo (None = li legge da Notion)
+        """
         try:
             logger.debug("📥 Sincronizzazione Notion → WooCommerce...")
             
-            notion_items = self.notion.get_all_items()
+            if notion_records is None:
+                notion_records = self.notion.get_all_records(self.NOTION_PROPERTIES)
+            # L'indice evita una query Notion per ogni riga nella passata WooCommerce → Notion
+            self._index_notion(notion_records)
             synced_count = 0
             
-            for item in notion_items:
+            # Corsia prioritaria: gli SKU esauriti su Notion vengono scritti per primi,
+            # così i negozi smettono prima di venderli
+            for record in sorted(notion_records, key=lambda record: record.stock != 0):
+                sku = record.sku
+                if not sku or record.stock is None:
+                    logger.debug(f"⚠️  Item Notion senza SKU o Stock - Skipped")
+                    continue
+                
+                # Le righe fallite di recente vengono ritentate dalla coda, non dal ciclo completo
+                if self.dead_letters.is_waiting(NOTION_TO_WOO, sku):
+                    continue
+                
+                # SKU freddi riconciliati di recente: tornano al ciclo dopo TIER_COLD_INTERVAL
+                if self._is_resting(self._normalize_sku(sku), record.stock):
+                    continue
+                
                 try:
-                    # Estrae le proprietà
-                    sku = self.notion.extract_property(item, 'SKU')
-                    notion_stock = self.notion.extract_property(item, 'Stock')
-                    name = self.notion.extract_property(item, 'Name')
-                    
-                    if not sku or notion_stock is None:
-                        logger.debug(f"⚠️  Item Notion senza SKU o Stock - Skipped")
-                        continue
-                    
-                    # Cerca il prodotto WooCommerce tramite SKU (supporta prodotti e varianti)
-                    woo_product = self.woo.get_product_by_sku(sku)
-                    
-                    if woo_product:
-                        # Sincronizza il valore di Notion a WooCommerce SENZA minore
-                        # L'utente ha modificato Notion di proposito, va rispettato
-                        woo_stock = woo_product.get('stock_quantity', 0) or 0
-                        
-                        # Aggiorna WooCommerce sempre con il valore di Notion
-                        if notion_stock != woo_stock:
-                            self.woo.update_product_stock(sku, int(notion_stock))
-                            logger.info(f"✓ Sincronizzato Notion → WooCommerce: {name} ({sku}) Stock: {notion_stock} (da Notion: {notion_stock}, era WooCommerce: {woo_stock})")
-                        else:
-                            logger.debug(f"✓ Stock già sincronizzato: {name} ({sku}) = {notion_stock}")
+                    if self._sync_record_to_woo(record):
                         synced_count += 1
-                    else:
-                        logger.debug(f"ℹ️  Prodotto WooCommerce non trovato per SKU: {sku}")
-                
+                    self.dead_letters.resolve(NOTION_TO_WOO, sku)
+                except CircuitOpenError:
+                    # Backend non disponibile: il resto del ciclo fallirebbe comunque
+                    raise
                 except Exception as e:
-                    logger.error(f"✗ Errore nel sincronizzare item Notion ({sku}): {e}")
-                    continue
+                    self.row_stats["errors"] += 1
+                    logger.bind(sku=sku).error("✗ Errore nel sincronizzare item Notion ({}): {}", sku, e)
+                    self.dead_letters.record_failure(NOTION_TO_WOO, sku, e)
             
             logger.info(f"✓ Sincronizzazione Notion → WooCommerce completata ({synced_count} aggiornamenti)")
         except Exception as e:
             logger.error(f"✗ Errore nella sincronizzazione Notion → WooCommerce: {e}")
             raise
     
+    def _sync_record_to_woo(self, record: NotionRecord, woo_product: Dict = None) -> bool:
+        """
+        Sincronizza lo stock di un item Notion su WooCommerce
+        
+        Args:
+            record: Item Notion con SKU e Stock
+            woo_product: Prodotto WooCommerce già letto (None = lookup per SKU)
+        
+        Returns:
+            True se il prodotto WooCommerce è stato trovato e sincronizzato
+        """
+        sku = record.sku
+        notion_stock = record.stock
+        name = record.name
+        log = logger.bind(sku=sku)
+        
+        # Riga invariata su entrambi i lati (e nessun merge da applicare): niente lookup WooCommerce
+        key = self._normalize_sku(sku)
+        row = self._woo_rows.get(key) if self._woo_rows is not None else None
+        planned = self._merge_targets.get(key)
+        if row and planned in (None, row["stock"]) and self._is_unchanged(key, self._woo_fingerprint(
+            row["name"], row["sku"], row["stock"], row["brand"], row["price"], row["categories"]
+        ), record):
+            return False
+        
+        # Cerca il prodotto WooCommerce tramite SKU (supporta prodotti e varianti)
+        if woo_product is None:
+            woo_product = self.woo.get_product_by_sku(sku, fields=self.WOO_LOOKUP_FIELDS)
+        
+        if not woo_product:
+            self.row_stats["not_found"] += 1
+            log.debug("ℹ️  Prodotto WooCommerce non trovato per SKU: {}", sku)
+            return False
+        
+        # Merge a tre vie: le variazioni di Notion e di WooCommerce rispetto all'ultima
+        # riconciliazione si sommano; senza base prevale Notion (modifica voluta dall'utente)
+        woo_stock = woo_product.get('stock_quantity', 0) or 0
+        target = self._merge_target(key, notion_stock, woo_stock)
+        
+        if target != woo_stock:
+            self.woo.update_product_stock(sku, target, product=woo_product)
+            if row:
+                # Il catalogo letto a inizio ciclo riflette la scrittura appena fatta
+                row["source"]["stock_quantity"] = row["stock"] = target
+            self.row_stats["pushed"] += 1
+            log.info(
+                "✓ Sincronizzato Notion → WooCommerce: {} ({}) Stock: {} (Notion: {}, era WooCommerce: {})",
+                name, sku, target, notion_stock, woo_stock
+            )
+        else:
+            self.row_stats["in_sync"] += 1
+            log.debug("✓ Stock già sincronizzato: {} ({}) = {}", name, sku, woo_stock)
+        # Notion verrà allineato (una sola scrittura) nella passata WooCommerce → Notion
+        self._merge_targets[key] = target
+        self._record_base(key, sku, target, notion_stock)
+        return True
+    
+    def sync_skus(self, skus: Iterable[str], records: Dict[str, NotionRecord] = None,
+                  stores: List['StockSynchronizer'] = None) -> Dict:
+        """
+        Riconcilia solo gli SKU indicati, con lookup mirati invece dei cataloghi completi
+        
+        Gli SKU vengono risolti in blocco (una query Notion filtrata e `products?sku=`
+        per negozio, a gruppi di 100); per ognuno si applica il merge a tre vie tra
+        Notion e i negozi: al massimo una scrittura per negozio e una su Notion. Gli
+        SKU assenti da Notion restano al ciclo completo, che sa crearli.
+        
+        Args:
+            skus: SKU da riconciliare (nell'ordine di priorità)
+            records: Item Notion già letti, per SKU normalizzato (evitano il lookup)
+            stores: Sincronizzatori dei negozi coinvolti (default: solo questo)
+        
+        Returns:
+            Dict con synced, not_found (più missing, gli SKU non trovati) ed errors
+        """
+        stores = stores or [self]
+        skus = list(dict.fromkeys(sku.strip() for sku in skus if sku and sku.strip()))
+        stats = Counter()
+        missing = []
+        self._notion_index = None
+        self.notion.coalescer.begin_cycle()
+        for store in stores:
+            store._merge_targets = {}
+            store._woo_rows = None
+            store.woo.coalescer.begin_cycle()
+        
+        # Risoluzione in blocco: niente lookup per singolo SKU
+        records = dict(records or {})
+        records.update(self.notion.get_records_by_skus(
+            [sku for sku in skus if self._normalize_sku(sku) not in records], self.NOTION_PROPERTIES
+        ))
+        failed: Dict[str, Exception] = {}
+        products_by_store = [
+            (store, store.woo.get_products_by_skus(skus, fields=self.WOO_LOOKUP_FIELDS, failed=failed))
+            for store in stores
+        ]
+        
+        for sku in skus:
+            key = self._normalize_sku(sku)
+            try:
+                if key in failed:
+                    # Lookup fallito su un negozio: un merge senza quel negozio non sarebbe corretto
+                    raise failed[key]
+                record = records.get(key)
+                present = [(store, products[key]) for store, products in products_by_store if key in products]
+                if record is None or record.stock is None or not present:
+                    stats["not_found"] += 1
+                    missing.append(sku)
+                    continue
+                
+                target = MergeBaseStore.merge(
+                    self.merge_base.base(key), record.stock,
+                    [product.get('stock_quantity') or 0 for _, product in present]
+                )
+                for store, product in present:
+                    store._merge_targets[key] = target
+                    store._sync_record_to_woo(record, woo_product=product)
+                    store._merge_targets.pop(key, None)
+                
+                if target != record.stock:
+                    self.notion.update_item_stock(record.page_id, target)
+                    logger.bind(sku=sku).info("✓ Stock Notion allineato: {} ({} → {})", sku, record.stock, target)
+                self._record_base(key, sku, target, target)
+                stats["synced"] += 1
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                stats["errors"] += 1
+                logger.bind(sku=sku).error("✗ Errore nella sincronizzazione mirata di {}: {}", sku, e)
+                self.dead_letters.record_failure(NOTION_TO_WOO, sku, e)
+        
+        self.merge_base.save()
+        self.tiers.save()
+        self.stock_view.save()
+        for store in stores:
+            store.dead_letters.save()
+        if missing:
+            logger.warning(f"⚠️  SKU non trovati su Notion o WooCommerce: {', '.join(missing[:20])}")
+        return dict(stats, missing=missing)
+    
+    def _zero_stock_edits(self, since: float) -> List[NotionRecord]:
+        """Item Notion portati a stock zero dopo `since` (timestamp Unix)"""
+        # last_edited_time di Notion ha la precisione del minuto
+        edited_after = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(since - 60))
+        return self.notion.query_records({
+            "and": [
+                {"property": "Stock", "number": {"equals": 0}},
+                {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": edited_after}}
+            ]
+        }, self.NOTION_PROPERTIES)
+    
+    def _sold_out_on_stores(self, since: float, stores: List['StockSynchronizer']) -> List[str]:
+        """
+        SKU esauriti su un negozio dopo `since` (timestamp Unix)
+        
+        WooCommerce non ha un elenco globale delle varianti: una variante esaurita
+        arriva al ciclo completo, che non rinvia mai gli SKU a stock zero.
+        """
+        modified_after = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(since - 60))
+        skus = []
+        for store in stores:
+            for product in store.woo.iter_products(
+                include_variants=False,
+                fields=self.WOO_LOOKUP_FIELDS,
+                params={"stock_status": "outofstock", "modified_after": modified_after, "dates_are_gmt": "true"}
+            ):
+                if product.get('type') != 'variable' and product.get('sku'):
+                    skus.append(product['sku'])
+        return skus
+    
+    def sync_hot(self, stores: List['StockSynchronizer'] = None) -> Dict:
+        """
+        Giro della fascia calda, tra un ciclo completo e l'altro
+        
+        Prima la corsia prioritaria (SKU portati a zero su Notion o esauriti su un
+        negozio dall'ultimo giro), poi gli SKU caldi: cambiati spesso di recente o
+        vicini all'esaurimento.
+        
+        Args:
+            stores: Sincronizzatori dei negozi coinvolti (default: solo questo)
+        
+        Returns:
+            Dict con zero (SKU della corsia prioritaria), hot e gli esiti di sync_skus
+        """
+        stores = stores or [self]
+        started = time.time()
+        zero = [record for record in self._zero_stock_edits(self._last_hot_run) if record.sku]
+        sold_out = self._sold_out_on_stores(self._last_hot_run, stores)
+        # Gli SKU appena riconciliati dal ciclo completo non vengono ripresi
+        hot = self.tiers.hot_skus(skip_since=self._last_hot_end)
+        self._last_hot_run = started
+        if not zero and not sold_out and not hot:
+            self._last_hot_end = time.time()
+            return {"zero": 0, "hot": 0}
+        
+        logger.info(
+            f"🔥 Fascia calda: {len(zero)} SKU esauriti su Notion, {len(sold_out)} esauriti sui negozi, "
+            f"{len(hot)} SKU caldi"
+        )
+        stats = self.sync_skus(
+            [record.sku for record in zero] + sold_out + hot,
+            records={self._normalize_sku(record.sku): record for record in zero},
+            stores=stores
+        )
+        stats.update(zero=len(zero) + len(sold_out), hot=len(hot))
+        self._last_hot_end = time.time()
+        logger.info(
+            f"🔥 Fascia calda completata in {time.time() - started:.1f}s: {stats.get('synced', 0)} riconciliati, "
+            f"{stats.get('not_found', 0)} non trovati, {stats.get('errors', 0)} errori"
+        )
+        return stats
+    
+    def retry_dead_letters(self) -> Dict:
+        """
+        Ritenta le righe in coda il cui backoff è scaduto
+        
+        Viene eseguito tra un ciclo e l'altro: ogni riga è riletta singolarmente
+        dal lato sorgente, senza rifare la sincronizzazione completa.
+        
+        Returns:
+            Dict con retried, resolved e dropped (righe scartate perché non c'è più
+            niente da sincronizzare: item Notion o prodotto WooCommerce spariti)
+        """
+        due = self.dead_letters.due()
+        stats = {"retried": len(due), "resolved": 0, "dropped": 0}
+        if not due:
+            return stats
+        
+        logger.info(f"📮 Nuovo tentativo per {len(due)} righe in coda...")
+        # Fuori dal ciclo l'indice Notion non è aggiornato: i lookup vanno fatti su Notion
+        self._notion_index = None
+        self._merge_targets = {}
+        self.woo.coalescer.begin_cycle()
+        self.notion.coalescer.begin_cycle()
+        
+        # Prodotti WooCommerce delle righe in coda risolti in blocco, non uno per riga;
+        # le righe dei gruppi non letti restano in coda, non sono "non trovate"
+        failed: Dict[str, Exception] = {}
+        try:
+            woo_products = self.woo.get_products_by_skus(
+                [entry["sku"] for entry in due], fields=self.WOO_LOOKUP_FIELDS, failed=failed
+            )
+        except CircuitOpenError as e:
+            logger.warning(f"⚠️  Nuovi tentativi sospesi: {e}")
+            return stats
+        
+        for entry in due:
+            operation, sku = entry["operation"], entry["sku"]
+            woo_product = woo_products.get(self._normalize_sku(sku))
+            # Motivo per cui la riga non ha più niente da sincronizzare (None = sincronizzata)
+            dropped = None
+            try:
+                if self._normalize_sku(sku) in failed:
+                    raise failed[self._normalize_sku(sku)]
+                if not woo_product:
+                    dropped = "prodotto WooCommerce non trovato"
+                elif operation == NOTION_TO_WOO:
+                    record = self.notion.get_record_by_sku(sku, self.NOTION_PROPERTIES)
+                    if record is None:
+                        dropped = "item Notion non trovato"
+                    elif record.stock is None:
+                        dropped = "stock Notion vuoto"
+                    else:
+                        self._sync_record_to_woo(record, woo_product)
+                else:
+                    # Metadata dalla coda, stock riletto da WooCommerce
+                    row = dict(entry.get("payload") or {})
+                    key = self._normalize_sku(sku)
+                    if not row:
+                        dropped = "dati della riga assenti dalla coda"
+                    elif self.archive is not None and self.archive.is_archived(key) and key not in self.archive.returning:
+                        dropped = "SKU archiviato"
+                    else:
+                        row["stock"] = woo_product.get('stock_quantity') or 0
+                        if self.archive is not None and key in self.archive.returning:
+                            # Ripristino fallito nel ciclo: la pagina torna dall'archivio, non va creata da zero
+                            self._restore_row(row)
+                        self._sync_row_to_notion(row)
+                if dropped:
+                    self.dead_letters.drop(operation, sku, dropped)
+                    stats["dropped"] += 1
+                else:
+                    self.dead_letters.resolve(operation, sku)
+                    stats["resolved"] += 1
+            except CircuitOpenError as e:
+                # Il tentativo non conta: si riprova quando il backend torna disponibile
+                logger.warning(f"⚠️  Nuovi tentativi sospesi: {e}")
+                break
+            except Exception as e:
+                logger.warning(f"⚠️  Nuovo tentativo fallito per {sku} ({operation}): {e}")
+                self.dead_letters.record_failure(operation, sku, e, entry.get("payload"))
+        
+        self.dead_letters.save()
+        self.merge_base.save()
+        self.stock_view.save()
+        if self.archive is not None:
+            self.archive.save()
+        logger.info(
+            f"📮 Coda: {stats['resolved']}/{stats['retried']} righe recuperate, {stats['dropped']} scartate, "
+            f"{len(self.dead_letters.entries)} ancora in coda"
+        )
+        return stats
+    
     def get_sync_status(self) -> Dict:
         """Ritorna lo stato della sincronizzazione"""
         return {
@@ -0,0 +1,74 @@
+import os
+import time
+from loguru import logger
+from typing import Dict, Optional
+
+class WooTaxonomyCache:
+    """
+    Cache della tassonomia WooCommerce (categorie e brand)
+    
+    Categorie e brand cambiano molto più raramente dello stock: vengono
+    riletti solo quando la cache è più vecchia di `refresh_interval` secondi.
+    Ogni rilettura che cambia un nome incrementa `version`, così le risoluzioni
+    memorizzate con la versione precedente vengono ricalcolate.
+    """
+    
+    def __init__(self, woo_client, refresh_interval: int = None):
+        """
+        Inizializza la cache
+        
+        Args:
+            woo_client: Client WooCommerce
+            refresh_interval: Secondi tra due riletture (default: WOO_TAXONOMY_REFRESH_INTERVAL o 3600)
+        """
+        self.woo = woo_client
+        self.refresh_interval = refresh_interval or int(os.getenv('WOO_TAXONOMY_REFRESH_INTERVAL', 3600))
+        self.categories: Dict[int, str] = {}
+        self.brands: Dict[int, str] = {}
+        self.version = 0
+        self._loaded_at: Optional[float] = None
+    
+    def _fetch(self, endpoint: str) -> Optional[Dict[int, str]]:
+        """Legge un endpoint di tassonomia (None se non disponibile sullo store)"""
+        try:
+            terms = {}
+            for term in self.woo.iter_pages(endpoint, {"per_page": 100, "_fields": "id,name"}):
+                if not isinstance(term, dict) or 'id' not in term:
+                    # Risposta di errore (es. plugin brand non installato)
+                    return None
+                terms[term['id']] = (term.get('name') or '').strip()
+            return terms
+        except Exception as e:
+            logger.warning(f"⚠️  Tassonomia WooCommerce '{endpoint}' non disponibile: {e}")
+            return None
+    
+    def refresh(self):
+        """Rilegge categorie e brand da WooCommerce"""
+        categories = self._fetch('products/categories')
+        brands = self._fetch('products/brands')
+        
+        changed = False
+        if categories is not None and categories != self.categories:
+            self.categories = categories
+            changed = True
+        if brands is not None and brands != self.brands:
+            self.brands = brands
+            changed = True
+        if changed:
+            self.version += 1
+        
+        self._loaded_at = time.monotonic()
+        logger.debug(f"✓ Tassonomia WooCommerce aggiornata ({len(self.categories)} categorie, {len(self.brands)} brand)")
+    
+    def refresh_if_stale(self):
+        """Rilegge la tassonomia solo se la cache è scaduta"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+            self.refresh()
+    
+    def category_name(self, term: Dict) -> str:
+        """Nome corrente di una categoria referenziata da un prodotto"""
+        return self.categories.get(term.get('id')) or (term.get('name') or '').strip()
+    
+    def brand_name(self, term: Dict) -> str:
+        """Nome corrente di un brand referenziato da un prodotto"""
+        return self.brands.get(term.get('id')) or (term.get('name') or '').strip()
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from loguru import logger
+from typing import Dict, Iterable, List
+
+class TierScheduler:
+    """
+    Classificazione degli SKU in fasce di frequenza di sincronizzazione
+    
+    Per ogni SKU ricorda l'ultimo stock riconciliato e gli istanti in cui è cambiato.
+    Sono "caldi" gli SKU cambiati spesso di recente o vicini all'esaurimento: vengono
+    riconciliati ogni TIER_HOT_INTERVAL con lookup mirati. Tutti gli altri ("freddi")
+    restano al ciclo completo, che li riconcilia al massimo una volta ogni
+    TIER_COLD_INTERVAL: il budget delle API va agli SKU caldi.
+    """
+    
+    def __init__(self, path: str, hot_changes: int = None, window: int = None,
+                 low_stock: int = None, hot_max: int = None, cold_interval: int = None):
+        """
+        Args:
+            path: Percorso del file JSON delle fasce
+            hot_changes: Cambi di stock nella finestra che rendono caldo uno SKU (default: TIER_HOT_CHANGES o 2)
+            window: Finestra in secondi su cui contare i cambi (default: TIER_HOT_WINDOW o 86400)
+            low_stock: Stock (maggiore di zero) sotto cui uno SKU è caldo (default: STOCK_WARNING_THRESHOLD o 10)
+            hot_max: SKU caldi riconciliati per giro, per restare nei rate limit (default: TIER_HOT_MAX o 50)
+            cold_interval: Secondi minimi tra due riconciliazioni di uno SKU freddo nel ciclo
+                completo (default: TIER_COLD_INTERVAL o 3600, 0 = a ogni ciclo)
+        """
+        self.path = path
+        self.hot_changes = hot_changes or int(os.getenv('TIER_HOT_CHANGES', 2))
+        self.window = window or int(os.getenv('TIER_HOT_WINDOW', 86400))
+        self.low_stock = low_stock if low_stock is not None else int(os.getenv('STOCK_WARNING_THRESHOLD', 10))
+        self.hot_max = hot_max or int(os.getenv('TIER_HOT_MAX', 50))
+        self.cold_interval = cold_interval if cold_interval is not None else int(os.getenv('TIER_COLD_INTERVAL', 3600))
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+    
+    def _load(self):
+        """Rilegge le fasce salvate (un file illeggibile equivale a nessuna storia)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+            logger.debug(f"✓ Fasce di sincronizzazione caricate ({len(self._entries)} SKU)")
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Fasce di sincronizzazione non leggibili, verranno ricreate: {e}")
+            self._entries = {}
+    
+    def observe(self, key: str, sku: str, stock: int):
+        """
+        Registra lo stock riconciliato di uno SKU
+        
+        Args:
+            key: SKU normalizzato
+            sku: SKU originale (usato per i lookup mirati)
+            stock: Stock su cui i due lati concordano
+        """
+        stock = int(stock)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            self._dirty = True
+            if entry is None:
+                self._entries[key] = {"sku": sku, "stock": stock, "changes": [], "synced": now}
+                return
+            # Istante dell'ultima riconciliazione: scandisce la cadenza degli SKU freddi
+            entry["synced"] = now
+            if entry["stock"] == stock:
+                return
+            entry["stock"] = stock
+            entry["changes"] = [t for t in entry["changes"] if now - t < self.window] + [now]
+    
+    def _score(self, entry: Dict, now: float) -> int:
+        """Cambi recenti dello SKU, o -1 se lo SKU non è caldo"""
+        changes = sum(1 for t in entry["changes"] if now - t < self.window)
+        if changes >= self.hot_changes or 0 < entry["stock"] <= self.low_stock:
+            return changes
+        return -1
+    
+    def is_resting(self, key: str, stocks: Iterable[int]) -> bool:
+        """
+        True se il ciclo completo può saltare lo SKU: freddo, riconciliato da meno di
+        cold_interval secondi e con ogni lato ancora fermo allo stock riconciliato
+        
+        Args:
+            key: SKU normalizzato
+            stocks: Stock attuale su Notion e su ogni negozio che ha lo SKU
+        """
+        if not self.cold_interval:
+            return False
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            return (
+                entry is not None
+                and now - entry.get("synced", 0) < self.cold_interval
+                and self._score(entry, now) < 0
+                and all(int(stock) == entry["stock"] for stock in stocks)
+            )
+    
+    def hot_skus(self, skip_since: float = None) -> List[str]:
+        """
+        SKU della fascia calda, dai più movimentati (a parità, dal meno disponibile)
+        
+        Args:
+            skip_since: Esclude gli SKU riconciliati dopo questo istante (es. dal ciclo
+                completo appena concluso)
+        
+        Returns:
+            Al massimo hot_max SKU originali
+        """
+        now = time.time()
+        with self._lock:
+            scored = [
+                (self._score(entry, now), entry) for entry in self._entries.values()
+                if skip_since is None or entry.get("synced", 0) < skip_since
+            ]
+        hot = sorted((item for item in scored if item[0] >= 0), key=lambda item: (-item[0], item[1]["stock"]))
+        return [entry["sku"] for _, entry in hot[:self.hot_max]]
+    
+    def summary(self) -> Dict:
+        """Numero di SKU per fascia (per il report)"""
+        now = time.time()
+        with self._lock:
+            hot = sum(1 for entry in self._entries.values() if self._score(entry, now) >= 0)
+        return {"hot": min(hot, self.hot_max), "hot_total": hot, "cold": len(self._entries) - hot}
+    
+    def prune(self, present):
+        """
+        Dimentica gli SKU non più presenti nel catalogo
+        
+        Args:
+            present: SKU normalizzati letti nel ciclo completo
+        """
+        present = set(present)
+        with self._lock:
+            stale = [key for key in self._entries if key not in present]
+            for key in stale:
+                del self._entries[key]
+            self._dirty = self._dirty or bool(stale)
+    
+    def save(self):
+        """Salva le fasce su disco se sono cambiate"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f)
+                os.replace(self.path + ".tmp", self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"⚠️  Impossibile salvare le fasce di sincronizzazione: {e}")
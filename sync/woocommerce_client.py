@@ -1,13 +1,29 @@
 from loguru import logger
 from woocommerce import API
+from requests.auth import HTTPBasicAuth
+import requests
 import os
+import re
 import time
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from sync.circuit_breaker import CircuitBreaker, CircuitOpenError
+from sync.coalescing import SingleFlight
+from sync.concurrency import AdaptiveConcurrency
+from sync.http_cache import CachedResponse, ResponseCache
+from sync.projection import woo_fields_param, WOO_REQUIRED_FIELDS, WOO_VARIATION_REQUIRED_FIELDS
+from sync.state import state_path
+
+class WooCommerceError(Exception):
+    """Risposta di errore dell'API WooCommerce (corpo JSON con 'code' o non decodificabile)"""
+    pass
 
 class WooCommerceClient:
     """Client per interagire con l'API di WooCommerce"""
     
-    def __init__(self, api_url, consumer_key, consumer_secret):
+    # Campi dei lookup per SKU: stessi della sincronizzazione, così le letture si coalescono
+    LOOKUP_FIELDS = ("id", "sku", "stock_quantity")
+    
+    def __init__(self, api_url, consumer_key, consumer_secret, store: str = None):
         """
         Inizializza il client WooCommerce
         
@@ -15,12 +31,26 @@ class WooCommerceClient:
             api_url: URL della WooCommerce store (es. https://mystore.com)
             consumer_key: Chiave consumer dell'API
             consumer_secret: Secret consumer dell'API
+            store: Nome del negozio quando la sincronizzazione ne gestisce più d'uno
         """
         self.api_url = api_url.rstrip('/')
+        self.store = store
+        label = f"WooCommerce {store}" if store else "WooCommerce"
         self.consumer_key = consumer_key
         self.consumer_secret = consumer_secret
         self.timeout = int(os.getenv('WOOCOMMERCE_TIMEOUT', 30))
         self.max_retries = int(os.getenv('WOOCOMMERCE_MAX_RETRIES', 3))
+        self.api_calls = 0
+        self.breaker = CircuitBreaker(label)
+        self.concurrency = AdaptiveConcurrency(label, maximum=int(os.getenv('WOO_MAX_CONCURRENCY', 8)))
+        self.coalescer = SingleFlight(label)
+        
+        # Cache delle risposte GET, riconvalidata a ogni lettura (0 = disattivata)
+        cache_size = int(os.getenv('WOO_HTTP_CACHE_SIZE', 256))
+        cache_on_disk = os.getenv('WOO_HTTP_CACHE_DISK', 'false').lower() == 'true'
+        self.cache = ResponseCache(
+            cache_size, state_path(f"woo_http_cache_{store}" if store else 'woo_http_cache') if cache_on_disk else None
+        ) if cache_size > 0 else None
         
         try:
             self.client = API(
@@ -30,7 +60,7 @@ class WooCommerceClient:
                 version="wc/v3",
                 timeout=self.timeout
             )
-            logger.info(f"✓ WooCommerce API connessa con successo (timeout: {self.timeout}s)")
+            logger.info(f"✓ {label} API connessa con successo (timeout: {self.timeout}s)")
         except Exception as e:
             logger.error(f"✗ Errore nella connessione a WooCommerce: {e}")
             raise
@@ -42,7 +72,7 @@ class WooCommerceClient:
         Args:
             product_id: ID del prodotto
             variant_id: ID della variante (opzionale)
-            
+        
         Returns:
             SKU generato (formato: ADIVO-{product_id} o ADIVO-{product_id}-V{variant_id})
         """
@@ -56,21 +86,65 @@ class WooCommerceClient:
         """
         Esegue una richiesta con retry logic e backoff esponenziale
         
+        Le GET puntuali (non paginate) identiche nello stesso ciclo condividono
+        un'unica richiesta; le scritture invalidano le letture delle risorse modificate.
+        
         Args:
             method: Metodo HTTP ('get', 'put', 'post')
             endpoint: Endpoint API
             data: Dati per PUT/POST
             params: Query parameters per GET
+        
+        Raises:
+            CircuitOpenError: Se lo store è considerato non disponibile
         """
+        if method.lower() == 'get' and 'page' not in (params or {}):
+            return self._fresh(self.coalescer.do(
+                ResponseCache.key(endpoint, params),
+                lambda: self._send_with_retry(method, endpoint, data, params),
+                lambda result: self._result_tags(endpoint, params, result)
+            ))
+        
+        result = self._send_with_retry(method, endpoint, data, params)
+        if method.lower() != 'get':
+            self._invalidate_after_write(endpoint, data)
+        return result
+    
+    @staticmethod
+    def _result_tags(endpoint, params, result):
+        """Tag di invalidazione di una lettura: ID delle risorse restituite (e 'search' per le ricerche per SKU)"""
+        items = result if isinstance(result, list) else [result]
+        tags = [str(item['id']) for item in items if isinstance(item, dict) and 'id' in item]
+        tags.extend(re.findall(r'\d+', endpoint))
+        if 'sku' in (params or {}):
+            tags.append('search')
+        return tags
+    
+    def _invalidate_after_write(self, endpoint, data):
+        """Invalida le letture coalescenti che includono le risorse appena scritte"""
+        data = data or {}
+        updates = data.get('update', []) + data.get('create', []) if endpoint.endswith('batch') else [data]
+        tags = re.findall(r'\d+', endpoint) + [str(item['id']) for item in updates if 'id' in item]
+        if data.get('create') or any('sku' in item for item in updates):
+            # Uno SKU nuovo può cambiare l'esito di una ricerca che prima non trovava nulla
+            tags.append('search')
+        self.coalescer.invalidate(*tags)
+    
+    def _send_with_retry(self, method, endpoint, data=None, params=None):
+        """Invia una richiesta ritentando timeout ed errori di connessione (vedi _retry_request)"""
         for attempt in range(self.max_retries):
+            self.breaker.before_call()
             try:
                 response = None
-                if method.lower() == 'get':
-                    response = self.client.get(endpoint, params=params)
+                self.api_calls += 1
+                if method.lower() == 'get' and self.cache is not None:
+                    return self._cached_get(endpoint, params)
+                elif method.lower() == 'get':
+                    response = self._send(self.client.get, endpoint, params=params)
                 elif method.lower() == 'put':
-                    response = self.client.put(endpoint, data)
+                    response = self._send(self.client.put, endpoint, data)
                 elif method.lower() == 'post':
-                    response = self.client.post(endpoint, data)
+                    response = self._send(self.client.post, endpoint, data)
                 
                 # Converti Response object in lista/dict
                 if hasattr(response, 'json'):
@@ -79,85 +153,233 @@ class WooCommerceClient:
                     except:
                         return response
                 return response
-                
+            
             except (TimeoutError, ConnectionError) as e:
+                self.breaker.record_failure()
                 wait_time = 2 ** attempt  # Backoff esponenziale: 1s, 2s, 4s
+                if self.breaker.is_open:
+                    # Inutile attendere altri tentativi: lo store è giù
+                    raise CircuitOpenError(f"Circuito WooCommerce aperto: {e}") from e
                 if attempt < self.max_retries - 1:
                     logger.warning(f"⏱️  Timeout WooCommerce (attempt {attempt+1}/{self.max_retries}), retry tra {wait_time}s... ({e})")
                     time.sleep(wait_time)
                 else:
                     logger.error(f"✗ Errore WooCommerce dopo {self.max_retries} tentativi: {e}")
                     raise
+            except requests.RequestException:
+                self.breaker.record_failure()
+                raise
     
-    def get_products(self, include_variants=True):
+    def _send(self, fn, *args, **kwargs):
         """
-        Recupera tutti i prodotti da WooCommerce, including varianti
+        Invia una richiesta HTTP dentro la finestra di concorrenza adattiva
+        
+        L'esito alimenta sia il limitatore (latenza, 429/5xx, timeout) sia il
+        circuit breaker (429 e 5xx contano come fallimenti).
         
         Args:
-            include_variants: Se True, include anche le varianti dei prodotti variabili
-            
-        Returns:
-            Lista di prodotti con varianti (se presenti)
+            fn: Funzione che esegue la richiesta (es. self.client.get)
+        """
+        with self.concurrency.slot() as slot:
+            try:
+                response = fn(*args, **kwargs)
+            except (TimeoutError, requests.Timeout):
+                slot.overloaded = True
+                raise
+            status = getattr(response, 'status_code', None)
+            slot.overloaded = status is not None and (status >= 500 or status == 429)
+        
+        if slot.overloaded:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+    
+    def _cached_get(self, endpoint, params=None):
+        """
+        GET riconvalidata tramite la cache delle risposte
+        
+        Con ETag/Last-Modified disponibili la richiesta è condizionale (304 = nessun corpo);
+        altrimenti il corpo scaricato viene confrontato per hash con quello in cache.
+        In entrambi i casi una pagina invariata non viene decodificata di nuovo.
+        
+        Args:
+            endpoint: Endpoint API
+            params: Query parameters
         """
+        key = ResponseCache.key(endpoint, params)
+        entry = self.cache.get(key)
+        headers = entry.conditional_headers() if entry is not None else {}
+        
+        if headers and self.api_url.startswith('https'):
+            # La libreria woocommerce non accetta header aggiuntivi: stessa richiesta, fatta direttamente
+            response = self._send(
+                requests.get,
+                f"{self.api_url}/wp-json/wc/v3/{endpoint}",
+                params=params,
+                auth=HTTPBasicAuth(self.consumer_key, self.consumer_secret),
+                headers={"accept": "application/json", **headers},
+                timeout=self.timeout
+            )
+        else:
+            response = self._send(self.client.get, endpoint, params=params)
+        
+        if response.status_code == 304 and entry is not None:
+            self.cache.record('not_modified')
+            return self._fresh(entry.data)
+        
+        digest = ResponseCache.digest(response.content)
+        if response.status_code == 200 and entry is not None and digest == entry.digest:
+            self.cache.record('unchanged')
+            return self._fresh(entry.data)
+        
         try:
-            logger.debug("📥 Recupero prodotti da WooCommerce...")
-            products_response = self._retry_request('get', 'products', params={"per_page": 100})
+            data = response.json()
+        except ValueError:
+            return response
+        
+        if response.status_code == 200:
+            self.cache.put(key, CachedResponse(
+                response.headers.get('ETag'), response.headers.get('Last-Modified'), digest, data
+            ))
+            self.cache.record('misses')
+            return self._fresh(data)
+        return data
+    
+    @staticmethod
+    def _fresh(data):
+        """Copia superficiale di una risposta in cache (i chiamanti aggiungono chiavi come '_sku')"""
+        if isinstance(data, list):
+            return [dict(item) if isinstance(item, dict) else item for item in data]
+        if isinstance(data, dict):
+            return dict(data)
+        return data
+    
+    def cache_summary(self, since=None):
+        """Statistiche della cache delle risposte (None se disattivata)"""
+        return self.cache.summary(since) if self.cache is not None else None
+    
+    def iter_pages(self, endpoint, params=None):
+        """
+        Scorre tutte le pagine di un endpoint di lista WooCommerce
+        
+        Args:
+            endpoint: Endpoint API (es. 'products')
+            params: Query parameters (per_page incluso)
+        
+        Yields:
+            Un elemento alla volta, pagina dopo pagina
+        
+        Raises:
+            WooCommerceError: Se una pagina è una risposta di errore (4xx/5xx) invece di una lista
+        """
+        params = dict(params or {})
+        per_page = int(params.setdefault("per_page", 100))
+        page = int(params.get("page", 1))
+        
+        while True:
+            params["page"] = page
+            response = self._retry_request('get', endpoint, params=params)
             
-            if not products_response:
-                return []
+            if not response:
+                return
+            if not isinstance(response, list):
+                # Un endpoint di lista risponde con un oggetto solo in caso di errore
+                detail = response.get('message') or response.get('code') if isinstance(response, dict) else response
+                raise WooCommerceError(f"Risposta di errore da {endpoint} (pagina {page}): {detail}")
+            items = response
+            yield from items
             
-            products = products_response if isinstance(products_response, list) else [products_response]
-            all_products = []
+            if len(items) < per_page:
+                return
+            page += 1
+    
+    def iter_products(self, include_variants=True, fields=None, variant_fields=None, params=None):
+        """
+        Scorre tutti i prodotti WooCommerce pagina per pagina, con le varianti
+        
+        Args:
+            include_variants: Se True, include anche le varianti dei prodotti variabili
+            fields: Campi prodotto da richiedere (`_fields`, None = payload completo)
+            variant_fields: Campi variante da richiedere (None = payload completo)
+            params: Query parameters aggiuntivi per la lista prodotti
+        
+        Yields:
+            Prodotti con '_sku' e '_variants' valorizzati
+        """
+        product_params = {"per_page": 100, **(params or {})}
+        fields_param = woo_fields_param(fields, WOO_REQUIRED_FIELDS)
+        if fields_param:
+            product_params["_fields"] = fields_param
+        
+        variant_params = {"per_page": 100}
+        variant_fields_param = woo_fields_param(variant_fields, WOO_VARIATION_REQUIRED_FIELDS)
+        if variant_fields_param:
+            variant_params["_fields"] = variant_fields_param
+        
+        for product in self.iter_pages('products', product_params):
+            product_type = product.get('type', 'simple')
+            product['_sku'] = product.get('sku') or self._generate_sku(product.get('id'))
             
-            for product in products:
-                product_type = product.get('type', 'simple')
-                product['_sku'] = product.get('sku') or self._generate_sku(product.get('id'))
-                
-                if product_type == 'variable' and include_variants:
-                    # Recupera le varianti
-                    try:
-                        variants = self._retry_request(
-                            'get', 
-                            f"products/{product.get('id')}/variations",
-                            params={"per_page": 100}
-                        )
-                        variants = variants if isinstance(variants, list) else [variants]
-                        
-                        product['_variants'] = []
-                        for variant in variants:
-                            variant['_sku'] = variant.get('sku') or self._generate_sku(product.get('id'), variant.get('id'))
-                            variant['_product_name'] = f"{product.get('name')} - {variant.get('attributes', [{}])[0].get('option', 'Variante')}"
-                            # Assicura che ogni variante abbia stock_quantity (None se non gestito)
-                            if 'stock_quantity' not in variant:
-                                variant['stock_quantity'] = variant.get('manage_stock', False) and 0 or None
-                            product['_variants'].append(variant)
-                        
-                        logger.debug(f"✓ Recuperate {len(product['_variants'])} varianti per prodotto {product.get('name')}")
-                    except Exception as e:
-                        logger.warning(f"⚠️  Non posso recuperare varianti per {product.get('name')}: {e}")
-                        product['_variants'] = []
-                else:
+            if product_type == 'variable' and include_variants:
+                # Recupera le varianti
+                try:
+                    variants = self.iter_pages(f"products/{product.get('id')}/variations", variant_params)
+                    
                     product['_variants'] = []
-                
-                all_products.append(product)
+                    for variant in variants:
+                        variant['_sku'] = variant.get('sku') or self._generate_sku(product.get('id'), variant.get('id'))
+                        variant['_product_name'] = f"{product.get('name')} - {variant.get('attributes', [{}])[0].get('option', 'Variante')}"
+                        # Assicura che ogni variante abbia stock_quantity (None se non gestito)
+                        if 'stock_quantity' not in variant:
+                            variant['stock_quantity'] = variant.get('manage_stock', False) and 0 or None
+                        product['_variants'].append(variant)
+                    
+                    logger.debug(f"✓ Recuperate {len(product['_variants'])} varianti per prodotto {product.get('name')}")
+                except Exception as e:
+                    logger.warning(f"⚠️  Non posso recuperare varianti per {product.get('name')}: {e}")
+                    product['_variants'] = []
+            else:
+                product['_variants'] = []
             
+            yield product
+    
+    def get_products(self, include_variants=True, fields=None, variant_fields=None):
+        """
+        Recupera tutti i prodotti da WooCommerce, including varianti
+        
+        Args:
+            include_variants: Se True, include anche le varianti dei prodotti variabili
+            fields: Campi prodotto da richiedere (`_fields`, None = payload completo)
+            variant_fields: Campi variante da richiedere (None = payload completo)
+        
+        Returns:
+            Lista di prodotti con varianti (se presenti)
+        """
+        try:
+            logger.debug("📥 Recupero prodotti da WooCommerce...")
+            all_products = list(self.iter_products(include_variants, fields, variant_fields))
             logger.info(f"✓ Recuperati {len(all_products)} prodotti (con varianti) da WooCommerce")
             return all_products
         except Exception as e:
             logger.error(f"✗ Errore nel recupero dei prodotti: {e}")
             raise
     
-    def get_product_by_sku(self, sku):
+    def get_product_by_sku(self, sku, fields=None):
         """
         Recupera un prodotto o variante tramite SKU
         
         Args:
             sku: SKU da cercare
-            
+            fields: Campi da richiedere (`_fields`, None = payload completo)
+        
         Returns:
             Dict con prodotto/variante o None
         """
         try:
+            fields_param = woo_fields_param(fields, ("id", "sku"))
+            params = {"_fields": fields_param} if fields_param else None
+            
             # Controlla se è uno SKU generato automaticamente per variante
             if sku.startswith('ADIVO-') and '-V' in sku:
                 # Formato: ADIVO-{product_id}-V{variant_id}
@@ -166,44 +388,159 @@ class WooCommerceClient:
                 variant_id = parts[1]
                 
                 try:
-                    variant = self._retry_request('get', f"products/{product_id}/variations/{variant_id}")
+                    variant = self._retry_request('get', f"products/{product_id}/variations/{variant_id}", params=params)
                     if variant:
                         variant['_sku'] = sku
                         return variant
+                except CircuitOpenError:
+                    raise
                 except:
                     pass
             elif sku.startswith('ADIVO-'):
                 # Formato: ADIVO-{product_id}
                 product_id = sku.replace('ADIVO-', '')
                 try:
-                    product = self._retry_request('get', f"products/{product_id}")
+                    product = self._retry_request('get', f"products/{product_id}", params=params)
                     if product:
                         product['_sku'] = sku
                         return product
+                except CircuitOpenError:
+                    raise
                 except:
                     pass
             
             # Ricerca standard per SKU custom
-            products = self._retry_request('get', 'products', params={"sku": sku})
+            search_params = dict(params or {}, sku=sku)
+            products = self._retry_request('get', 'products', params=search_params)
             if products:
                 products[0]['_sku'] = sku
                 return products[0]
             
             return None
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"✗ Errore nel recupero del prodotto per SKU {sku}: {e}")
             return None
     
-    def update_product_stock(self, sku, quantity):
+    def get_products_by_skus(self, skus, fields=None, failed=None):
+        """
+        Recupera più prodotti o varianti con poche richieste, in parallelo
+        
+        Gli SKU custom vengono cercati a gruppi di 100 con `products?sku=a,b,c`. Gli
+        SKU generati (ADIVO-*) non sono salvati su WooCommerce: vengono raggruppati
+        per prodotto padre e letti per ID con `products?include=` e, per le varianti,
+        con `products/{id}/variations?include=`. I gruppi partono in parallelo entro
+        WOO_LOOKUP_WORKERS (la finestra di concorrenza del client resta il limite).
+        
+        Args:
+            skus: SKU da cercare
+            fields: Campi da richiedere (`_fields`, None = payload completo)
+            failed: Dict in cui raccogliere SKU normalizzato -> errore per i gruppi la cui
+                lettura è fallita (None = il primo errore viene sollevato)
+        
+        Returns:
+            Dict SKU normalizzato (trim, minuscolo) -> prodotto/variante con '_sku';
+            gli SKU non trovati non compaiono e vengono elencati nel log (quelli dei
+            gruppi falliti non compaiono nemmeno: sono in `failed`)
+        
+        Raises:
+            WooCommerceError: Se un gruppo non è leggibile e `failed` è None
+        """
+        wanted = {}
+        generated_products = {}
+        generated_variations = {}
+        for sku in skus:
+            if not sku or not sku.strip():
+                continue
+            sku = sku.strip()
+            key = sku.lower()
+            parsed = self.parse_generated_sku(sku)
+            if parsed is None:
+                wanted.setdefault(key, sku)
+            elif parsed[1] is None:
+                generated_products.setdefault(parsed[0], sku)
+            else:
+                generated_variations.setdefault(parsed[0], {}).setdefault(parsed[1], sku)
+        
+        fields_param = woo_fields_param(fields, ("id", "sku"))
+        
+        def chunks(items):
+            items = list(items)
+            return [items[start:start + 100] for start in range(0, len(items), 100)]
+        
+        def read(endpoint, params, match, keys):
+            params = dict(params, per_page=100)
+            if fields_param:
+                params["_fields"] = fields_param
+            matched = []
+            try:
+                for item in self.iter_pages(endpoint, params):
+                    sku = match(item)
+                    if sku:
+                        item['_sku'] = sku
+                        matched.append((sku.lower(), item))
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if failed is None:
+                    raise
+                # Gruppo non letto: i suoi SKU non sono "non trovati", vanno ritentati
+                logger.error(f"✗ Errore nel lookup multiplo su {endpoint} ({len(keys)} SKU): {e}")
+                return [], {key: e for key in keys}
+            return matched, {}
+        
+        lookups = []
+        for chunk in chunks(wanted):
+            lookups.append((
+                'products', {"sku": ",".join(wanted[key] for key in chunk)},
+                lambda item: wanted.get((item.get('sku') or '').strip().lower()),
+                chunk
+            ))
+        for chunk in chunks(generated_products):
+            lookups.append((
+                'products', {"include": ",".join(map(str, chunk))},
+                lambda item: generated_products.get(item.get('id')),
+                [generated_products[product_id].lower() for product_id in chunk]
+            ))
+        for product_id, variations in generated_variations.items():
+            for chunk in chunks(variations):
+                lookups.append((
+                    f"products/{product_id}/variations", {"include": ",".join(map(str, chunk))},
+                    lambda item, variations=variations: variations.get(item.get('id')),
+                    [variations[variation_id].lower() for variation_id in chunk]
+                ))
+        
+        found = {}
+        if lookups:
+            workers = max(1, min(len(lookups), int(os.getenv('WOO_LOOKUP_WORKERS', 4))))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="woo-lookup") as executor:
+                for matched, errors in executor.map(lambda lookup: read(*lookup), lookups):
+                    for key, item in matched:
+                        found.setdefault(key, item)
+                    if errors:
+                        failed.update(errors)
+        
+        requested = set(wanted) | {sku.lower() for sku in generated_products.values()} | {
+            sku.lower() for variations in generated_variations.values() for sku in variations.values()
+        }
+        missing = sorted(requested - set(found) - set(failed or ()))
+        logger.debug(f"🔍 Lookup multiplo: {len(found)}/{len(requested)} SKU trovati su WooCommerce in {len(lookups)} richieste")
+        if missing:
+            logger.info(f"🔍 {len(missing)} SKU non trovati su WooCommerce: {', '.join(missing[:20])}")
+        return found
+    
+    def update_product_stock(self, sku, quantity, product=None):
         """
         Aggiorna lo stock di un prodotto o variante tramite SKU
         
         Args:
             sku: SKU del prodotto/variante
             quantity: Nuova quantità di stock
+            product: Prodotto già letto (evita un nuovo lookup per SKU)
         """
         try:
-            product = self.get_product_by_sku(sku)
+            product = product or self.get_product_by_sku(sku, fields=self.LOOKUP_FIELDS)
             
             if not product:
                 logger.warning(f"⚠️  Prodotto con SKU {sku} non trovato")
@@ -217,13 +554,13 @@ class WooCommerceClient:
                 
                 data = {"stock_quantity": quantity}
                 response = self._retry_request('put', f"products/{product_id}/variations/{variant_id}", data=data)
-                logger.info(f"✓ Stock variante aggiornato - SKU {sku}: {quantity} unità")
+                logger.debug(f"✓ Stock variante aggiornato - SKU {sku}: {quantity} unità")
                 return response
             else:
                 product_id = product.get('id')
                 data = {"stock_quantity": quantity}
                 response = self._retry_request('put', f"products/{product_id}", data=data)
-                logger.info(f"✓ Stock prodotto aggiornato - SKU {sku}: {quantity} unità")
+                logger.debug(f"✓ Stock prodotto aggiornato - SKU {sku}: {quantity} unità")
                 return response
         except Exception as e:
             logger.error(f"✗ Errore nell'aggiornamento dello stock per SKU {sku}: {e}")
@@ -238,7 +575,7 @@ class WooCommerceClient:
             data_dict: Dict con dati da aggiornare (es: {"sku": "ADIVO-123", "regular_price": "19.99"})
         """
         try:
-            product = self.get_product_by_sku(sku)
+            product = self.get_product_by_sku(sku, fields=self.LOOKUP_FIELDS)
             
             if not product:
                 logger.warning(f"⚠️  Prodotto con SKU {sku} non trovato")
@@ -261,3 +598,130 @@ class WooCommerceClient:
         except Exception as e:
             logger.error(f"✗ Errore nell'aggiornamento prodotto SKU {sku}: {e}")
             raise
+    
+    @staticmethod
+    def parse_generated_sku(sku):
+        """
+        Scompone uno SKU generato automaticamente
+        
+        Args:
+            sku: SKU nel formato ADIVO-{product_id} o ADIVO-{product_id}-V{variant_id}
+        
+        Returns:
+            Tupla (product_id, variant_id o None) oppure None se lo SKU non è generato
+        """
+        if not sku or not sku.startswith('ADIVO-'):
+            return None
+        parts = sku.replace('ADIVO-', '').split('-V')
+        try:
+            product_id = int(parts[0])
+            variant_id = int(parts[1]) if len(parts) > 1 else None
+        except ValueError:
+            return None
+        return product_id, variant_id
+    
+    def _batch(self, endpoint, updates, chunk_size=100):
+        """
+        Invia aggiornamenti tramite un endpoint batch, a blocchi
+        
+        Args:
+            endpoint: Endpoint batch (es. 'products/batch')
+            updates: Lista di dict con 'id' e i campi da aggiornare
+            chunk_size: Elementi per richiesta (WooCommerce accetta al massimo 100)
+        
+        Returns:
+            Lista degli elementi restituiti da WooCommerce, compresi quelli
+            rifiutati (con chiave 'error'), che vengono segnalati nel log
+        """
+        updated = []
+        for start in range(0, len(updates), chunk_size):
+            chunk = updates[start:start + chunk_size]
+            response = self._retry_request('post', endpoint, data={"update": chunk})
+            if isinstance(response, dict):
+                items = response.get('update', [])
+                self._log_rejected(endpoint, chunk, items)
+                updated.extend(items)
+        return updated
+    
+    @staticmethod
+    def accepted(updated):
+        """Elementi di una risposta batch non rifiutati da WooCommerce"""
+        return [item for item in updated if not item.get('error')]
+    
+    @staticmethod
+    def _log_rejected(endpoint, chunk, items):
+        """Segnala gli elementi di una richiesta batch rifiutati da WooCommerce"""
+        skus = {update.get('id'): update.get('sku') for update in chunk}
+        for item in items:
+            error = item.get('error')
+            if error:
+                message = error.get('message') if isinstance(error, dict) else error
+                logger.warning(f"⚠️  {endpoint}: elemento {item.get('id')} (SKU {skus.get(item.get('id'))}) rifiutato: {message}")
+    
+    def batch_update_products(self, updates):
+        """
+        Aggiorna più prodotti con l'endpoint products/batch
+        
+        Args:
+            updates: Lista di dict con 'id' e i campi da aggiornare
+        """
+        try:
+            updated = self._batch('products/batch', updates)
+            logger.info(f"✓ Aggiornati in batch {len(self.accepted(updated))}/{len(updates)} prodotti")
+            return updated
+        except Exception as e:
+            logger.error(f"✗ Errore nell'aggiornamento batch dei prodotti: {e}")
+            raise
+    
+    def batch_update_variations(self, product_id, updates):
+        """
+        Aggiorna più varianti di un prodotto con l'endpoint variations/batch
+        
+        Args:
+            product_id: ID del prodotto padre
+            updates: Lista di dict con 'id' della variante e i campi da aggiornare
+        """
+        try:
+            updated = self._batch(f"products/{product_id}/variations/batch", updates)
+            logger.debug(f"✓ Aggiornate in batch {len(self.accepted(updated))}/{len(updates)} varianti del prodotto {product_id}")
+            return updated
+        except Exception as e:
+            logger.error(f"✗ Errore nell'aggiornamento batch delle varianti del prodotto {product_id}: {e}")
+            raise
+    
+    def backfill_generated_skus(self, skus):
+        """
+        Scrive su WooCommerce gli SKU generati (ADIVO-*) raggruppandoli in richieste batch
+        
+        Args:
+            skus: SKU generati da salvare sui rispettivi prodotti/varianti
+        
+        Returns:
+            SKU effettivamente scritti (esclusi quelli rifiutati da WooCommerce)
+        """
+        products = []
+        variations = {}
+        for sku in skus:
+            parsed = self.parse_generated_sku(sku)
+            if not parsed:
+                continue
+            product_id, variant_id = parsed
+            if variant_id is None:
+                products.append({"id": product_id, "sku": sku})
+            else:
+                variations.setdefault(product_id, []).append({"id": variant_id, "sku": sku})
+        
+        written = []
+        if products:
+            skus_by_id = {update["id"]: update["sku"] for update in products}
+            written += [
+                skus_by_id[item.get('id')] for item in self.accepted(self.batch_update_products(products))
+                if item.get('id') in skus_by_id
+            ]
+        for product_id, updates in variations.items():
+            skus_by_id = {update["id"]: update["sku"] for update in updates}
+            written += [
+                skus_by_id[item.get('id')] for item in self.accepted(self.batch_update_variations(product_id, updates))
+                if item.get('id') in skus_by_id
+            ]
+        return written